@@ -2,17 +2,184 @@
 """
 Simple API Server for Garuda Media Stack Dashboard
 Provides status endpoints for services
+
+Serves requests from a bounded worker pool with HTTP/1.1 keep-alive. Calls into
+stream-manager.sh / ghost-control.sh run on a separate, smaller executor with a
+timeout, so a hung script can never stall the status endpoints.
 """
 
+import argparse
 import http.server
+import os
+import shutil
 import socketserver
 import json
 import subprocess
+import sys
+import threading
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from datetime import datetime
 
+# Shared helpers live next to control-api.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+from ghost_state import GhostModeState
+from net_listeners import ServiceProbe
+from stream_config import UnknownQuality, load_conf, parse_bitrate, quality_presets, resolve_quality
+from stream_supervisor import count_live_encoders
+from transcode_profiles import ProfileRefused, ProfileSelector
+from wireguard_stats import WireGuardStats
+
+service_probe = ServiceProbe()
+
+# Same kernel-backed ghost-mode state control-api.py serves, so the two servers agree
+ghost_state = GhostModeState()
+
+# Tunnel ghost-control.sh manages; other watched tunnels (wg-client0 from ghost-mode-control.sh)
+# are only ever taken down, directly with wg-quick
+GHOST_PRIMARY = 'wg0-client'
+
+# Seconds a toggle waits for the tunnel's link event before answering
+GHOST_SETTLE_TIMEOUT = 10
+
+STACK_PATH = '/home/lou/garuda-media-stack'
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config')
+
+def load_percent():
+    """1-minute load average as a CPU busy percentage (no psutil here)"""
+    return min(100.0, os.getloadavg()[0] * 100 / (os.cpu_count() or 1))
+
+def running_streams():
+    """Live HLS encoders in the shared pids/ directory: stream-manager.sh's and control-api.py's supervisor's"""
+    return count_live_encoders(f"{STACK_PATH}/pids")
+
+profiles = ProfileSelector(load_percent, running_streams)
+
+def stream_plan(label, quality, conf_name=None, section=None):
+    """Minimal launch plan for the profile selector, with the .conf ceiling if there is one.
+    `quality` may be a preset name from the .conf ('premium') or a spec ('1080p60'); raises UnknownQuality otherwise."""
+    conf = load_conf(os.path.join(CONFIG_DIR, conf_name)) if conf_name else {}
+    settings = conf.get(section, {})
+    default = settings.get('default_quality') or settings.get('record_quality') or '720p'
+    resolved = resolve_quality(quality_presets(conf), quality, default, {'height': 720, 'fps': 30})
+    return {
+        'label': label,
+        'quality': resolved,
+        'max_bitrate': parse_bitrate(settings.get('max_bitrate'))
+    }
+
+# Seconds before a helper script is killed
+SCRIPT_TIMEOUT = 60
+STATUS_SCRIPT_TIMEOUT = 10
+
+# Seconds an idle keep-alive connection may hold a pool worker while waiting for its next request
+KEEPALIVE_IDLE_TIMEOUT = 5
+
+def stack_disk_usage():
+    """Used-space percentage of the filesystem holding the media stack"""
+    try:
+        usage = shutil.disk_usage(STACK_PATH if os.path.exists(STACK_PATH) else '/')
+        return f"{usage.used * 100 / (usage.used + usage.free):.0f}%"  # df base: used + available
+    except OSError:
+        return 'Unknown'
+
+def format_uptime(seconds):
+    """Uptime the way uptime(1) starts it: '3 days', '4:02' or '12 min'"""
+    minutes = int(seconds) // 60
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return f"{days} day{'s' if days != 1 else ''}"
+    return f"{hours}:{minutes:02d}" if hours else f"{minutes} min"
+
+def read_proc_first_fields(path, count):
+    """First `count` whitespace-separated fields of a /proc file as floats (None if unreadable)"""
+    try:
+        with open(path) as f:
+            return [float(v) for v in f.read().split()[:count]]
+    except (OSError, ValueError):
+        return None
+
+# `wg show all dump`, parsed, with its own timeout
+wireguard_stats = WireGuardStats()
+
+class ScriptRunner:
+    """Run helper scripts on their own executor, bounded in both workers and waiters"""
+    
+    def __init__(self, workers=2, max_pending=4):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='script')
+        self._slots = threading.BoundedSemaphore(max_pending)
+    
+    def run(self, argv, timeout=SCRIPT_TIMEOUT):
+        """subprocess.run(argv) on the script executor; None if busy, raises TimeoutError if hung"""
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            future = self._executor.submit(
+                subprocess.run, argv, capture_output=True, text=True, timeout=timeout
+            )
+            try:
+                return future.result(timeout=timeout + 5)
+            except (subprocess.TimeoutExpired, FutureTimeout):
+                raise TimeoutError(f"{argv[0]} timed out after {timeout}s")
+        finally:
+            self._slots.release()
+
+scripts = ScriptRunner()
+
+class PooledHTTPServer(http.server.HTTPServer):
+    """HTTPServer that hands each connection to a bounded thread pool"""
+    
+    daemon_threads = True
+    
+    def __init__(self, server_address, handler_class, workers=16, backlog=64):
+        super().__init__(server_address, handler_class)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='http')
+        self._capacity = threading.BoundedSemaphore(workers + backlog)
+    
+    def process_request(self, request, client_address):
+        if not self._capacity.acquire(blocking=False):
+            # Saturated: refuse instead of queueing without bound
+            try:
+                request.sendall(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        self._pool.submit(self._process_request, request, client_address)
+    
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._capacity.release()
+    
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
+
 class MediaStackAPIHandler(http.server.BaseHTTPRequestHandler):
     
+    # Keep-alive; a request must arrive within `timeout` seconds once started, but an idle connection
+    # only holds its pool worker for KEEPALIVE_IDLE_TIMEOUT
+    protocol_version = 'HTTP/1.1'
+    timeout = 30
+    
+    def handle_one_request(self):
+        self.connection.settimeout(KEEPALIVE_IDLE_TIMEOUT)
+        try:
+            waiting = self.rfile.peek(1)
+        except OSError:
+            waiting = b''
+        if not waiting:
+            self.close_connection = True
+            return
+        self.connection.settimeout(self.timeout)
+        super().handle_one_request()
+    
     def do_GET(self):
         if self.path == '/api/ghost-mode/status':
             self.send_ghost_status()
@@ -20,6 +187,10 @@ class MediaStackAPIHandler(http.server.BaseHTTPRequestHandler):
             self.send_stream_status()
         elif self.path == '/api/system/stats':
             self.send_system_stats()
+        elif self.path == '/api/stream-profiles':
+            self.send_json_response(profiles.describe())
+        elif self.path == '/api/status':
+            self.send_json_response({'services': service_probe.probe()})
         elif self.path.startswith('/api/status/'):
             service = self.path.split('/')[-1]
             self.send_service_status(service)
@@ -27,6 +198,10 @@ class MediaStackAPIHandler(http.server.BaseHTTPRequestHandler):
             self.send_error(404, "API endpoint not found")
     
     def do_POST(self):
+        # Always drain the body so the next request on a keep-alive connection parses cleanly
+        content_length = int(self.headers.get('Content-Length', 0))
+        self.post_data = self.rfile.read(content_length)
+        
         if self.path == '/api/ghost-mode/toggle':
             self.toggle_ghost_mode()
         elif self.path == '/api/start-wrestling':
@@ -39,20 +214,32 @@ class MediaStackAPIHandler(http.server.BaseHTTPRequestHandler):
             self.send_error(404, "API endpoint not found")
     
     def send_json_response(self, data, status_code=200):
+        body = json.dumps(data).encode()
         self.send_response(status_code)
         self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
         self.send_header('Access-Control-Allow-Origin', '*')
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        self.wfile.write(body)
+    
+    def run_script(self, argv, timeout=SCRIPT_TIMEOUT):
+        """Run a helper script off the request pool; answers 503/504 itself and returns None on failure"""
+        try:
+            result = scripts.run(argv, timeout)
+        except TimeoutError as e:
+            self.send_json_response({'success': False, 'message': str(e)}, 504)
+            return None
+        if result is None:
+            self.send_json_response({'success': False, 'message': 'Busy running other scripts'}, 503)
+        return result
     
     def send_ghost_status(self):
         try:
-            with open('/home/lou/garuda-media-stack/ghost-mode-status.txt', 'r') as f:
-                status = f.read().strip()
-            
+            state = ghost_state.state()
             self.send_json_response({
-                'active': status == 'active',
-                'status': status,
+                'active': state['active'],
+                'status': 'active' if state['active'] else 'inactive',
+                'interface': state['interface'],
                 'timestamp': datetime.now().isoformat()
             })
         except:
@@ -60,8 +247,10 @@ class MediaStackAPIHandler(http.server.BaseHTTPRequestHandler):
     
     def send_stream_status(self):
         try:
-            result = subprocess.run(['/home/lou/garuda-media-stack/stream-manager.sh', 'status-json'], 
-                                  capture_output=True, text=True)
+            result = self.run_script(['/home/lou/garuda-media-stack/stream-manager.sh', 'status-json'],
+                                     STATUS_SCRIPT_TIMEOUT)
+            if result is None:
+                return
             if result.returncode == 0:
                 data = json.loads(result.stdout)
                 self.send_json_response(data)
@@ -71,44 +260,32 @@ class MediaStackAPIHandler(http.server.BaseHTTPRequestHandler):
             self.send_json_response({'active_streams': []})
     
     def send_service_status(self, service):
-        # Map service names to ports
-        ports = {
-            'jellyfin': 8096,
-            'radarr': 7878,
-            'sonarr': 8989,
-            'lidarr': 8686,
-            'jackett': 9117,
-            'qbittorrent': 5080,
-            'jellyseerr': 5055
-        }
+        try:
+            status = service_probe.status(service)
+        except:
+            self.send_json_response({'status': 'unknown'})
+            return
         
-        if service in ports:
-            try:
-                result = subprocess.run(['netstat', '-tln'], capture_output=True, text=True)
-                port_listening = f":{ports[service]}" in result.stdout
-                self.send_json_response({
-                    'status': 'online' if port_listening else 'offline',
-                    'port': ports[service]
-                })
-            except:
-                self.send_json_response({'status': 'unknown'})
+        if status is not None:
+            self.send_json_response(status)
         else:
             self.send_error(404, f"Unknown service: {service}")
     
     def send_system_stats(self):
         try:
-            # Get basic system stats
-            uptime_result = subprocess.run(['uptime'], capture_output=True, text=True)
-            uptime = uptime_result.stdout.strip() if uptime_result.returncode == 0 else "Unknown"
+            # Straight from /proc instead of forking uptime
+            uptime = read_proc_first_fields('/proc/uptime', 1)
+            load = read_proc_first_fields('/proc/loadavg', 3)
             
-            # VPN client count
-            wg_result = subprocess.run(['wg', 'show'], capture_output=True, text=True)
-            vpn_clients = wg_result.stdout.count('peer') if wg_result.returncode == 0 else 0
+            # VPN client count: peers across every WireGuard interface
+            wg = wireguard_stats.sample()
+            vpn_clients = sum(info['peer_count'] for info in wg['interfaces'].values())
             
             self.send_json_response({
-                'uptime': uptime.split('up ')[1].split(',')[0] if 'up ' in uptime else 'Unknown',
+                'uptime': format_uptime(uptime[0]) if uptime else 'Unknown',
+                'load_average': load,
                 'vpn_clients': vpn_clients,
-                'disk_usage': '75%',  # Placeholder
+                'disk_usage': stack_disk_usage(),
                 'timestamp': datetime.now().isoformat()
             })
         except:
@@ -116,54 +293,93 @@ class MediaStackAPIHandler(http.server.BaseHTTPRequestHandler):
     
     def toggle_ghost_mode(self):
         try:
-            result = subprocess.run(['/home/lou/garuda-media-stack/ghost-control.sh', 'toggle'], 
-                                  capture_output=True, text=True)
-            success = result.returncode == 0
+            activate = not ghost_state.active()
+            if activate:
+                commands = [['/home/lou/garuda-media-stack/ghost-control.sh', 'enable']]
+            else:
+                # Take down whichever tunnel is actually up, not only the one the script manages
+                commands = [['/home/lou/garuda-media-stack/ghost-control.sh', 'disable'] if name == GHOST_PRIMARY
+                            else ['wg-quick', 'down', name] for name in ghost_state.up_interfaces()]
+            output, errors = [], []
+            for argv in commands:
+                result = self.run_script(argv)
+                if result is None:
+                    return
+                output.append(result.stdout)
+                if result.returncode != 0:
+                    errors.append(result.stderr)
+            success = not errors and ghost_state.wait_for(activate, GHOST_SETTLE_TIMEOUT)
             self.send_json_response({
                 'success': success,
                 'status': 'toggled' if success else 'failed',
-                'message': result.stdout if success else result.stderr
+                'active': ghost_state.active(),
+                'message': ''.join(output) if success else ''.join(errors) or 'Tunnel state did not change'
             })
         except:
             self.send_json_response({'success': False, 'status': 'error'})
     
+    def choose_profile(self, plan):
+        """Encoder settings for a new stream, or None after answering 503 if the box is too busy"""
+        try:
+            return profiles.choose(plan)
+        except ProfileRefused as e:
+            self.send_json_response({'success': False, 'message': str(e), 'decision': e.decision}, 503)
+            return None
+    
+    def start_stream(self, argv, plan):
+        video = self.choose_profile(plan)
+        if video is None:
+            return
+        try:
+            result = self.run_script(argv + [f"{video['height']}p{video['fps']}", video['preset'], str(video['bitrate'])])
+        except OSError as e:
+            profiles.release(video)
+            self.send_json_response({'success': False, 'message': str(e)})
+            return
+        if result is None:
+            profiles.release(video)
+            return
+        success = result.returncode == 0
+        if not success:
+            profiles.release(video)
+        self.send_json_response({
+            'success': success,
+            'message': result.stdout if success else result.stderr,
+            'profile': video
+        })
+    
     def start_wrestling_stream(self):
         # Parse POST data
-        content_length = int(self.headers.get('Content-Length', 0))
-        post_data = self.rfile.read(content_length)
         try:
-            data = json.loads(post_data.decode())
+            data = json.loads(self.post_data.decode() or '{}')
             event = data.get('event', 'raw')
-            quality = data.get('quality', '720p')
-            
-            result = subprocess.run(['/home/lou/garuda-media-stack/stream-manager.sh', 
-                                   'start-wrestling', event, quality], 
-                                  capture_output=True, text=True)
-            success = result.returncode == 0
-            self.send_json_response({
-                'success': success,
-                'message': result.stdout if success else result.stderr
-            })
-        except:
+            plan = stream_plan(event, data.get('quality'), 'wwe-aew-streams.conf', 'WWE_STREAMS')
+        except UnknownQuality as e:
+            self.send_json_response({'success': False, 'message': str(e)}, 400)
+            return
+        except (ValueError, AttributeError):
             self.send_json_response({'success': False, 'message': 'Invalid request'})
+            return
+        self.start_stream(['/home/lou/garuda-media-stack/stream-manager.sh', 'start-wrestling', event], plan)
     
     def start_saints_stream(self):
         try:
-            result = subprocess.run(['/home/lou/garuda-media-stack/stream-manager.sh', 
-                                   'start-saints', 'regular', '1080p'], 
-                                  capture_output=True, text=True)
-            success = result.returncode == 0
-            self.send_json_response({
-                'success': success,
-                'message': result.stdout if success else result.stderr
-            })
-        except:
-            self.send_json_response({'success': False, 'message': 'Stream failed'})
+            data = json.loads(self.post_data.decode() or '{}')
+            game_type = data.get('game_type', 'regular')
+            plan = stream_plan(f'saints_{game_type}', data.get('quality'), 'saints-streams.conf', 'SAINTS_STREAMS')
+        except UnknownQuality as e:
+            self.send_json_response({'success': False, 'message': str(e)}, 400)
+            return
+        except (ValueError, AttributeError):
+            self.send_json_response({'success': False, 'message': 'Invalid request'})
+            return
+        self.start_stream(['/home/lou/garuda-media-stack/stream-manager.sh', 'start-saints', game_type], plan)
     
     def stop_streams(self):
         try:
-            result = subprocess.run(['/home/lou/garuda-media-stack/stream-manager.sh', 'stop'], 
-                                  capture_output=True, text=True)
+            result = self.run_script(['/home/lou/garuda-media-stack/stream-manager.sh', 'stop'])
+            if result is None:
+                return
             success = result.returncode == 0
             self.send_json_response({
                 'success': success,
@@ -173,7 +389,21 @@ class MediaStackAPIHandler(http.server.BaseHTTPRequestHandler):
             self.send_json_response({'success': False, 'message': 'Stop failed'})
 
 if __name__ == "__main__":
-    PORT = 8787
-    with socketserver.TCPServer(("", PORT), MediaStackAPIHandler) as httpd:
-        print(f"🚀 Media Stack API Server running on port {PORT}")
+    parser = argparse.ArgumentParser(description='Garuda Media Stack API server')
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--workers', type=int, default=16, help='request worker threads')
+    parser.add_argument('--script-workers', type=int, default=2, help='threads for helper scripts')
+    parser.add_argument('--single-threaded', action='store_true',
+                        help='legacy mode: one request at a time, HTTP/1.0')
+    args = parser.parse_args()
+    
+    scripts = ScriptRunner(workers=args.script_workers, max_pending=args.script_workers * 2)
+    if args.single_threaded:
+        MediaStackAPIHandler.protocol_version = 'HTTP/1.0'
+        httpd = socketserver.TCPServer(("", args.port), MediaStackAPIHandler)
+    else:
+        httpd = PooledHTTPServer(("", args.port), MediaStackAPIHandler, workers=args.workers)
+    ghost_state.start()
+    with httpd:
+        print(f"🚀 Media Stack API Server running on port {args.port}")
         httpd.serve_forever()
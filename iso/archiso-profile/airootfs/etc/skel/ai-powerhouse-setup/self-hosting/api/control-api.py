@@ -2,25 +2,217 @@
 """
 Control API Server for Garuda Media Stack Dashboard
 Provides REST endpoints for controlling Ghost Mode, VPN, streams, and system monitoring
+
+Runs on Flask by default. Start with --asgi (or CONTROL_API_MODE=asgi) to serve the
+same routes from Quart on an asyncio event loop, so slow shell-outs never hold a worker.
 """
 
+import asyncio
+import functools
+import hashlib
 import json
 import subprocess
-import time
+import sys
 import os
+import time
 import psutil
-from flask import Flask, jsonify, request
-from flask_cors import CORS
+
+ASGI_MODE = '--asgi' in sys.argv or os.environ.get('CONTROL_API_MODE') == 'asgi'
+
+if ASGI_MODE:
+    from quart import Quart as Flask, Response, g, jsonify, request
+    from quart_cors import cors
+else:
+    from flask import Flask, Response, g, jsonify, request
+    from flask_cors import CORS
+
+from action_guards import ResourceLocks, SingleFlight, TokenBucket
+from async_commands import AsyncCommandRunner
+from event_stream import StateBroadcaster
+from ghost_state import GhostModeState
+from health_prober import HealthProber
+from instrumentation import CommandStats, RequestProfiler, summarize_histogram
+from journal_tailer import JournalTailer
+from media_index import MediaIndex
+from metrics_store import MetricsRecorder, MetricsStore
+from net_listeners import SERVICE_PORTS, ListenerTable, ServiceProbe
+from prometheus_export import CONTENT_TYPE as PROMETHEUS_CONTENT_TYPE, Exposition, Histogram
+from response_cache import CacheEntry, ResponseCache, negotiate_encoding
+from restart_orchestrator import RestartOrchestrator, ServiceSpec
+from status_sampler import StatusSampler
+from stream_config import StreamCatalog
+from stream_supervisor import StreamSupervisor, count_live_encoders
+from transcode_profiles import ProfileRefused, ProfileSelector
+from wireguard_stats import WireGuardStats, interface_summary
 
 app = Flask(__name__)
-CORS(app)
+if ASGI_MODE:
+    app = cors(app)
+else:
+    CORS(app)
 
 STACK_PATH = "/mnt/home/lou/garuda-media-stack"
 
+WG_SERVER = 'wg-server0'
+
+# Tunnel ghost-mode-control.sh manages; other watched tunnels (wg0-client from ghost-control.sh)
+# are only ever taken down, directly with wg-quick
+GHOST_PRIMARY = 'wg-client0'
+
+# Seconds a ghost-mode toggle waits for the tunnel's link event before answering
+GHOST_SETTLE_TIMEOUT = float(os.environ.get('CONTROL_API_GHOST_SETTLE', '10'))
+
+# Background sampler tick and per-field TTLs (seconds)
+SAMPLE_INTERVAL = float(os.environ.get('CONTROL_API_SAMPLE_INTERVAL', '2'))
+SAMPLE_TTLS = {
+    'uptime': 60,
+    'wireguard': 5,
+    'disk': 30,
+    'disk_space': 30,
+    'ufw': 30,
+    'streams': 5
+}
+
+# How often /api/events re-collects state while clients are connected (seconds)
+EVENT_INTERVAL = float(os.environ.get('CONTROL_API_EVENT_INTERVAL', '2'))
+
+# Seconds a GET response is reused per endpoint + query string
+RESPONSE_CACHE_TTLS = {
+    'ghost_mode_status': 2,
+    'service_status': 1,
+    'system_stats': 2,
+    'wireguard_status': 2,
+    'wireguard_peers': 2,
+    'firewall_status': 5,
+    'proxy_status': 2,
+    'recent_logs': 2,
+    'streams_status': 2,
+    'storage_usage': 10,
+    'storage_growth': 60
+}
+
+# Token buckets for reads that are expensive on a cache miss: endpoint -> (tokens per second, burst)
+READ_RATE_LIMITS = {
+    'recent_logs': (2, 10),
+    'metrics_range': (5, 20),
+    'storage_usage': (1, 5),
+    'storage_growth': (1, 5),
+    'debug_timings': (1, 5)
+}
+
+# Cached endpoints whose answers change when a VPN or ghost-mode action runs
+VPN_ENDPOINTS = ('ghost_mode_status', 'system_stats', 'wireguard_status', 'wireguard_peers')
+
+# Seconds between samples written to the metrics store (finest tier)
+METRICS_INTERVAL = float(os.environ.get('CONTROL_API_METRICS_INTERVAL', '1'))
+
+# Stream definitions (*.conf); the deployed stack's copy wins over the one shipped next to the API
+STREAM_CONFIG_DIR = os.environ.get('CONTROL_API_STREAM_CONFIG') or next(
+    (d for d in (f"{STACK_PATH}/config", os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+     if os.path.isdir(d)), f"{STACK_PATH}/config")
+
+# Seconds without encoder progress before a stream is restarted
+STREAM_STALL_TIMEOUT = float(os.environ.get('CONTROL_API_STREAM_STALL_TIMEOUT', '30'))
+
+# Concurrent supervised encoders before new stream starts are refused
+MAX_STREAMS = int(os.environ.get('CONTROL_API_MAX_STREAMS', '3'))
+
+# Media libraries indexed for /api/storage/*: name -> directory and the service that fills it
+MEDIA_ROOT = os.environ.get('CONTROL_API_MEDIA_ROOT', '/mnt/media')
+MEDIA_LIBRARIES = {
+    'movies': {'path': f"{MEDIA_ROOT}/movies", 'service': 'radarr'},
+    'tv': {'path': f"{MEDIA_ROOT}/tv", 'service': 'sonarr'},
+    'music': {'path': f"{MEDIA_ROOT}/music", 'service': 'lidarr'},
+    'books': {'path': f"{MEDIA_ROOT}/books", 'service': 'readarr'},
+    'audiobooks': {'path': f"{MEDIA_ROOT}/audiobooks", 'service': 'audiobookshelf'},
+    'downloads': {'path': f"{MEDIA_ROOT}/downloads", 'service': 'qbittorrent'},
+    'torrents': {'path': f"{MEDIA_ROOT}/torrents", 'service': 'qbittorrent'},
+    'recordings': {'path': f"{STACK_PATH}/recordings", 'service': 'streams'}
+}
+MEDIA_INDEX_DB = os.environ.get('CONTROL_API_MEDIA_INDEX', f"{STACK_PATH}/data/media-index.sqlite")
+
+# HTTP health probes of every service: seconds between rounds, per-probe timeout, p95 that counts as degraded (ms)
+HEALTH_INTERVAL = float(os.environ.get('CONTROL_API_HEALTH_INTERVAL', '10'))
+HEALTH_TIMEOUT = float(os.environ.get('CONTROL_API_HEALTH_TIMEOUT', '5'))
+HEALTH_DEGRADED_MS = float(os.environ.get('CONTROL_API_HEALTH_DEGRADED_MS', '1000'))
+
+# Requests slower than this are logged with their endpoint (milliseconds)
+SLOW_REQUEST_MS = float(os.environ.get('CONTROL_API_SLOW_REQUEST_MS', '500'))
+
+# Parsed journal entries kept in memory for /api/logs/recent
+LOG_BUFFER_SIZE = int(os.environ.get('CONTROL_API_LOG_BUFFER', '2000'))
+
+# How long one /proc/net/tcp* scan is reused across port checks (seconds)
+LISTENER_TTL = float(os.environ.get('CONTROL_API_LISTENER_TTL', '1'))
+
+listener_table = ListenerTable(ttl=LISTENER_TTL)
+
+journal = JournalTailer(capacity=LOG_BUFFER_SIZE)
+
+ghost_state = GhostModeState()
+
+media_index = MediaIndex(MEDIA_INDEX_DB, MEDIA_LIBRARIES)
+
+service_probe = ServiceProbe(SERVICE_PORTS, table=listener_table)
+
+health_latency = Histogram('media_stack_service_health_duration_seconds',
+                           'Health endpoint response time by service', ('service',))
+
+health_prober = HealthProber(SERVICE_PORTS, interval=HEALTH_INTERVAL, timeout=HEALTH_TIMEOUT,
+                             degraded_ms=HEALTH_DEGRADED_MS, histogram=health_latency)
+
+# psutil.Process objects kept across requests so cpu_percent() has a baseline
+_process_cache = {}
+
+command_stats = CommandStats()
+
+commands = AsyncCommandRunner(stats=command_stats)
+
+profiler = RequestProfiler()
+
+response_cache = ResponseCache(RESPONSE_CACHE_TTLS)
+
+# Identical concurrent actions share one run; actions on the same resource queue behind each other
+single_flight = SingleFlight()
+resource_lock = ResourceLocks()
+read_buckets = {endpoint: TokenBucket(rate, burst) for endpoint, (rate, burst) in READ_RATE_LIMITS.items()}
+
+# Services handled by /api/services/restart-all; `after` orders startup
+_logs = f"{STACK_PATH}/logs"
+RESTART_SERVICES = [
+    ServiceSpec('jellyfin', ['/usr/bin/jellyfin', '--webdir=/usr/share/jellyfin/web', f'--datadir={STACK_PATH}/data/jellyfin', f'--cachedir={STACK_PATH}/cache/jellyfin'],
+                STACK_PATH, f"{_logs}/jellyfin.log", 8096),
+    ServiceSpec('qbittorrent', ['sudo', '-u', 'lou', '/usr/bin/qbittorrent-nox', '--webui-port=5080', f'--profile={STACK_PATH}/config/qbittorrent'],
+                STACK_PATH, f"{_logs}/qbittorrent.log", 5080),
+    ServiceSpec('jackett', ['/usr/bin/jackett', f'--DataFolder={STACK_PATH}/config/jackett', '--NoRestart'],
+                STACK_PATH, f"{_logs}/jackett.log", 9117),
+    ServiceSpec('radarr', ['/usr/bin/radarr', '-nobrowser', f'-data={STACK_PATH}/config/radarr'],
+                STACK_PATH, f"{_logs}/radarr.log", 7878, after=('jackett', 'qbittorrent')),
+    ServiceSpec('sonarr', ['/usr/bin/sonarr', '-nobrowser', f'-data={STACK_PATH}/config/sonarr'],
+                STACK_PATH, f"{_logs}/sonarr.log", 8989, after=('jackett', 'qbittorrent')),
+    ServiceSpec('lidarr', ['/usr/bin/lidarr', '-nobrowser', f'-data={STACK_PATH}/config/lidarr'],
+                STACK_PATH, f"{_logs}/lidarr.log", 8686, after=('jackett', 'qbittorrent')),
+    ServiceSpec('jellyseerr', ['node', 'dist/index.js'],
+                f"{STACK_PATH}/apps/jellyseerr", f"{_logs}/jellyseerr.log", 5055, match='dist/index.js', match_cwd=True,
+                after=('jellyfin', 'radarr', 'sonarr'))
+]
+
+def async_view(func):
+    """Serve a coroutine view natively under Quart, or run it to completion on the Flask worker"""
+    if ASGI_MODE:
+        return func
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return asyncio.run(func(*args, **kwargs))
+    return wrapper
+
 def run_command(cmd, shell=True):
     """Execute command and return result"""
+    started = time.perf_counter()
     try:
         result = subprocess.run(cmd, shell=shell, capture_output=True, text=True, timeout=10)
+        command_stats.record(cmd, time.perf_counter() - started, returncode=result.returncode)
         return {
             'success': result.returncode == 0,
             'stdout': result.stdout.strip(),
@@ -28,131 +220,423 @@ def run_command(cmd, shell=True):
             'returncode': result.returncode
         }
     except subprocess.TimeoutExpired:
+        command_stats.record(cmd, time.perf_counter() - started, timed_out=True)
         return {'success': False, 'error': 'Command timeout'}
     except Exception as e:
+        command_stats.record(cmd, time.perf_counter() - started, error=True)
         return {'success': False, 'error': str(e)}
 
 def check_service_port(port):
     """Check if service is running on port"""
     try:
-        for conn in psutil.net_connections():
-            if conn.laddr.port == port and conn.status == 'LISTEN':
-                return True
-        return False
+        return listener_table.is_listening(port)
     except:
         return False
 
 def get_ghost_mode_status():
     """Check if ghost mode (VPN client) is active"""
-    result = run_command('wg show wg-client0')
-    return result['success']
+    return ghost_state.active()
 
-def toggle_ghost_mode():
+async def toggle_ghost_mode():
     """Toggle ghost mode VPN client"""
-    if get_ghost_mode_status():
-        # Stop ghost mode
-        cmd = f"cd {STACK_PATH}/scripts && sudo ./ghost-mode-control.sh down"
-        result = run_command(cmd)
-        return {'active': False, 'message': 'Ghost Mode deactivated'}
+    scripts = f"{STACK_PATH}/scripts"
+    activate = not get_ghost_mode_status()
+    if activate:
+        await commands.run(['sudo', './ghost-mode-control.sh', 'up'], kind='ghost', cwd=scripts)
     else:
-        # Start ghost mode  
-        cmd = f"cd {STACK_PATH}/scripts && sudo ./ghost-mode-control.sh up"
-        result = run_command(cmd)
+        # Take down whichever tunnel is actually up, not only the one the script manages
+        for name in ghost_state.up_interfaces():
+            if name == GHOST_PRIMARY:
+                await commands.run(['sudo', './ghost-mode-control.sh', 'down'], kind='ghost', cwd=scripts)
+            else:
+                await commands.run(['sudo', 'wg-quick', 'down', name], kind='ghost')
+    # Answer with what the kernel reports, not what the script was asked to do
+    settled = await asyncio.to_thread(ghost_state.wait_for, activate, GHOST_SETTLE_TIMEOUT)
+    if not settled:
+        return {'active': not activate,
+                'message': f"Ghost Mode {'activation' if activate else 'deactivation'} did not take effect"}
+    if activate:
         return {'active': True, 'message': 'Ghost Mode activated'}
+    return {'active': False, 'message': 'Ghost Mode deactivated'}
+
+def process_details(pid):
+    """Return PID, CPU and RSS for a service process"""
+    try:
+        proc = _process_cache.get(pid)
+        if proc is None:
+            proc = _process_cache[pid] = psutil.Process(pid)
+        with proc.oneshot():
+            return {
+                'pid': pid,
+                'cpu_percent': proc.cpu_percent(interval=None),
+                'rss': proc.memory_info().rss
+            }
+    except psutil.Error:
+        _process_cache.pop(pid, None)
+        return {'pid': pid}
+
+def collect_service_status(details=False):
+    """Build every service's state from one listener scan"""
+    services = service_probe.probe(with_pids=details)
+    health = health_prober.state()
+    for name, entry in services.items():
+        # A listening port alone does not mean the web stack answers
+        if entry['status'] == 'online' and name in health:
+            entry['health'] = health[name]
+        if 'pid' in entry:
+            entry.update(process_details(entry['pid']))
+    if details:
+        live = {entry['pid'] for entry in services.values() if 'pid' in entry}
+        for pid in list(_process_cache):
+            if pid not in live:
+                _process_cache.pop(pid, None)
+    return services
+
+# ===== STATUS SAMPLER =====
+
+def sample_uptime():
+    """Human readable uptime"""
+    result = run_command(['uptime', '-p'], shell=False)
+    return result['stdout'] if result['success'] else 'Unknown'
+
+wireguard_stats = WireGuardStats()
+
+def stack_disk_usage():
+    """psutil disk usage for the filesystem holding the media stack"""
+    return psutil.disk_usage(STACK_PATH if os.path.exists(STACK_PATH) else '/')
+
+def sample_disk():
+    """Disk usage percentage for the media stack"""
+    try:
+        return f"{stack_disk_usage().percent:.0f}%"
+    except OSError:
+        return 'Unknown'
+
+def sample_disk_space():
+    """Byte counts for the media stack filesystem (for /metrics)"""
+    usage = stack_disk_usage()
+    return {'total': usage.total, 'used': usage.used, 'free': usage.free}
+
+def sample_ufw():
+    """UFW state and rule count"""
+    result = run_command(['sudo', 'ufw', 'status'], shell=False)
+    if not result['success']:
+        return {'available': False}
+    status_text = result['stdout']
+    return {
+        'available': True,
+        'active': 'Status: active' in status_text,
+        'rule_count': status_text.count('ALLOW')
+    }
+
+def recent_cpu_percent(window=30):
+    """CPU busy % averaged over the metrics store's last `window` seconds (instant reading if idle)"""
+    now = time.time()
+    history = metrics_store.query('cpu_percent', now - window, now)
+    points = history['points'] if history and metrics_recorder.running() else []
+    if not points:
+        return psutil.cpu_percent(interval=None)
+    return sum(v for _, v in points) / len(points)
+
+# max_streams counts every live encoder in the shared pids/ directory: ours, api-server.py's and stream-manager.sh's
+STREAM_PID_DIR = f"{STACK_PATH}/pids"
+profile_selector = ProfileSelector(recent_cpu_percent, lambda: count_live_encoders(STREAM_PID_DIR),
+                                   max_streams=MAX_STREAMS)
+
+stream_supervisor = StreamSupervisor(
+    StreamCatalog(STREAM_CONFIG_DIR, f"{STACK_PATH}/streams", f"{STACK_PATH}/recordings", STACK_PATH),
+    choose_video=profile_selector.choose, release_video=profile_selector.release, log_dir=_logs,
+    pid_dir=STREAM_PID_DIR, stall_timeout=STREAM_STALL_TIMEOUT
+)
+
+def sample_streams():
+    """Number of live encoders owned by the stream supervisor"""
+    return stream_supervisor.active()
+
+sampler = StatusSampler(interval=SAMPLE_INTERVAL)
+sampler.register('uptime', sample_uptime, SAMPLE_TTLS['uptime'])
+sampler.register('wireguard', wireguard_stats.sample, SAMPLE_TTLS['wireguard'])
+sampler.register('disk', sample_disk, SAMPLE_TTLS['disk'])
+sampler.register('disk_space', sample_disk_space, SAMPLE_TTLS['disk_space'])
+sampler.register('ufw', sample_ufw, SAMPLE_TTLS['ufw'])
+sampler.register('streams', sample_streams, SAMPLE_TTLS['streams'])
+
+# ===== METRICS HISTORY =====
+
+metrics_store = MetricsStore()
+
+_net_previous = {}
+
+def collect_metrics():
+    """One 1 s sample of host and per-service resource usage for the metrics store"""
+    sample = {
+        'cpu_percent': psutil.cpu_percent(interval=None),
+        'memory_percent': psutil.virtual_memory().percent
+    }
+    try:
+        sample['disk_percent'] = stack_disk_usage().percent
+    except OSError:
+        pass
+    net = psutil.net_io_counters()
+    now = time.monotonic()
+    if _net_previous:
+        elapsed = now - _net_previous['at']
+        sample['net_rx_rate'] = max(0, net.bytes_recv - _net_previous['rx']) / elapsed
+        sample['net_tx_rate'] = max(0, net.bytes_sent - _net_previous['tx']) / elapsed
+    _net_previous.update(at=now, rx=net.bytes_recv, tx=net.bytes_sent)
+    for name, entry in service_probe.probe(with_pids=True).items():
+        if 'pid' not in entry:
+            continue
+        try:
+            sample[f"rss:{name}"] = psutil.Process(entry['pid']).memory_info().rss
+        except psutil.Error:
+            pass
+    return sample
+
+def latest_metric(name, fallback):
+    """Most recent recorded value, or fallback() when the recorder is not running"""
+    value = metrics_store.latest(name) if metrics_recorder.running() else None
+    return fallback() if value is None else value
+
+metrics_recorder = MetricsRecorder(metrics_store, collect_metrics, interval=METRICS_INTERVAL)
+
+# ===== PUSH CHANNEL =====
+
+def collect_dashboard_state():
+    """State pushed to dashboards over /api/events"""
+    snapshot, _ = sampler.get_many('wireguard', 'disk', 'streams')
+    _, vpn_clients, _ = interface_summary(snapshot['wireguard'], WG_SERVER)
+    return {
+        'services': collect_service_status(),
+        'vpn_clients': vpn_clients,
+        'ghost_mode': ghost_state.active(),
+        'active_streams': snapshot['streams'],
+        'disk_usage': snapshot['disk']
+    }
+
+broadcaster = StateBroadcaster(collect_dashboard_state, interval=EVENT_INTERVAL)
+
+def ghost_mode_changed(state):
+    """Link event flipped ghost mode, possibly from outside the API: drop stale answers and push"""
+    sampler.invalidate('wireguard')
+    response_cache.invalidate(*VPN_ENDPOINTS)
+    broadcaster.poke()
+
+ghost_state.subscribe(ghost_mode_changed)
+
+restarter = RestartOrchestrator(RESTART_SERVICES, commands.spawn, check_service_port,
+                                invalidate=listener_table.invalidate)
+
+# ===== REQUEST METRICS =====
+
+request_latency = Histogram('media_stack_http_request_duration_seconds',
+                            'Control API request latency by endpoint', ('endpoint', 'method'))
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.profile = profiler.start()
+
+@app.after_request
+def record_request_latency(response):
+    # Registered before the cache hook, so it runs after it and sees the final cost
+    started = g.get('request_started')
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or 'unmatched'
+        request_latency.observe(elapsed, endpoint, request.method)
+        if elapsed * 1000 >= SLOW_REQUEST_MS:
+            app.logger.warning('Slow request: %s %s (%s) took %.0f ms',
+                               request.method, request.full_path, endpoint, elapsed * 1000)
+    return response
+
+@app.teardown_request
+def finish_request_profile(exc=None):
+    # Teardown runs even when the view raised, so the profiler is always released
+    token = g.pop('profile', None)
+    if token is not None:
+        profiler.finish(token, f"{request.method} {request.full_path}")
+
+# ===== RESPONSE CACHE =====
+
+def encoded_response(entry):
+    """Build a response for a cache entry in the encoding the client accepts"""
+    body, encoding = entry.encoded(negotiate_encoding(request.headers.get('Accept-Encoding')))
+    response = app.response_class(body, mimetype=entry.mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.before_request
+def serve_cached_response():
+    """Answer cacheable GETs from memory without running the view"""
+    if request.method != 'GET' or not response_cache.cacheable(request.endpoint):
+        return None
+    entry = response_cache.lookup(request.endpoint, request.full_path)
+    if entry is None:
+        return None
+    g.cache_hit = True
+    return encoded_response(entry)
+
+def finish_response(response, body):
+    """Cache a fresh JSON body and compress it for the client"""
+    if request.method == 'GET' and response_cache.cacheable(request.endpoint):
+        entry = response_cache.store(request.endpoint, request.full_path, body, response.mimetype)
+    else:
+        entry = CacheEntry(body, response.mimetype, 0)
+    encoded, encoding = entry.encoded(negotiate_encoding(request.headers.get('Accept-Encoding')))
+    if encoding:
+        response.set_data(encoded)
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+def needs_finishing(response):
+    return (not g.get('cache_hit')
+            and response.status_code == 200
+            and response.mimetype in ('application/json', 'text/plain')
+            and 'Content-Encoding' not in response.headers)
+
+if ASGI_MODE:
+    @app.after_request
+    async def cache_and_compress(response):
+        if needs_finishing(response):
+            return finish_response(response, await response.get_data())
+        return response
+else:
+    @app.after_request
+    def cache_and_compress(response):
+        if needs_finishing(response):
+            return finish_response(response, response.get_data())
+        return response
+
+# ===== RATE LIMITS =====
+
+@app.before_request
+def enforce_read_limits():
+    """Registered after the cache hook, so only cache misses spend tokens"""
+    bucket = read_buckets.get(request.endpoint)
+    if bucket is None:
+        return None
+    wait = bucket.take()
+    if not wait:
+        return None
+    response = jsonify({'error': 'Too many requests', 'retry_after': round(wait, 2)})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, round(wait)))
+    return response
 
 # ===== API ENDPOINTS =====
 
 @app.route('/api/ghost-mode/status', methods=['GET'])
 def ghost_mode_status():
     """Get Ghost Mode status"""
-    active = get_ghost_mode_status()
+    state = ghost_state.state()
     return jsonify({
-        'active': active,
-        'status': 'invisible' if active else 'visible'
+        'active': state['active'],
+        'status': 'invisible' if state['active'] else 'visible',
+        'interface': state['interface'],
+        'changed_at': state['changed_at']
     })
 
 @app.route('/api/ghost-mode/toggle', methods=['POST'])
-def ghost_mode_toggle():
-    """Toggle Ghost Mode"""
-    return jsonify(toggle_ghost_mode())
+@async_view
+async def ghost_mode_toggle():
+    """Toggle Ghost Mode; concurrent toggles join the one in flight instead of flipping it back"""
+    async def toggle():
+        async with resource_lock('vpn'):
+            result = await toggle_ghost_mode()
+        sampler.invalidate('wireguard')
+        response_cache.invalidate(*VPN_ENDPOINTS)
+        broadcaster.poke()
+        return result
+
+    result, joined = await single_flight.run('ghost-toggle', toggle)
+    return jsonify(dict(result, coalesced=joined))
 
 @app.route('/api/status/<service>', methods=['GET'])
 def service_status(service):
     """Check service status by port"""
-    port_map = {
-        'jellyfin': 8096,
-        'plex': 32400,
-        'radarr': 7878,
-        'sonarr': 8989,
-        'lidarr': 8686,
-        'readarr': 8787,
-        'qbittorrent': 5080,
-        'jackett': 9117,
-        'calibre-web': 8083,
-        'audiobookshelf': 13378,
-        'jellyseerr': 5055,
-        'pulsarr': 3030
-    }
-    
-    if service not in port_map:
+    entry = service_probe.status(service)
+    if entry is None:
         return jsonify({'status': 'unknown', 'error': 'Service not recognized'})
     
-    port = port_map[service]
-    online = check_service_port(port)
+    health = health_prober.state(service)
+    if entry['status'] == 'online' and health:
+        entry['health'] = health
+    entry['service'] = service
+    return jsonify(entry)
+
+@app.route('/api/status', methods=['GET'])
+def all_services_status():
+    """Check every service in one request; ?details=1 adds PID, CPU and RSS"""
+    details = request.args.get('details', '').lower() in ('1', 'true', 'yes')
+    services = collect_service_status(details)
+    body = json.dumps({'services': services}, sort_keys=True)
     
-    return jsonify({
-        'status': 'online' if online else 'offline',
-        'port': port,
-        'service': service
-    })
+    # Weak: cache_and_compress may gzip the body, and a strong tag must differ per encoding
+    etag = hashlib.md5(body.encode()).hexdigest()
+    
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class('', status=304)
+    else:
+        response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/events', methods=['GET'])
+def events():
+    """Stream dashboard state as Server-Sent Events: one 'state' frame, then 'delta' frames"""
+    response = Response(broadcaster.stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @app.route('/api/system/stats', methods=['GET'])
 def system_stats():
     """Get system statistics"""
     try:
-        # Get uptime
-        uptime_result = run_command('uptime -p')
-        uptime = uptime_result['stdout'] if uptime_result['success'] else 'Unknown'
-        
-        # Get VPN client count
-        wg_result = run_command('wg show wg-server0')
-        vpn_clients = 0
-        if wg_result['success'] and 'peer' in wg_result['stdout']:
-            vpn_clients = wg_result['stdout'].count('peer')
-        
-        # Get disk usage for media stack
-        df_result = run_command(f'df -h {STACK_PATH}')
-        disk_usage = 'Unknown'
-        if df_result['success']:
-            lines = df_result['stdout'].split('\n')
-            if len(lines) > 1:
-                parts = lines[1].split()
-                if len(parts) >= 5:
-                    disk_usage = parts[4]  # Usage percentage
+        snapshot, age = sampler.get_many('uptime', 'wireguard', 'disk')
+        _, vpn_clients, _ = interface_summary(snapshot['wireguard'], WG_SERVER)
         
         return jsonify({
-            'uptime': uptime,
+            'uptime': snapshot['uptime'],
             'vpn_clients': str(vpn_clients),
-            'disk_usage': disk_usage,
-            'cpu_percent': f"{psutil.cpu_percent()}%",
-            'memory_percent': f"{psutil.virtual_memory().percent:.1f}%"
+            'disk_usage': snapshot['disk'],
+            'cpu_percent': f"{latest_metric('cpu_percent', psutil.cpu_percent)}%",
+            'memory_percent': f"{psutil.virtual_memory().percent:.1f}%",
+            'sample_age': round(age, 2)
         })
     except Exception as e:
         return jsonify({'error': str(e)})
 
 @app.route('/api/vpn/<action>', methods=['POST'])
-def vpn_action(action):
+@async_view
+async def vpn_action(action):
     """Handle VPN management actions"""
     try:
         if action == 'status':
-            result = run_command('wg show')
-            return jsonify({'message': result['stdout'] if result['success'] else 'VPN status unavailable'})
-        elif action == 'start':
-            result = run_command('sudo wg-quick up wg-server0')
-            return jsonify({'message': 'VPN server started'})
-        elif action == 'stop':
-            result = run_command('sudo wg-quick down wg-server0')
-            return jsonify({'message': 'VPN server stopped'})
+            wireguard, _ = sampler.get('wireguard')
+            if not wireguard['available']:
+                return jsonify({'message': 'VPN status unavailable'})
+            lines = [
+                f"{iface}: {info['peer_count']} peers ({info['active_peers']} active)"
+                for iface, info in sorted(wireguard['interfaces'].items())
+            ]
+            return jsonify({'message': '\n'.join(lines) or 'No WireGuard interfaces up'})
+        elif action in ('start', 'stop'):
+            async def switch():
+                async with resource_lock('vpn'):
+                    await commands.run(['sudo', 'wg-quick', 'up' if action == 'start' else 'down', WG_SERVER], kind='wg')
+                sampler.invalidate('wireguard')
+                response_cache.invalidate(*VPN_ENDPOINTS)
+                broadcaster.poke()
+                return {'message': f"VPN server {'started' if action == 'start' else 'stopped'}"}
+
+            result, joined = await single_flight.run(f'vpn-{action}', switch)
+            return jsonify(dict(result, coalesced=joined))
         elif action == 'rotate-keys':
             # Key rotation would be complex, just return placeholder
             return jsonify({'message': 'Key rotation not implemented yet'})
@@ -165,20 +649,30 @@ def vpn_action(action):
 def wireguard_status():
     """Get WireGuard VPN status"""
     try:
-        server_result = run_command('wg show wg-server0')
-        client_result = run_command('wg show wg-client0')
-        
-        server_status = 'online' if server_result['success'] else 'offline'
-        client_count = 0
-        
-        if server_result['success'] and 'peer' in server_result['stdout']:
-            client_count = server_result['stdout'].count('peer')
+        wireguard, age = sampler.get('wireguard')
+        server_online, client_count, active_clients = interface_summary(wireguard, WG_SERVER)
+        client_connected = ghost_state.active()
         
         return jsonify({
-            'server_status': server_status,
-            'client_status': 'connected' if client_result['success'] else 'disconnected',
+            'server_status': 'online' if server_online else 'offline',
+            'client_status': 'connected' if client_connected else 'disconnected',
             'client_count': client_count,
-            'last_rotation': 'Recently rotated'
+            'active_clients': active_clients,
+            'last_rotation': 'Recently rotated',
+            'sample_age': round(age, 2)
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)})
+
+@app.route('/api/wireguard/peers', methods=['GET'])
+def wireguard_peers():
+    """Per-peer handshake age, transfer totals and throughput for every interface"""
+    try:
+        wireguard, age = sampler.get('wireguard')
+        return jsonify({
+            'available': wireguard['available'],
+            'interfaces': wireguard['interfaces'],
+            'sample_age': round(age, 2)
         })
     except Exception as e:
         return jsonify({'error': str(e)})
@@ -187,17 +681,14 @@ def wireguard_status():
 def firewall_status():
     """Get firewall status"""
     try:
-        ufw_result = run_command('sudo ufw status')
+        ufw, age = sampler.get('ufw')
         
-        if ufw_result['success']:
-            status_text = ufw_result['stdout']
-            is_active = 'Status: active' in status_text
-            rule_count = status_text.count('ALLOW')
-            
+        if ufw['available']:
             return jsonify({
-                'ufw_status': 'active' if is_active else 'inactive',
-                'rule_count': rule_count,
-                'blocked_count': 'N/A'  # Would need to parse logs for this
+                'ufw_status': 'active' if ufw['active'] else 'inactive',
+                'rule_count': ufw['rule_count'],
+                'blocked_count': 'N/A',  # Would need to parse logs for this
+                'sample_age': round(age, 2)
             })
         else:
             return jsonify({'error': 'Unable to check UFW status'})
@@ -217,103 +708,281 @@ def proxy_status():
 
 @app.route('/api/logs/recent', methods=['GET'])
 def recent_logs():
-    """Get recent system logs"""
+    """Get recent system logs; ?since=<cursor>&limit=&service= pages incrementally"""
     try:
-        # Get recent systemd logs
-        result = run_command('journalctl --no-pager -n 50 --output=short-iso')
-        
-        if result['success']:
-            log_lines = result['stdout'].split('\n')
-            entries = []
-            
-            for line in log_lines:
-                if line.strip():
-                    # Parse systemd log format
-                    parts = line.split(maxsplit=5)
-                    if len(parts) >= 6:
-                        entries.append({
-                            'timestamp': f"{parts[0]} {parts[1]}",
-                            'service': parts[3],
-                            'message': parts[5]
-                        })
-            
-            return jsonify({'entries': entries[-20:]})  # Last 20 entries
-        else:
-            return jsonify({'entries': [{'timestamp': 'N/A', 'service': 'system', 'message': 'Unable to fetch logs'}]})
+        limit = max(1, min(int(request.args.get('limit', 20)), LOG_BUFFER_SIZE))
+        return jsonify(journal.query(
+            since=request.args.get('since'),
+            limit=limit,
+            service=request.args.get('service')
+        ))
     except Exception as e:
         return jsonify({'entries': [{'timestamp': 'N/A', 'service': 'error', 'message': str(e)}]})
 
 @app.route('/api/services/restart-all', methods=['POST'])
-def restart_all_services():
+@async_view
+async def restart_all_services():
     """Restart all media stack services"""
+    async def restart():
+        async with resource_lock('services'):
+            result = await restarter.restart()
+        listener_table.invalidate()
+        response_cache.invalidate('service_status', 'proxy_status', 'streams_status')
+        broadcaster.poke()
+        return result
+
     try:
-        # Kill existing services gently
-        services_to_restart = [
-            'jellyfin', 'radarr', 'sonarr', 'lidarr', 
-            'qbittorrent', 'jackett', 'jellyseerr'
-        ]
-        
-        # Stop services
-        for service in services_to_restart:
-            run_command(f'pkill -f {service}')
-        
-        time.sleep(3)
-        
-        # Start services back up
-        startup_commands = [
-            f"cd {STACK_PATH} && nohup /usr/bin/jellyfin --webdir=/usr/share/jellyfin/web --datadir={STACK_PATH}/data/jellyfin --cachedir={STACK_PATH}/cache/jellyfin > {STACK_PATH}/logs/jellyfin.log 2>&1 &",
-            f"cd {STACK_PATH} && nohup /usr/bin/radarr -nobrowser -data={STACK_PATH}/config/radarr > {STACK_PATH}/logs/radarr.log 2>&1 &",
-            f"cd {STACK_PATH} && nohup /usr/bin/sonarr -nobrowser -data={STACK_PATH}/config/sonarr > {STACK_PATH}/logs/sonarr.log 2>&1 &",
-            f"cd {STACK_PATH} && nohup /usr/bin/lidarr -nobrowser -data={STACK_PATH}/config/lidarr > {STACK_PATH}/logs/lidarr.log 2>&1 &",
-            f"cd {STACK_PATH} && nohup sudo -u lou /usr/bin/qbittorrent-nox --webui-port=5080 --profile={STACK_PATH}/config/qbittorrent > {STACK_PATH}/logs/qbittorrent.log 2>&1 &",
-            f"cd {STACK_PATH} && nohup /usr/bin/jackett --DataFolder={STACK_PATH}/config/jackett --NoRestart > {STACK_PATH}/logs/jackett.log 2>&1 &",
-            f"cd {STACK_PATH}/apps/jellyseerr && nohup node dist/index.js > {STACK_PATH}/logs/jellyseerr.log 2>&1 &"
-        ]
-        
-        for cmd in startup_commands:
-            run_command(cmd)
-        
-        return jsonify({'message': 'All services restarted successfully'})
+        result, joined = await single_flight.run('restart-all', restart)
+        result = dict(result, coalesced=joined)
+        if result['ready'] == result['total']:
+            result['message'] = 'All services restarted successfully'
+        else:
+            result['message'] = f"{result['ready']}/{result['total']} services ready after restart"
+        return jsonify(result)
     except Exception as e:
         return jsonify({'error': str(e)})
 
+async def start_stream(name, **options):
+    """Start a supervised stream off the event loop and refresh the stream views"""
+    async def start():
+        async with commands.gate('stream'):
+            result = await asyncio.to_thread(stream_supervisor.start, name, **options)
+        sampler.invalidate('streams')
+        response_cache.invalidate('streams_status')
+        broadcaster.poke()
+        return result
+
+    # Double-clicks share one source lookup instead of racing two encoders
+    result, _ = await single_flight.run(f'stream-start-{name}', start)
+    return result
+
 @app.route('/api/streams/wrestling/start', methods=['POST'])
-def start_wrestling_stream():
-    """Start wrestling stream"""
+@async_view
+async def start_wrestling_stream():
+    """Start wrestling stream (?event=raw|smackdown|nxt|dynamite|rampage|collision&quality=)"""
     try:
-        cmd = f"cd {STACK_PATH}/streams && ./stream-manager.sh start wrestling"
-        result = run_command(cmd)
-        return jsonify({'message': 'Wrestling stream started'})
+        stream = await start_stream('wrestling', event=request.args.get('event'),
+                                    quality=request.args.get('quality'))
+        return jsonify({'message': 'Wrestling stream started', 'stream': stream})
+    except ProfileRefused as e:
+        return jsonify({'error': str(e), 'decision': e.decision}), 503
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)})
 
 @app.route('/api/streams/saints/start', methods=['POST'])
-def start_saints_stream():
-    """Start Saints stream"""
+@async_view
+async def start_saints_stream():
+    """Start Saints stream (?game_type=regular&channel=<OTA channel>&quality=)"""
+    try:
+        stream = await start_stream('saints', game_type=request.args.get('game_type'),
+                                    channel=request.args.get('channel'), quality=request.args.get('quality'))
+        return jsonify({'message': 'Saints stream started', 'stream': stream})
+    except ProfileRefused as e:
+        return jsonify({'error': str(e), 'decision': e.decision}), 503
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)})
+
+@app.route('/api/streams/hdhomerun/start', methods=['POST'])
+@async_view
+async def start_hdhomerun_stream():
+    """Start an HDHomeRun OTA stream (?channel=32.1&quality=)"""
     try:
-        cmd = f"cd {STACK_PATH}/streams && ./stream-manager.sh start saints"
-        result = run_command(cmd)
-        return jsonify({'message': 'Saints stream started'})
+        stream = await start_stream('hdhomerun', channel=request.args.get('channel'),
+                                    quality=request.args.get('quality'))
+        return jsonify({'message': 'HDHomeRun stream started', 'stream': stream})
+    except ProfileRefused as e:
+        return jsonify({'error': str(e), 'decision': e.decision}), 503
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)})
+
+@app.route('/api/streams/stop', methods=['POST'])
+@app.route('/api/streams/<name>/stop', methods=['POST'])
+@async_view
+async def stop_streams(name=None):
+    """Stop one supervised stream, or all of them"""
+    try:
+        stopped = await asyncio.to_thread(stream_supervisor.stop, name)
+        sampler.invalidate('streams')
+        response_cache.invalidate('streams_status')
+        broadcaster.poke()
+        return jsonify({'stopped': stopped})
+    except Exception as e:
+        return jsonify({'error': str(e)})
+
+@app.route('/api/streams/profiles', methods=['GET'])
+def stream_profiles():
+    """Current encoder headroom and recent accept/downgrade/refuse decisions"""
+    try:
+        return jsonify(profile_selector.describe())
     except Exception as e:
         return jsonify({'error': str(e)})
 
 @app.route('/api/streams/status', methods=['GET'])
 def streams_status():
-    """Get current streaming status"""
+    """Get current streaming status from the stream supervisor"""
     try:
-        # Check for active ffmpeg processes
-        result = run_command('pgrep -f "ffmpeg.*rtmp"')
-        active_streams = len(result['stdout'].split('\n')) if result['stdout'] else 0
-        
         return jsonify({
-            'active_streams': active_streams,
-            'wrestling_active': check_service_port(1935),
-            'saints_active': False,  # Would need more specific checking
-            'hdhomerun_active': check_service_port(5004)
+            'active_streams': stream_supervisor.active(),
+            'wrestling_active': stream_supervisor.active('wrestling'),
+            'saints_active': stream_supervisor.active('saints'),
+            'hdhomerun_active': stream_supervisor.active('hdhomerun'),
+            'streams': stream_supervisor.status()
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)})
+
+@app.route('/api/storage/usage', methods=['GET'])
+def storage_usage():
+    """What's using space: per-library and per-service totals plus the largest shows/movies (?library&limit)"""
+    try:
+        result = media_index.usage(request.args.get('library'), request.args.get('limit', 20, type=int))
+        disk, age = sampler.get('disk_space')
+        result['filesystem'] = disk
+        result['sample_age'] = round(age, 2)
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)})
+
+@app.route('/api/storage/growth', methods=['GET'])
+def storage_growth():
+    """Daily size per library and day-over-day growth (?days=30)"""
+    try:
+        return jsonify(media_index.growth(request.args.get('days', 30, type=int)))
+    except Exception as e:
+        return jsonify({'error': str(e)})
+
+@app.route('/api/metrics/range', methods=['GET'])
+def metrics_range():
+    """Historical samples for chart rendering (?metric=cpu_percent,rss:jellyfin&start&end&step)"""
+    try:
+        names = [n for n in request.args.get('metric', '').split(',') if n]
+        if not names:
+            return jsonify({'error': 'metric is required', 'metrics': metrics_store.metrics()}), 400
+        end = request.args.get('end', time.time(), type=float)
+        start = request.args.get('start', end - 3600, type=float)
+        step = request.args.get('step', None, type=int)
+        series = {}
+        for name in names:
+            result = metrics_store.query(name, start, end, step)
+            if result is not None:
+                series[name] = result
+        return jsonify({
+            'start': start,
+            'end': end,
+            'series': series,
+            'unknown': [n for n in names if n not in series]
         })
     except Exception as e:
         return jsonify({'error': str(e)})
 
+def write_prometheus_metrics(out):
+    """Fill an Exposition from sampled state only; nothing here forks"""
+    services = service_probe.probe()
+    out.family('media_stack_service_up', 'gauge', 'Whether the service port is listening')
+    for name, entry in services.items():
+        out.sample('media_stack_service_up', entry['status'] == 'online', service=name, port=entry['port'])
+    health = health_prober.state()
+    out.family('media_stack_service_healthy', 'gauge', 'Whether the health endpoint answered below 500 on the last probe')
+    for name, entry in health.items():
+        out.sample('media_stack_service_healthy', entry['consecutive_failures'] == 0, service=name)
+    out.family('media_stack_service_health_p95_seconds', 'gauge', 'p95 health endpoint latency over recent probes')
+    for name, entry in health.items():
+        p95 = entry['p95_ms']
+        out.sample('media_stack_service_health_p95_seconds', p95 / 1000 if p95 is not None else None, service=name)
+
+    snapshot, age = sampler.get_many('wireguard', 'streams', 'disk_space')
+    wireguard = snapshot['wireguard']
+    out.gauge('media_stack_wireguard_available', 'Whether the last wg dump succeeded',
+              wireguard.get('available', False))
+    interfaces = wireguard.get('interfaces', {})
+    out.family('media_stack_wireguard_peers', 'gauge', 'Configured WireGuard peers')
+    for iface, info in interfaces.items():
+        out.sample('media_stack_wireguard_peers', info.get('peer_count', 0), interface=iface)
+    out.family('media_stack_wireguard_active_peers', 'gauge', 'Peers with a recent handshake')
+    for iface, info in interfaces.items():
+        out.sample('media_stack_wireguard_active_peers', info.get('active_peers', 0), interface=iface)
+    peers = [(iface, key, peer) for iface, info in interfaces.items()
+             for key, peer in info.get('peers', {}).items()]
+    out.family('media_stack_wireguard_peer_handshake_age_seconds', 'gauge',
+               'Seconds since the latest handshake with the peer')
+    for iface, key, peer in peers:
+        out.sample('media_stack_wireguard_peer_handshake_age_seconds', peer.get('handshake_age'),
+                   interface=iface, public_key=key)
+    for field, direction, help_text in (('rx_bytes', 'receive', 'Bytes received from the peer'),
+                                        ('tx_bytes', 'transmit', 'Bytes sent to the peer')):
+        name = f'media_stack_wireguard_peer_{direction}_bytes_total'
+        out.family(name, 'counter', help_text)
+        for iface, key, peer in peers:
+            out.sample(name, peer.get(field), interface=iface, public_key=key)
+
+    out.gauge('media_stack_ghost_mode_active', 'Whether the ghost-mode client tunnel is up', ghost_state.active())
+    streams = snapshot['streams']
+    out.gauge('media_stack_active_streams', 'Live encoders owned by the stream supervisor',
+              streams if isinstance(streams, int) else None)
+    supervised = stream_supervisor.status().values()
+    for field, name, help_text in (
+            ('fps', 'media_stack_stream_fps', 'Encoder output frames per second'),
+            ('bitrate_kbps', 'media_stack_stream_bitrate_kbps', 'Encoder output bitrate'),
+            ('speed', 'media_stack_stream_speed_ratio', 'Encoding speed relative to realtime'),
+            ('dropped_frames', 'media_stack_stream_dropped_frames', 'Frames dropped by the encoder')):
+        out.family(name, 'gauge', help_text)
+        for stream in supervised:
+            out.sample(name, stream['progress'].get(field), stream=stream['name'])
+    out.family('media_stack_stream_restarts', 'gauge', 'Encoder restarts within the restart window')
+    for stream in supervised:
+        out.sample('media_stack_stream_restarts', stream['restarts'], stream=stream['name'])
+    disk = snapshot['disk_space']
+    if 'total' in disk:
+        out.gauge('media_stack_disk_size_bytes', 'Size of the media stack filesystem', disk['total'])
+        out.gauge('media_stack_disk_used_bytes', 'Used bytes on the media stack filesystem', disk['used'])
+        out.gauge('media_stack_disk_free_bytes', 'Free bytes on the media stack filesystem', disk['free'])
+    out.gauge('media_stack_sample_age_seconds', 'Age of the oldest sampled value in this scrape',
+              round(age, 3))
+    request_latency.write(out)
+    health_latency.write(out)
+    command_stats.write(out)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus text exposition of service, VPN, stream, disk and latency metrics"""
+    out = Exposition()
+    write_prometheus_metrics(out)
+    return Response(out.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.route('/api/debug/timings', methods=['GET'])
+def debug_timings():
+    """Per-route latency and per-command cost summaries (bucket-bound percentiles)"""
+    return jsonify({
+        'routes': summarize_histogram(request_latency),
+        'commands': command_stats.summary(),
+        'slow_request_ms': SLOW_REQUEST_MS
+    })
+
+@app.route('/api/debug/profile', methods=['GET', 'POST'])
+def debug_profile():
+    """POST ?requests=N[&sort=cumulative&engine=cprofile] profiles the next N requests; GET returns reports"""
+    if request.method == 'POST':
+        try:
+            profiler.arm(request.args.get('requests', 1, type=int),
+                         sort=request.args.get('sort', 'cumulative'),
+                         engine=request.args.get('engine', 'cprofile'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    return jsonify(profiler.status())
+
 if __name__ == '__main__':
-    print("Starting Garuda Media Stack Control API on port 8081...")
+    mode = 'ASGI' if ASGI_MODE else 'WSGI'
+    print(f"Starting Garuda Media Stack Control API ({mode}) on port 8081...")
+    sampler.start()
+    metrics_recorder.start()
+    journal.start()
+    media_index.start()
+    health_prober.start()
+    ghost_state.start()
     app.run(host='0.0.0.0', port=8081, debug=False)
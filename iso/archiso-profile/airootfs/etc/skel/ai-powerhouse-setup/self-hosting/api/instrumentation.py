@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Request and subprocess instrumentation for the Garuda Media Stack Control API
+Per-command wall time, exit codes and timeouts, plus on-demand profiling of the next N requests
+"""
+
+import cProfile
+import collections
+import io
+import pstats
+import threading
+import time
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+from async_commands import command_kind
+from prometheus_export import Histogram
+
+# Profiles kept for /api/debug/profile; older ones are dropped
+PROFILE_HISTORY = 20
+
+
+def command_label(cmd):
+    """Stable label for an argv list or a shell string: the program name, ignoring sudo"""
+    argv = cmd.split() if isinstance(cmd, str) else list(cmd)
+    return command_kind(argv) if argv else 'unknown'
+
+
+def bucket_quantile(histogram_entry, bounds, q):
+    """Upper bucket bound holding the q-th observation (None if nothing observed or past the last bucket)"""
+    cumulative, count, _ = histogram_entry
+    if not count:
+        return None
+    rank = q * count
+    for bound, seen in zip(bounds, cumulative):
+        if seen >= rank:
+            return bound if bound != float('inf') else None
+    return None
+
+
+def summarize_histogram(histogram):
+    """{label values joined by ' ': {count, avg, p50, p95, p99}} with bucket-bound percentiles"""
+    bounds = histogram.buckets + (float('inf'),)
+    summary = {}
+    for labels, entry in histogram.snapshot().items():
+        _, count, total = entry
+        summary[' '.join(labels)] = {
+            'count': count,
+            'avg': round(total / count, 6) if count else None,
+            'p50': bucket_quantile(entry, bounds, 0.50),
+            'p95': bucket_quantile(entry, bounds, 0.95),
+            'p99': bucket_quantile(entry, bounds, 0.99)
+        }
+    return summary
+
+
+class CommandStats:
+    """Wall time, exit codes, timeouts and launch errors per command"""
+
+    def __init__(self):
+        self.durations = Histogram('media_stack_command_duration_seconds',
+                                   'Wall time of commands run by the control API', ('command',))
+        self._exits = collections.Counter()     # (command, returncode) -> count
+        self._timeouts = collections.Counter()  # command -> count
+        self._errors = collections.Counter()    # command -> count (failed to launch)
+        self._lock = threading.Lock()
+
+    def record(self, cmd, elapsed, returncode=None, timed_out=False, error=False):
+        label = command_label(cmd)
+        self.durations.observe(elapsed, label)
+        with self._lock:
+            if timed_out:
+                self._timeouts[label] += 1
+            elif error:
+                self._errors[label] += 1
+            else:
+                self._exits[(label, returncode)] += 1
+
+    def summary(self):
+        """{command: {count, avg, p95, exit_codes, timeouts, errors}}"""
+        timings = summarize_histogram(self.durations)
+        with self._lock:
+            exits = dict(self._exits)
+            timeouts = dict(self._timeouts)
+            errors = dict(self._errors)
+        result = {}
+        for label, timing in timings.items():
+            result[label] = dict(timing,
+                                 exit_codes={str(code): n for (cmd, code), n in exits.items() if cmd == label},
+                                 timeouts=timeouts.get(label, 0),
+                                 errors=errors.get(label, 0))
+        return result
+
+    def write(self, out):
+        """Add command families to a prometheus_export.Exposition"""
+        self.durations.write(out)
+        with self._lock:
+            exits = sorted(self._exits.items(), key=str)
+            timeouts = sorted(self._timeouts.items())
+        out.family('media_stack_command_exits_total', 'counter', 'Commands that ran to completion by exit code')
+        for (label, code), count in exits:
+            out.sample('media_stack_command_exits_total', count, command=label, code=code)
+        out.family('media_stack_command_timeouts_total', 'counter', 'Commands killed for exceeding their timeout')
+        for label, count in timeouts:
+            out.sample('media_stack_command_timeouts_total', count, command=label)
+
+
+class RequestProfiler:
+    """Profile the next N requests, one at a time, and keep their reports"""
+
+    def __init__(self, history=PROFILE_HISTORY):
+        self._remaining = 0
+        self._sort = 'cumulative'
+        self._engine = 'cprofile'
+        self._reports = collections.deque(maxlen=history)
+        self._busy = threading.Lock()  # One active profiler per interpreter
+        self._lock = threading.Lock()
+
+    def engines(self):
+        return ['cprofile'] + (['pyinstrument'] if pyinstrument else [])
+
+    def arm(self, count, sort='cumulative', engine='cprofile'):
+        if engine not in self.engines():
+            raise ValueError(f'Profiler engine not available: {engine}')
+        if sort not in {key.value for key in pstats.SortKey}:
+            raise ValueError(f'Unknown sort key: {sort}')
+        with self._lock:
+            self._remaining = max(0, int(count))
+            self._sort = sort
+            self._engine = engine
+            self._reports.clear()
+
+    def status(self):
+        with self._lock:
+            return {
+                'remaining': self._remaining,
+                'sort': self._sort,
+                'engine': self._engine,
+                'engines': self.engines(),
+                'reports': list(self._reports)
+            }
+
+    def start(self):
+        """Begin profiling the current request if armed; returns a token for finish() or None"""
+        with self._lock:
+            if self._remaining <= 0 or not self._busy.acquire(blocking=False):
+                return None
+            self._remaining -= 1
+            engine, sort = self._engine, self._sort
+        if engine == 'pyinstrument':
+            profiler = pyinstrument.Profiler(async_mode='disabled')
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return (engine, sort, profiler, time.perf_counter())
+
+    def finish(self, token, label):
+        engine, sort, profiler, started = token
+        try:
+            if engine == 'pyinstrument':
+                profiler.stop()
+                text = profiler.output_text()
+            else:
+                profiler.disable()
+                buffer = io.StringIO()
+                pstats.Stats(profiler, stream=buffer).sort_stats(sort).print_stats(40)
+                text = buffer.getvalue()
+        finally:
+            self._busy.release()
+        with self._lock:
+            self._reports.append({
+                'request': label,
+                'engine': engine,
+                'elapsed': round(time.perf_counter() - started, 4),
+                'report': text
+            })
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Incremental journal tailer for the Garuda Media Stack Control API
+Follows journalctl once and keeps a bounded ring buffer of parsed entries addressable by cursor
+"""
+
+import collections
+import json
+import subprocess
+import threading
+from datetime import datetime
+
+
+def parse_journal_entry(line):
+    """Turn one `journalctl -o json` line into a dashboard log entry (None if unusable)"""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    cursor = record.get('__CURSOR')
+    if not cursor:
+        return None
+    message = record.get('MESSAGE', '')
+    if isinstance(message, list):
+        # Non-UTF-8 messages are exported as byte arrays
+        message = bytes(message).decode(errors='replace')
+    try:
+        stamp = datetime.fromtimestamp(int(record['__REALTIME_TIMESTAMP']) / 1e6)
+        timestamp = stamp.isoformat(timespec='seconds')
+    except (KeyError, ValueError):
+        timestamp = 'N/A'
+    unit = record.get('_SYSTEMD_UNIT', '')
+    return {
+        'cursor': cursor,
+        'timestamp': timestamp,
+        'service': record.get('SYSLOG_IDENTIFIER') or record.get('_COMM') or unit or 'system',
+        'unit': unit,
+        'message': message
+    }
+
+
+def matches_service(entry, service):
+    service = service.lower()
+    unit = entry['unit'].lower()
+    return (entry['service'].lower() == service
+            or unit == service
+            or unit == f'{service}.service')
+
+
+class JournalTailer:
+    """Follow the journal on a background thread into a cursor-indexed ring buffer"""
+
+    def __init__(self, capacity=2000, backlog=200, command=None):
+        self.capacity = capacity
+        self.backlog = backlog
+        self.command = command or ['journalctl', '--no-pager', '--follow', '--output=json']
+        self._entries = collections.deque(maxlen=capacity)
+        self._positions = {}   # cursor -> sequence number
+        self._seq = 0
+        self._last_cursor = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._proc = None
+
+    def start(self):
+        """Start following (idempotent)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='journal-tailer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._proc:
+            self._proc.terminate()
+
+    def _command(self):
+        # Resume after the last entry we hold so restarts neither drop nor duplicate lines
+        if self._last_cursor:
+            return self.command + [f'--after-cursor={self._last_cursor}']
+        return self.command + ['--lines', str(self.backlog)]
+
+    def _append(self, entry):
+        with self._lock:
+            self._seq += 1
+            if len(self._entries) == self.capacity:
+                self._positions.pop(self._entries[0][1]['cursor'], None)
+            self._entries.append((self._seq, entry))
+            self._positions[entry['cursor']] = self._seq
+            self._last_cursor = entry['cursor']
+
+    def _run(self):
+        delay = 1
+        while not self._stop.is_set():
+            try:
+                self._proc = subprocess.Popen(self._command(), stdout=subprocess.PIPE,
+                                              stderr=subprocess.DEVNULL, text=True)
+                for line in self._proc.stdout:
+                    entry = parse_journal_entry(line)
+                    if entry:
+                        self._append(entry)
+                        delay = 1
+                self._proc.wait()
+            except Exception:
+                pass
+            # journalctl exited (rotation, restart, missing binary): back off and resume
+            self._stop.wait(delay)
+            delay = min(delay * 2, 60)
+
+    def query(self, since=None, limit=20, service=None):
+        """Entries after cursor `since` (or the latest ones), optionally for one unit"""
+        self.start()
+        with self._lock:
+            entries = list(self._entries)
+            start_seq = self._positions.get(since) if since else None
+            last_cursor = self._last_cursor
+        reset = bool(since) and start_seq is None
+        if start_seq is not None:
+            entries = [e for seq, e in entries if seq > start_seq]
+        else:
+            entries = [e for _, e in entries]
+        if service:
+            entries = [e for e in entries if matches_service(e, service)]
+        if start_seq is not None:
+            # Paging forward: oldest first so the next `since` continues from here
+            page = entries[:limit]
+            cursor = page[-1]['cursor'] if page else last_cursor
+        else:
+            page = entries[-limit:]
+            cursor = last_cursor
+        return {
+            'entries': page,
+            'cursor': cursor,
+            'more': len(entries) > len(page) and start_seq is not None,
+            'reset': reset
+        }
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Prometheus text exposition for the Garuda Media Stack Control API
+Dependency-free families, samples and labelled latency histograms rendered in format 0.0.4
+"""
+
+import threading
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Request latency buckets (seconds); dashboard calls are either cached (~1 ms) or shell out (~1 s)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_value(value):
+    if value is True or value is False:
+        return '1' if value else '0'
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Exposition:
+    """Accumulates metric families and renders them as one scrape body"""
+
+    def __init__(self):
+        self._lines = []
+
+    def family(self, name, kind, help_text):
+        self._lines.append(f'# HELP {name} {help_text}')
+        self._lines.append(f'# TYPE {name} {kind}')
+
+    def sample(self, name, value, **labels):
+        if value is None:
+            return
+        if labels:
+            rendered = ','.join(f'{k}="{escape_label(v)}"' for k, v in labels.items())
+            name = f'{name}{{{rendered}}}'
+        self._lines.append(f'{name} {format_value(value)}')
+
+    def gauge(self, name, help_text, value, **labels):
+        """Shorthand for a single-sample gauge family"""
+        self.family(name, 'gauge', help_text)
+        self.sample(name, value, **labels)
+
+    def render(self):
+        return '\n'.join(self._lines) + '\n'
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values"""
+
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def snapshot(self):
+        """{label values: (cumulative bucket counts incl. +Inf, count, sum)}"""
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        result = {}
+        for labels, series in items:
+            cumulative, running = [], 0
+            for count in series[:-1]:
+                running += count
+                cumulative.append(running)
+            result[labels] = (cumulative, running, series[-1])
+        return result
+
+    def write(self, exposition):
+        exposition.family(self.name, 'histogram', self.help_text)
+        bounds = self.buckets + (float('inf'),)
+        for label_values, (cumulative, count, total) in sorted(self.snapshot().items()):
+            labels = dict(zip(self.label_names, label_values))
+            for bound, value in zip(bounds, cumulative):
+                exposition.sample(f'{self.name}_bucket', value, **labels, le=format_value(bound))
+            exposition.sample(f'{self.name}_sum', round(total, 6), **labels)
+            exposition.sample(f'{self.name}_count', count, **labels)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+WireGuard statistics provider for the Garuda Media Stack Control API
+Reads `wg show all dump` once per sample into a per-peer table with throughput from deltas
+"""
+
+import subprocess
+import threading
+import time
+
+# A peer counts as connected if it completed a handshake this recently (seconds)
+ACTIVE_HANDSHAKE_WINDOW = 180
+
+
+def parse_wg_dump(text):
+    """Parse `wg show all dump` into {interface: {'listen_port': int, 'peers': {pubkey: {...}}}}"""
+    interfaces = {}
+    for line in text.splitlines():
+        fields = line.split('\t')
+        if len(fields) == 5:
+            iface, _private_key, public_key, listen_port, _fwmark = fields
+            interfaces.setdefault(iface, {'peers': {}}).update({
+                'public_key': public_key,
+                'listen_port': int(listen_port) if listen_port.isdigit() else None
+            })
+        elif len(fields) == 9:
+            iface, public_key, _psk, endpoint, allowed_ips, handshake, rx, tx, keepalive = fields
+            interfaces.setdefault(iface, {'peers': {}})['peers'][public_key] = {
+                'endpoint': None if endpoint == '(none)' else endpoint,
+                'allowed_ips': [] if allowed_ips == '(none)' else allowed_ips.split(','),
+                'latest_handshake': int(handshake),
+                'rx_bytes': int(rx),
+                'tx_bytes': int(tx),
+                'persistent_keepalive': None if keepalive == 'off' else int(keepalive)
+            }
+    return interfaces
+
+
+class WireGuardStats:
+    """Sample WireGuard with one fork and derive handshake ages and per-second rates"""
+
+    def __init__(self, command=None):
+        self.command = command or ['wg', 'show', 'all', 'dump']
+        self._previous = {}   # (interface, pubkey) -> (monotonic time, rx, tx)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        """Return {'available': bool, 'interfaces': {...}} with per-peer derived fields"""
+        try:
+            result = subprocess.run(self.command, capture_output=True, text=True, timeout=10)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            return {'available': False, 'error': str(e), 'interfaces': {}}
+        if result.returncode != 0:
+            return {'available': False, 'error': result.stderr.strip(), 'interfaces': {}}
+        interfaces = parse_wg_dump(result.stdout)
+        self._derive(interfaces)
+        return {'available': True, 'interfaces': interfaces}
+
+    def _derive(self, interfaces):
+        now = time.time()
+        mono = time.monotonic()
+        seen = {}
+        with self._lock:
+            for iface, info in interfaces.items():
+                active = 0
+                for key, peer in info['peers'].items():
+                    handshake = peer['latest_handshake']
+                    peer['handshake_age'] = round(now - handshake) if handshake else None
+                    peer['active'] = bool(handshake) and now - handshake < ACTIVE_HANDSHAKE_WINDOW
+                    active += peer['active']
+                    previous = self._previous.get((iface, key))
+                    if previous and mono > previous[0]:
+                        elapsed = mono - previous[0]
+                        peer['rx_rate'] = max(0, peer['rx_bytes'] - previous[1]) / elapsed
+                        peer['tx_rate'] = max(0, peer['tx_bytes'] - previous[2]) / elapsed
+                    else:
+                        peer['rx_rate'] = peer['tx_rate'] = None
+                    seen[(iface, key)] = (mono, peer['rx_bytes'], peer['tx_bytes'])
+                info['peer_count'] = len(info['peers'])
+                info['active_peers'] = active
+            self._previous = seen
+
+
+def interface_summary(sample, iface):
+    """(online, peer_count, active_peers) for one interface from a sample"""
+    info = sample.get('interfaces', {}).get(iface)
+    if not info:
+        return False, 0, 0
+    return True, info.get('peer_count', 0), info.get('active_peers', 0)
@@ -15,12 +15,26 @@ log_message() {
     echo "[$(date '+%Y-%m-%d %H:%M:%S')] $1" | tee -a "$LOG_FILE"
 }
 
+# Live encode settings: quality (e.g. 720p or 1080p60), x264 preset, optional video kbit/s
+# (api-server.py picks these from current CPU headroom)
+hls_video_args() {
+    local quality="$1" preset="${2:-veryfast}" video_kbps="$3"
+    local height="${quality%%[pi]*}"
+    local fps="${quality#*[pi]}"
+    HLS_VIDEO_ARGS=(-c:v libx264 -preset "$preset" -tune zerolatency -vf "scale=-2:${height:-720}" -r "${fps:-30}")
+    if [[ -n "$video_kbps" ]]; then
+        HLS_VIDEO_ARGS+=(-b:v "${video_kbps}k" -maxrate "${video_kbps}k" -bufsize "$((video_kbps * 2))k")
+    fi
+}
+
 # Function to start WWE/AEW stream
 start_wrestling_stream() {
     local event_type="$1"
     local quality="${2:-720p}"
+    local preset="${3:-veryfast}"
+    local video_kbps="$4"
     
-    log_message "Starting $event_type wrestling stream at $quality quality"
+    log_message "Starting $event_type wrestling stream at $quality quality ($preset${video_kbps:+, ${video_kbps}k})"
     
     case "$event_type" in
         "raw"|"smackdown"|"nxt")
@@ -68,9 +82,9 @@ start_wrestling_stream() {
     log_message "Started $event_type stream recording (PID: $ffmpeg_pid)"
     
     # Start HLS stream for web viewing
+    hls_video_args "$quality" "$preset" "$video_kbps"
     nohup ffmpeg -i "$stream_url" \
-        -c:v libx264 -preset veryfast -tune zerolatency \
-        -s 1280x720 -r 30 \
+        "${HLS_VIDEO_ARGS[@]}" \
         -c:a aac -b:a 128k \
         -f hls -hls_time 6 -hls_list_size 10 -hls_flags delete_segments \
         "$STREAMS_DIR/${event_type}.m3u8" \
@@ -86,8 +100,10 @@ start_wrestling_stream() {
 start_saints_stream() {
     local game_type="${1:-regular}"  # regular, preseason, playoff
     local quality="${2:-1080p}"
+    local preset="${3:-veryfast}"
+    local video_kbps="$4"
     
-    log_message "Starting Saints $game_type game stream at $quality quality"
+    log_message "Starting Saints $game_type game stream at $quality quality ($preset${video_kbps:+, ${video_kbps}k})"
     
     # PRIORITY 1: Check HDHomeRun for local OTA broadcast (best quality, no buffering)
     log_message "Checking HDHomeRun for local Saints broadcast..."
@@ -147,9 +163,9 @@ start_saints_stream() {
     log_message "Started Saints game recording (PID: $ffmpeg_pid)"
     
     # Start HLS stream
+    hls_video_args "$quality" "$preset" "$video_kbps"
     nohup ffmpeg -i "$stream_url" \
-        -c:v libx264 -preset veryfast -tune zerolatency \
-        -s 1920x1080 -r 30 \
+        "${HLS_VIDEO_ARGS[@]}" \
         -c:a aac -b:a 192k \
         -f hls -hls_time 6 -hls_list_size 10 -hls_flags delete_segments \
         "$STREAMS_DIR/saints_live.m3u8" \
@@ -231,10 +247,10 @@ mkdir -p "$SCRIPT_DIR/pids"
 # Main command processing
 case "$1" in
     "start-wrestling")
-        start_wrestling_stream "$2" "$3"
+        start_wrestling_stream "$2" "$3" "$4" "$5"
         ;;
     "start-saints")
-        start_saints_stream "$2" "$3"
+        start_saints_stream "$2" "$3" "$4" "$5"
         ;;
     "stop")
         stop_all_streams
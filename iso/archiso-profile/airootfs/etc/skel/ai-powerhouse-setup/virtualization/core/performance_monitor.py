@@ -0,0 +1,222 @@
+"""
+Shared performance monitor for MobaLiveCD Linux
+One polling thread for every runner and window: it runs only while VMs are tracked or a UI is subscribed,
+reads all tracked PIDs in a single /proc pass and pushes snapshots to subscribers
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+PROCESS_STATES = {
+    'R': 'running',
+    'S': 'sleeping',
+    'D': 'disk-sleep',
+    'T': 'stopped',
+    't': 'tracing-stop',
+    'I': 'idle'
+}
+
+def read_proc_stat(pid: int) -> Optional[Dict]:
+    """State, CPU ticks, threads, start time and RSS of one process from /proc/<pid>/stat"""
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            data = f.read().decode()
+    except OSError:
+        return None
+    # comm may contain spaces and parentheses: split after the last ')'
+    fields = data[data.rfind(')') + 2:].split()
+    return {
+        'state': fields[0],
+        'ticks': int(fields[11]) + int(fields[12]),
+        'threads': int(fields[17]),
+        'start': int(fields[19]),
+        'rss': int(fields[21]) * PAGE_SIZE
+    }
+
+def read_system_times() -> Optional[tuple]:
+    """(busy, total) jiffies from the aggregate cpu line of /proc/stat"""
+    try:
+        with open('/proc/stat', 'r') as f:
+            values = [int(v) for v in f.readline().split()[1:]]
+    except (OSError, ValueError):
+        return None
+    idle = values[3] + (values[4] if len(values) > 4 else 0)   # idle + iowait
+    total = sum(values[:8])   # guest time is already counted in user/nice
+    return total - idle, total
+
+def read_memory_percent() -> Optional[float]:
+    """Used memory percentage (MemTotal - MemAvailable) from /proc/meminfo"""
+    meminfo = {}
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                key, value = line.split(':', 1)
+                meminfo[key] = int(value.split()[0])
+                if 'MemTotal' in meminfo and 'MemAvailable' in meminfo:
+                    break
+    except (OSError, ValueError):
+        return None
+    total = meminfo.get('MemTotal')
+    if not total:
+        return None
+    return (total - meminfo.get('MemAvailable', 0)) * 100.0 / total
+
+class PerformanceMonitor:
+    """Reference-counted poller: tracked VMs and subscribers keep it alive"""
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self._tracked = {}        # pid -> {'info': dict updated in place, 'on_exit': callable, ...}
+        self._subscribers = {}    # token -> callback(snapshot)
+        self._next_token = 0
+        self._system = None
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def track(self, pid: int, info: Dict, on_exit: Optional[Callable[[int], None]] = None,
+              probe: Optional[Callable[[], Dict]] = None):
+        """Keep `info` updated with the VM's CPU, RSS, threads, status and probe() results until it exits"""
+        stat = read_proc_stat(pid)
+        with self._lock:
+            self._tracked[pid] = {
+                'info': info,
+                'on_exit': on_exit,
+                'probe': probe,
+                'start': stat['start'] if stat else None,
+                'ticks': stat['ticks'] if stat else None,
+                'sampled_at': time.monotonic()
+            }
+        self._ensure_running()
+
+    def untrack(self, pid: int):
+        with self._lock:
+            self._tracked.pop(pid, None)
+
+    def subscribe(self, callback: Callable[[Dict], None]) -> int:
+        """Push every snapshot to callback (from the monitor thread); returns a token for unsubscribe()"""
+        with self._lock:
+            self._next_token += 1
+            token = self._next_token
+            self._subscribers[token] = callback
+            snapshot = self._snapshot
+        if snapshot is not None:
+            callback(snapshot)
+        self._ensure_running()
+        self._wake.set()   # New subscriber: fresh numbers now, not in `interval` seconds
+        return token
+
+    def unsubscribe(self, token: int):
+        with self._lock:
+            self._subscribers.pop(token, None)
+
+    def snapshot(self) -> Optional[Dict]:
+        """Latest pushed snapshot (None before the first poll)"""
+        with self._lock:
+            return self._snapshot
+
+    def running(self) -> bool:
+        with self._lock:
+            return self._thread is not None
+
+    def _ensure_running(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='performance-monitor', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self._poll()
+            except Exception as e:
+                print(f"Performance monitoring error: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            with self._lock:
+                if not self._tracked and not self._subscribers:
+                    # Nothing to watch: exit; the next track()/subscribe() starts a new thread
+                    self._thread = None
+                    self._system = None
+                    return
+
+    def _poll(self):
+        """One pass over /proc for the host and every tracked PID, then push to subscribers"""
+        now = time.monotonic()
+        system = read_system_times()
+        cpu_percent = None
+        if system and self._system:
+            busy, total = system[0] - self._system[0], system[1] - self._system[1]
+            cpu_percent = busy * 100.0 / total if total > 0 else 0.0
+        self._system = system
+
+        with self._lock:
+            tracked = list(self._tracked.items())
+        exited = []
+        vms = {}
+        for pid, entry in tracked:
+            stat = read_proc_stat(pid)
+            # Gone, reaped-pending zombie, or the PID was reused by another process
+            if stat is None or stat['state'] in ('Z', 'X') or \
+                    (entry['start'] is not None and stat['start'] != entry['start']):
+                exited.append((pid, entry))
+                continue
+            cpu = 0.0
+            if entry['ticks'] is not None and now > entry['sampled_at']:
+                cpu = (stat['ticks'] - entry['ticks']) / CLOCK_TICKS / (now - entry['sampled_at']) * 100
+            entry.update(ticks=stat['ticks'], sampled_at=now, start=stat['start'])
+            entry['info'].update({
+                'cpu_percent': cpu,
+                'memory_mb': stat['rss'] / (1024 * 1024),
+                'threads': stat['threads'],
+                'status': PROCESS_STATES.get(stat['state'], stat['state'])
+            })
+            if entry['probe']:
+                try:
+                    entry['info'].update(entry['probe']())
+                except Exception:
+                    pass   # Guest numbers are best effort; host numbers above still count
+            vms[pid] = dict(entry['info'])
+
+        with self._lock:
+            for pid, entry in exited:
+                if self._tracked.get(pid) is entry:
+                    del self._tracked[pid]
+            snapshot = {
+                'cpu_percent': cpu_percent,
+                'memory_percent': read_memory_percent(),
+                'vms': vms,
+                'timestamp': time.time()
+            }
+            self._snapshot = snapshot
+            subscribers = list(self._subscribers.values())
+
+        for pid, entry in exited:
+            if entry['on_exit']:
+                try:
+                    entry['on_exit'](pid)
+                except Exception as e:
+                    print(f"Performance monitor exit callback failed for {pid}: {e}")
+        for callback in subscribers:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                print(f"Performance monitor subscriber failed: {e}")
+
+_shared_monitor = None
+_shared_lock = threading.Lock()
+
+def shared_monitor() -> PerformanceMonitor:
+    """The process-wide monitor shared by every runner and window"""
+    global _shared_monitor
+    with _shared_lock:
+        if _shared_monitor is None:
+            _shared_monitor = PerformanceMonitor()
+        return _shared_monitor
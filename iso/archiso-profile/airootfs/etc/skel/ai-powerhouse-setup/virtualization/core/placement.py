@@ -0,0 +1,249 @@
+"""
+NUMA-aware VM placement for MobaLiveCD Linux
+Reads host topology from /sys (NUMA nodes, SMT siblings, L3 domains), gives each VM its own host cores,
+backs guest RAM with node-local memfd/hugepages and pins vCPU threads once QEMU reports them
+"""
+
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+# Machine RAM id used by -m on x86; keeping it lets snapshots move between backed and unbacked RAM
+RAM_BACKEND_ID = 'pc.ram'
+
+def parse_cpu_list(text: str) -> List[int]:
+    """'0-3,8,10-11' -> [0, 1, 2, 3, 8, 10, 11]"""
+    cpus = []
+    for part in text.strip().split(','):
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+def _read(path: Path) -> Optional[str]:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+@dataclass
+class HostCPU:
+    """One logical CPU and the domains it belongs to"""
+    cpu: int
+    core: Tuple[int, ...]      # SMT siblings sharing the physical core
+    node: int
+    l3: Tuple[int, ...]        # CPUs sharing the last-level cache
+
+@dataclass
+class HostTopology:
+    """Logical CPUs, per-node free memory and hugepage pools"""
+    cpus: Dict[int, HostCPU]
+    node_free_mb: Dict[int, int]
+    hugepage_kb: int
+    node_free_hugepages: Dict[int, int]
+
+    def nodes(self) -> List[int]:
+        return sorted({c.node for c in self.cpus.values()})
+
+def read_topology(sys_root: str = '/sys', allowed: Optional[Set[int]] = None) -> HostTopology:
+    """Host topology from sysfs, limited to the CPUs this process may run on"""
+    root = Path(sys_root)
+    cpu_root = root / 'devices' / 'system' / 'cpu'
+    node_root = root / 'devices' / 'system' / 'node'
+
+    online = parse_cpu_list(_read(cpu_root / 'online') or '0')
+    if allowed is None:
+        allowed = os.sched_getaffinity(0) if sys_root == '/sys' else set(online)
+
+    node_of = {}
+    node_free_mb = {}
+    for node_dir in sorted(node_root.glob('node[0-9]*')):
+        node = int(node_dir.name[4:])
+        for cpu in parse_cpu_list(_read(node_dir / 'cpulist') or ''):
+            node_of[cpu] = node
+        for line in (_read(node_dir / 'meminfo') or '').splitlines():
+            # "Node 0 MemFree:  123456 kB"
+            parts = line.split()
+            if len(parts) >= 4 and parts[2] == 'MemFree:':
+                node_free_mb[node] = int(parts[3]) // 1024
+
+    cpus = {}
+    for cpu in online:
+        if cpu not in allowed:
+            continue
+        cpu_dir = cpu_root / f'cpu{cpu}'
+        node = node_of.get(cpu, 0)
+        siblings = parse_cpu_list(_read(cpu_dir / 'topology' / 'thread_siblings_list') or str(cpu))
+        l3 = None
+        for index in sorted(cpu_dir.glob('cache/index[0-9]*')):
+            if _read(index / 'level') == '3':
+                l3 = parse_cpu_list(_read(index / 'shared_cpu_list') or '')
+        # No L3 information (some VMs, ARM boards): treat the NUMA node as the cache domain
+        l3 = l3 or [c for c, n in node_of.items() if n == node] or [cpu]
+        cpus[cpu] = HostCPU(cpu=cpu, core=tuple(sorted(siblings)), node=node, l3=tuple(sorted(l3)))
+
+    # Default hugepage size and the free pages per node
+    hugepage_kb = 0
+    for size_dir in sorted((root / 'kernel' / 'mm' / 'hugepages').glob('hugepages-*kB')):
+        size = int(size_dir.name[len('hugepages-'):-2])
+        if hugepage_kb == 0 or size == 2048:
+            hugepage_kb = size
+    node_free_hugepages = {}
+    if hugepage_kb:
+        for node in node_free_mb:
+            free = _read(node_root / f'node{node}' / 'hugepages' / f'hugepages-{hugepage_kb}kB' / 'free_hugepages')
+            node_free_hugepages[node] = int(free) if free else 0
+
+    return HostTopology(cpus=cpus, node_free_mb=node_free_mb, hugepage_kb=hugepage_kb,
+                        node_free_hugepages=node_free_hugepages)
+
+@dataclass
+class Placement:
+    """Host resources given to one VM"""
+    owner: str
+    host_cpus: List[int]
+    memory_mb: int
+    node: Optional[int] = None          # NUMA node the VM fits in, if any
+    hugepages: bool = False
+    pinned_threads: Dict[int, int] = field(default_factory=dict)   # vCPU thread id -> host CPU
+
+    def qemu_args(self, hugepage_kb: int) -> List[str]:
+        """Memory backend for node-local and/or hugepage-backed guest RAM ([] when neither applies)"""
+        if self.node is None and not self.hugepages:
+            return []
+        backend = f'memory-backend-memfd,id={RAM_BACKEND_ID},size={self.memory_mb}M'
+        if self.hugepages:
+            backend += f',hugetlb=on,hugetlbsize={hugepage_kb}K,prealloc=on'
+        if self.node is not None:
+            backend += f',host-nodes={self.node},policy=bind'
+        return ['-object', backend, '-machine', f'memory-backend={RAM_BACKEND_ID}']
+
+class PlacementEngine:
+    """Hands out non-overlapping host cores to concurrent VMs"""
+
+    def __init__(self, sys_root: str = '/sys', reserve_host_core: bool = True):
+        self.sys_root = sys_root
+        self.topology = read_topology(sys_root)
+        self._claimed: Dict[str, Placement] = {}
+        self._lock = threading.Lock()
+
+        # Keep the first physical core for the host (GTK, QEMU I/O) when there are cores to spare
+        self.reserved: Set[int] = set()
+        cores = {c.core for c in self.topology.cpus.values()}
+        if reserve_host_core and len(cores) > 2:
+            self.reserved = set(min(cores))
+
+    def claimed_cpus(self) -> Set[int]:
+        with self._lock:
+            return {cpu for p in self._claimed.values() for cpu in p.host_cpus}
+
+    def claimed_memory_mb(self) -> int:
+        with self._lock:
+            return sum(p.memory_mb for p in self._claimed.values())
+
+    def free_cpus(self) -> List[int]:
+        """Host CPUs no active VM is placed on"""
+        taken = self.claimed_cpus() | self.reserved
+        return sorted(c for c in self.topology.cpus if c not in taken)
+
+    def _pick(self, candidates: List[int], count: int) -> List[int]:
+        """`count` CPUs from candidates, whole free physical cores first so VMs never share a core"""
+        by_core: Dict[Tuple[int, ...], List[int]] = {}
+        for cpu in candidates:
+            by_core.setdefault(self.topology.cpus[cpu].core, []).append(cpu)
+        cores = sorted(by_core.items(), key=lambda item: (len(item[1]) != len(item[0]), item[0]))
+        picked = []
+        for _, cpus in cores:
+            picked.extend(sorted(cpus))
+        return picked[:count]
+
+    def plan(self, owner: str, vcpus: int, memory_mb: int) -> Optional[Placement]:
+        """Claim host cores for a VM: one L3 domain if possible, else one NUMA node, else anywhere.
+        None when the free cores cannot hold every vCPU (the VM then runs unpinned)."""
+        self.refresh()
+        with self._lock:
+            taken = {cpu for p in self._claimed.values() for cpu in p.host_cpus} | self.reserved
+            free = [c for c in sorted(self.topology.cpus) if c not in taken]
+            if vcpus < 1 or len(free) < vcpus:
+                return None
+
+            # Tightest domain first; within a level, best fit keeps larger domains free for larger VMs
+            l3_domains: Dict[Tuple[int, ...], List[int]] = {}
+            node_domains: Dict[int, List[int]] = {}
+            for cpu in free:
+                l3_domains.setdefault(self.topology.cpus[cpu].l3, []).append(cpu)
+                node_domains.setdefault(self.topology.cpus[cpu].node, []).append(cpu)
+
+            host_cpus = None
+            for domains in (list(l3_domains.values()), list(node_domains.values())):
+                fitting = [d for d in domains if len(d) >= vcpus]
+                if fitting:
+                    host_cpus = self._pick(min(fitting, key=len), vcpus)
+                    break
+            if host_cpus is None:
+                host_cpus = self._pick(free, vcpus)
+
+            nodes = {self.topology.cpus[c].node for c in host_cpus}
+            node = nodes.pop() if len(nodes) == 1 and len(self.topology.nodes()) > 1 else None
+            if node is not None and self.topology.node_free_mb.get(node, 0) < memory_mb:
+                node = None   # Not enough local memory: don't bind, let the kernel spread it
+
+            hugepages = False
+            page_kb = self.topology.hugepage_kb
+            if page_kb and (memory_mb * 1024) % page_kb == 0:
+                needed = memory_mb * 1024 // page_kb
+                pool_nodes = [node] if node is not None else list(self.topology.node_free_hugepages)
+                hugepages = sum(self.topology.node_free_hugepages.get(n, 0) for n in pool_nodes) >= needed
+
+            placement = Placement(owner=owner, host_cpus=host_cpus, memory_mb=memory_mb,
+                                  node=node, hugepages=hugepages)
+            self._claimed[owner] = placement
+            return placement
+
+    def placement_for(self, owner: str) -> Optional[Placement]:
+        with self._lock:
+            return self._claimed.get(owner)
+
+    def release(self, owner: str):
+        with self._lock:
+            self._claimed.pop(owner, None)
+
+    def refresh(self):
+        """Re-read free memory and hugepages (they change as VMs start and stop)"""
+        topology = read_topology(self.sys_root)
+        with self._lock:
+            self.topology.node_free_mb = topology.node_free_mb
+            self.topology.node_free_hugepages = topology.node_free_hugepages
+
+    def pin(self, owner: str, pid: int, vcpu_threads: List[Tuple[int, int]]) -> bool:
+        """Pin each (vcpu index, thread id) to its own host CPU and QEMU's other threads to the VM's set"""
+        placement = self.placement_for(owner)
+        if placement is None:
+            return False
+        try:
+            for index, thread_id in vcpu_threads:
+                cpu = placement.host_cpus[index % len(placement.host_cpus)]
+                os.sched_setaffinity(thread_id, {cpu})
+                placement.pinned_threads[thread_id] = cpu
+            tasks = [int(task) for task in os.listdir(f'/proc/{pid}/task')]
+        except OSError as e:
+            print(f"vCPU pinning incomplete for PID {pid}: {e}")
+            return False
+        # Main loop, I/O and worker threads share the VM's cores instead of roaming the host
+        for thread_id in tasks:
+            if thread_id in placement.pinned_threads:
+                continue
+            try:
+                os.sched_setaffinity(thread_id, set(placement.host_cpus))
+            except ProcessLookupError:
+                pass   # Short-lived worker thread already gone
+            except OSError as e:
+                print(f"vCPU pinning incomplete for PID {pid}: {e}")
+                return False
+        return True
@@ -0,0 +1,284 @@
+"""
+QMP control channel for MobaLiveCD Linux
+Async QEMU Machine Protocol client plus a blocking per-VM runtime API for the runner, UI and CLI
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import itertools
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+
+class QMPError(Exception):
+    """Error answer from QEMU, or a broken QMP connection"""
+
+    def __init__(self, error_class: str, desc: str):
+        super().__init__(f"{error_class}: {desc}")
+        self.error_class = error_class
+        self.desc = desc
+
+class QMPClient:
+    """One QMP connection: capability negotiation, id-matched commands and buffered events"""
+
+    def __init__(self, socket_path: str, event_history: int = 100):
+        self.socket_path = socket_path
+        self.version = None
+        self.events = collections.deque(maxlen=event_history)
+        self._event_callbacks: List[Callable[[Dict], None]] = []
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+
+    @property
+    def connected(self) -> bool:
+        return self._read_task is not None and not self._read_task.done()
+
+    def on_event(self, callback: Callable[[Dict], None]):
+        """Call callback(event) for every asynchronous QMP event (SHUTDOWN, STOP, BALLOON_CHANGE...)"""
+        self._event_callbacks.append(callback)
+
+    async def connect(self, timeout: float = 5.0):
+        """Open the socket, read the greeting and leave negotiation mode"""
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_unix_connection(self.socket_path), timeout)
+        greeting = json.loads(await asyncio.wait_for(self._reader.readline(), timeout))
+        if 'QMP' not in greeting:
+            await self.close()
+            raise QMPError('ProtocolError', f"unexpected greeting: {greeting}")
+        self.version = greeting['QMP'].get('version', {}).get('qemu')
+        self._read_task = asyncio.ensure_future(self._read_loop())
+        await self.execute('qmp_capabilities', timeout=timeout)
+
+    async def _read_loop(self):
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                if 'event' in message:
+                    self.events.append(message)
+                    for callback in list(self._event_callbacks):
+                        try:
+                            callback(message)
+                        except Exception as e:
+                            print(f"QMP event callback failed: {e}")
+                    continue
+                future = self._pending.pop(message.get('id'), None)
+                if future is None or future.done():
+                    continue
+                if 'error' in message:
+                    error = message['error']
+                    future.set_exception(QMPError(error.get('class', 'GenericError'), error.get('desc', '')))
+                else:
+                    future.set_result(message.get('return'))
+        finally:
+            # QEMU exited or closed the monitor: fail whatever is still waiting
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(QMPError('Disconnected', 'QMP connection closed'))
+            self._pending.clear()
+
+    async def execute(self, command: str, arguments: Optional[Dict] = None, timeout: float = 10.0):
+        """Run one QMP command and return its 'return' value; raises QMPError"""
+        if self._writer is None or (self._read_task is not None and self._read_task.done()):
+            raise QMPError('Disconnected', 'QMP connection is not open')
+        message_id = f"mlcd-{next(self._ids)}"
+        request = {'execute': command, 'id': message_id}
+        if arguments:
+            request['arguments'] = arguments
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        try:
+            self._writer.write(json.dumps(request).encode() + b'\n')
+            await self._writer.drain()
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise QMPError('Timeout', f"{command} did not answer within {timeout}s")
+        except OSError as e:
+            raise QMPError('Disconnected', str(e) or type(e).__name__)
+        finally:
+            self._pending.pop(message_id, None)
+
+    async def close(self):
+        if self._read_task:
+            self._read_task.cancel()
+            try:
+                await self._read_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        if self._writer:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+        self._reader = self._writer = self._read_task = None
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def qmp_loop() -> asyncio.AbstractEventLoop:
+    """Event loop thread shared by every VMRuntime; GTK and CLI threads submit to it"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='qmp', daemon=True).start()
+        return _loop
+
+def read_thread_cpu_seconds(pid: int, thread_id: int) -> Optional[float]:
+    """utime + stime of one QEMU thread (a vCPU) from /proc"""
+    try:
+        with open(f'/proc/{pid}/task/{thread_id}/stat', 'rb') as f:
+            data = f.read().decode()
+    except OSError:
+        return None
+    fields = data[data.rfind(')') + 2:].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+class VMRuntime:
+    """Blocking runtime API for one VM over its QMP socket (connects lazily, reconnects after errors)"""
+
+    def __init__(self, socket_path: str, pid: Optional[int] = None, timeout: float = 5.0):
+        self.socket_path = socket_path
+        self.pid = pid
+        self.timeout = timeout
+        self._client: Optional[QMPClient] = None
+        self._lock = threading.RLock()
+        self._last_summary: Optional[Dict] = None
+
+    def _call(self, command: str, arguments: Optional[Dict] = None, timeout: Optional[float] = None):
+        timeout = timeout or self.timeout
+
+        async def run():
+            if self._client is None or not self._client.connected:
+                client = QMPClient(self.socket_path)
+                try:
+                    await client.connect(timeout=self.timeout)
+                except QMPError:
+                    await client.close()
+                    raise
+                except (OSError, ValueError, asyncio.TimeoutError) as e:
+                    await client.close()
+                    raise QMPError('Disconnected', str(e) or type(e).__name__)
+                self._client = client
+            return await self._client.execute(command, arguments, timeout=timeout)
+
+        # One command in flight per VM keeps reconnects simple
+        with self._lock:
+            future = asyncio.run_coroutine_threadsafe(run(), qmp_loop())
+            try:
+                return future.result(timeout + self.timeout + 1)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                raise QMPError('Timeout', f"{command} did not answer within {timeout}s")
+
+    def events(self) -> List[Dict]:
+        """Recent QMP events seen on this connection"""
+        return list(self._client.events) if self._client else []
+
+    def status(self) -> Dict:
+        """{'status': 'running'|'paused'|'shutdown'|..., 'running': bool}"""
+        return self._call('query-status')
+
+    def vcpu_stats(self) -> List[Dict]:
+        """One entry per vCPU with its host thread and CPU seconds used so far"""
+        vcpus = []
+        for cpu in self._call('query-cpus-fast'):
+            thread_id = cpu.get('thread-id')
+            vcpus.append({
+                'cpu': cpu.get('cpu-index'),
+                'thread_id': thread_id,
+                'cpu_seconds': read_thread_cpu_seconds(self.pid, thread_id) if self.pid and thread_id else None
+            })
+        return vcpus
+
+    def block_stats(self) -> List[Dict]:
+        """Read/write byte and operation counters per block device"""
+        devices = []
+        for device in self._call('query-blockstats'):
+            stats = device.get('stats', {})
+            devices.append({
+                'device': device.get('device') or device.get('qdev') or device.get('node-name'),
+                'rd_bytes': stats.get('rd_bytes', 0),
+                'wr_bytes': stats.get('wr_bytes', 0),
+                'rd_operations': stats.get('rd_operations', 0),
+                'wr_operations': stats.get('wr_operations', 0)
+            })
+        return devices
+
+    def balloon_info(self) -> Optional[int]:
+        """Current guest memory in MB as reported by the balloon (None without a balloon device)"""
+        try:
+            return self._call('query-balloon')['actual'] // (1024 * 1024)
+        except QMPError as e:
+            if e.error_class == 'DeviceNotActive':
+                return None
+            raise
+
+    def balloon(self, target_mb: int):
+        """Ask the guest balloon driver to grow or shrink guest memory to target_mb"""
+        self._call('balloon', {'value': int(target_mb) * 1024 * 1024})
+
+    def powerdown(self):
+        """ACPI power button: the guest shuts itself down cleanly"""
+        self._call('system_powerdown')
+
+    def quit(self) -> bool:
+        """Make QEMU exit immediately (no signal, no wait); False if QMP is unreachable"""
+        try:
+            self.status()
+        except QMPError:
+            return False
+        try:
+            self._call('quit')
+        except QMPError:
+            pass   # QEMU may close the socket before its answer arrives
+        return True
+
+    def savevm(self, name: str, timeout: float = 120.0):
+        """Snapshot the running VM (needs a writable qcow2 disk); raises QMPError on failure"""
+        output = self._call('human-monitor-command', {'command-line': f'savevm {name}'}, timeout=timeout)
+        if output and output.strip():
+            raise QMPError('SavevmFailed', output.strip())
+
+    def loadvm(self, name: str, timeout: float = 120.0):
+        output = self._call('human-monitor-command', {'command-line': f'loadvm {name}'}, timeout=timeout)
+        if output and output.strip():
+            raise QMPError('LoadvmFailed', output.strip())
+
+    def summary(self) -> Dict:
+        """Guest-level numbers for the performance monitor.
+        Never waits behind a long command (savevm can take minutes): the shared monitor thread polls every VM,
+        so a busy channel returns the previous numbers marked 'busy'."""
+        if not self._lock.acquire(blocking=False):
+            return dict(self._last_summary or {}, guest_status='busy')
+        try:
+            status = self.status()
+            blocks = self.block_stats()
+            self._last_summary = {
+                'guest_status': status.get('status'),
+                'vcpus': len(self._call('query-cpus-fast')),
+                'block_read_mb': sum(d['rd_bytes'] for d in blocks) / (1024 * 1024),
+                'block_write_mb': sum(d['wr_bytes'] for d in blocks) / (1024 * 1024),
+                'balloon_mb': self.balloon_info()
+            }
+            return self._last_summary
+        finally:
+            self._lock.release()
+
+    def close(self):
+        client, self._client = self._client, None
+        if client:
+            asyncio.run_coroutine_threadsafe(client.close(), qmp_loop())
@@ -0,0 +1,206 @@
+"""
+Boot snapshot pool for MobaLiveCD Linux
+One small qcow2 state disk per ISO + machine configuration: save the booted desktop once with savevm,
+restore it with -loadvm on later launches, evict least-recently-used entries under a disk quota
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Internal snapshot name used for the booted-to-desktop state
+BOOT_SNAPSHOT = 'booted'
+
+DEFAULT_QUOTA_GB = 20
+
+# Virtual size of the state disk; vmstate is stored past the virtual disk, so this stays tiny
+STATE_DISK_SIZE = '64M'
+
+def default_pool_dir() -> Path:
+    """~/.cache/mobalivecd-ai/snapshots (honours XDG_CACHE_HOME)"""
+    cache_home = os.environ.get('XDG_CACHE_HOME') or str(Path.home() / '.cache')
+    return Path(cache_home) / 'mobalivecd-ai' / 'snapshots'
+
+def machine_signature(cmd: List[str]) -> List[str]:
+    """QEMU arguments that must match for a saved state to load.
+    Per-launch sockets and host placement (RAM backend, node binding) are dropped: they change between
+    launches but not the guest-visible machine."""
+    signature = []
+    args = cmd[1:]
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        value = args[i + 1] if i + 1 < len(args) else ''
+        if arg in ('-qmp', '-loadvm') or \
+                (arg in ('-object', '-machine') and value.startswith('memory-backend')):
+            i += 2
+            continue
+        signature.append(arg)
+        i += 1
+    return signature
+
+def snapshot_key(iso_path: str, signature: List[str], qemu_version: Optional[str] = None) -> str:
+    """Stable key for one ISO file (path, size, mtime) booted with one machine configuration"""
+    real_path = os.path.realpath(iso_path)
+    st = os.stat(real_path)
+    identity = [real_path, st.st_size, st.st_mtime_ns, qemu_version, signature]
+    return hashlib.sha256(json.dumps(identity).encode()).hexdigest()[:16]
+
+def disk_usage(path: Path) -> int:
+    """Bytes actually allocated for a file (qcow2 images are sparse)"""
+    try:
+        return os.stat(path).st_blocks * 512
+    except OSError:
+        return 0
+
+@dataclass
+class SnapshotSlot:
+    """State disk prepared for one launch"""
+    key: str
+    disk_path: str
+    has_snapshot: bool
+
+class SnapshotPool:
+    """Per-ISO state disks with a booted snapshot each, kept under a disk quota"""
+
+    def __init__(self, root: Optional[Path] = None, quota_gb: float = DEFAULT_QUOTA_GB,
+                 qemu_img: str = 'qemu-img'):
+        self.root = Path(root) if root else default_pool_dir()
+        self.quota_bytes = int(quota_gb * 1024 ** 3)
+        self.qemu_img = qemu_img
+        self._in_use: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.root / key
+
+    def _read_meta(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self._entry_dir(key) / 'meta.json', 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return meta if isinstance(meta, dict) else None
+
+    def _write_meta(self, key: str, meta: Dict):
+        """Write atomically so a concurrent launch never reads a half-written file"""
+        entry_dir = self._entry_dir(key)
+        fd, tmp_path = tempfile.mkstemp(dir=entry_dir, prefix='.meta-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(meta, f, indent=2)
+            os.replace(tmp_path, entry_dir / 'meta.json')
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def prepare(self, iso_path: str, cmd: List[str], qemu_version: Optional[str] = None) -> Optional[SnapshotSlot]:
+        """State disk for this ISO and command line (created on first use); None if qemu-img is unavailable"""
+        key = snapshot_key(iso_path, machine_signature(cmd), qemu_version)
+        entry_dir = self._entry_dir(key)
+        disk_path = entry_dir / 'state.qcow2'
+
+        with self._lock:
+            meta = self._read_meta(key)
+            if meta is None or not disk_path.exists():
+                try:
+                    entry_dir.mkdir(parents=True, exist_ok=True)
+                    subprocess.run(
+                        [self.qemu_img, 'create', '-q', '-f', 'qcow2', str(disk_path), STATE_DISK_SIZE],
+                        check=True, capture_output=True, timeout=30
+                    )
+                except (OSError, subprocess.SubprocessError) as e:
+                    print(f"Snapshot state disk not created: {e}")
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                    return None
+                meta = {
+                    'iso_path': os.path.realpath(iso_path),
+                    'created_at': time.time(),
+                    'saved_at': None
+                }
+            meta['last_used'] = time.time()
+            self._write_meta(key, meta)
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+
+        return SnapshotSlot(key=key, disk_path=str(disk_path), has_snapshot=bool(meta.get('saved_at')))
+
+    def release(self, key: str):
+        """The VM using this entry has stopped; it may be evicted again"""
+        with self._lock:
+            count = self._in_use.get(key, 0) - 1
+            if count > 0:
+                self._in_use[key] = count
+            else:
+                self._in_use.pop(key, None)
+
+    def command_args(self, slot: SnapshotSlot, restore: bool = True) -> List[str]:
+        """Attach the state disk (no guest device, so the guest never sees it) and optionally resume from it"""
+        args = ['-drive', f'file={slot.disk_path},format=qcow2,if=none,id=snapstate']
+        if restore and slot.has_snapshot:
+            args.extend(['-loadvm', BOOT_SNAPSHOT])
+        return args
+
+    def mark_saved(self, key: str):
+        """Record a successful savevm of the boot snapshot, then enforce the quota"""
+        with self._lock:
+            meta = self._read_meta(key)
+            if meta is None:
+                return
+            meta['saved_at'] = meta['last_used'] = time.time()
+            self._write_meta(key, meta)
+        self.enforce_quota()
+
+    def drop_snapshot(self, key: str):
+        """Forget a boot snapshot that failed to load (QEMU upgrade, changed devices...)"""
+        with self._lock:
+            if key in self._in_use:
+                # A running VM holds the image; start it over with a fresh state disk next time
+                meta = self._read_meta(key)
+                if meta is not None:
+                    meta['saved_at'] = None
+                    self._write_meta(key, meta)
+                return
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    def entries(self) -> List[Dict]:
+        """Every pool entry with its metadata and allocated size, least recently used first"""
+        entries = []
+        if not self.root.is_dir():
+            return entries
+        for entry_dir in self.root.iterdir():
+            meta = self._read_meta(entry_dir.name)
+            if meta is None:
+                continue
+            entries.append(dict(meta, key=entry_dir.name, size_bytes=disk_usage(entry_dir / 'state.qcow2'),
+                                in_use=entry_dir.name in self._in_use))
+        entries.sort(key=lambda e: e.get('last_used', 0))
+        return entries
+
+    def usage(self) -> int:
+        return sum(e['size_bytes'] for e in self.entries())
+
+    def enforce_quota(self) -> List[str]:
+        """Delete least-recently-used entries not in use until the pool fits the quota; returns evicted keys"""
+        evicted = []
+        with self._lock:
+            entries = self.entries()
+            total = sum(e['size_bytes'] for e in entries)
+            for entry in entries:
+                if total <= self.quota_bytes:
+                    break
+                if entry['in_use']:
+                    continue
+                shutil.rmtree(self._entry_dir(entry['key']), ignore_errors=True)
+                total -= entry['size_bytes']
+                evicted.append(entry['key'])
+        for key in evicted:
+            print(f"🧹 Evicted boot snapshot {key} (quota {self.quota_bytes // 1024 ** 2}MB)")
+        return evicted
@@ -76,7 +76,8 @@ class AIEnhancedMobaLiveCDApplication(Adw.Application):
             'advanced': {
                 'qemu_debug': False,
                 'performance_monitoring_interval': 5,
-                'max_concurrent_vms': 5
+                'max_concurrent_vms': 5,
+                'snapshot_quota_gb': 20
             }
         }
         
@@ -216,6 +217,12 @@ class AIEnhancedMobaLiveCDApplication(Adw.Application):
             help='Disable KVM acceleration'
         )
         
+        parser.add_argument(
+            '--fresh-boot',
+            action='store_true',
+            help='Ignore the saved boot snapshot for quick launch'
+        )
+        
         parser.add_argument(
             '--debug',
             action='store_true',
@@ -259,6 +266,7 @@ class AIEnhancedMobaLiveCDApplication(Adw.Application):
                 from core.enhanced_qemu_runner import AIEnhancedQEMURunner
                 
                 runner = AIEnhancedQEMURunner()
+                runner.snapshot_pool.quota_bytes = int(self.config['advanced']['snapshot_quota_gb'] * 1024 ** 3)
                 
                 # Build options
                 options = {}
@@ -272,6 +280,9 @@ class AIEnhancedMobaLiveCDApplication(Adw.Application):
                 if args.no_kvm:
                     options['enable_kvm'] = False
                 
+                if args.fresh_boot:
+                    options['fresh_boot'] = True
+                
                 # Launch VM
                 print(f"🚀 Quick launching: {os.path.basename(self.iso_file)}")
                 pid = runner.run_optimized_iso(self.iso_file, **options)
@@ -419,6 +430,19 @@ class AIEnhancedMobaLiveCDApplication(Adw.Application):
             lambda row, param: self._update_config('advanced', 'max_concurrent_vms', int(row.get_value())))
         limits_group.add(max_vms_row)
         
+        # Boot snapshot disk quota
+        quota_row = Adw.SpinRow()
+        quota_row.set_title("Boot Snapshot Quota (GB)")
+        quota_row.set_subtitle("Least recently used snapshots are removed above this size")
+        quota_adjustment = Gtk.Adjustment(
+            value=self.config['advanced']['snapshot_quota_gb'],
+            lower=1, upper=500, step_increment=1
+        )
+        quota_row.set_adjustment(quota_adjustment)
+        quota_row.connect('notify::value',
+            lambda row, param: self._on_snapshot_quota_changed(int(row.get_value())))
+        limits_group.add(quota_row)
+        
         performance_page.add(limits_group)
         dialog.add(performance_page)
         
@@ -445,6 +469,18 @@ class AIEnhancedMobaLiveCDApplication(Adw.Application):
         
         dialog.present()
     
+    def _on_snapshot_quota_changed(self, quota_gb):
+        """Save the quota and apply it to the running pool, evicting right away if it shrank"""
+        self._update_config('advanced', 'snapshot_quota_gb', quota_gb)
+        
+        runner = getattr(getattr(self, 'window', None), 'qemu_runner', None)
+        if runner is None:
+            return
+        runner.snapshot_pool.quota_bytes = int(quota_gb * 1024 ** 3)
+        
+        import threading
+        threading.Thread(target=runner.snapshot_pool.enforce_quota, daemon=True).start()
+    
     def _update_config(self, section, key, value):
         """Update configuration value"""
         if section in self.config:
@@ -0,0 +1,169 @@
+"""QMP client and VM runtime against a fake QEMU monitor on a unix socket"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from core.qmp_client import QMPClient, QMPError, VMRuntime
+
+GREETING = {'QMP': {'version': {'qemu': {'major': 8, 'minor': 2, 'micro': 0}}, 'capabilities': []}}
+
+
+class FakeQMP:
+    """QMP server on its own loop thread. `replies` maps a command to a function
+    (request) -> list of messages to send, or None to hang up instead of answering."""
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self.commands = []
+        self.connections = 0
+        self._writers = []
+        self.replies = {'query-status': lambda r: [{'return': {'status': 'running', 'running': True}, 'id': r['id']}]}
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        threading.Thread(target=self._run, args=(ready,), daemon=True).start()
+        ready.wait(5)
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(asyncio.start_unix_server(self._handle, self.socket_path))
+        ready.set()
+        self.loop.run_forever()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._writers.append(writer)
+        negotiated = False
+
+        def send(message):
+            writer.write(json.dumps(message).encode() + b'\n')
+
+        send(GREETING)
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            request = json.loads(line)
+            command = request['execute']
+            self.commands.append(command)
+            if command == 'qmp_capabilities':
+                negotiated = True
+                send({'return': {}, 'id': request['id']})
+            elif not negotiated:
+                send({'error': {'class': 'CommandNotFound', 'desc': 'Expecting capabilities negotiation'},
+                      'id': request['id']})
+            elif command in self.replies:
+                messages = self.replies[command](request)
+                if messages is None:
+                    break
+                for message in messages:
+                    send(message)
+            else:
+                send({'error': {'class': 'CommandNotFound', 'desc': f'The command {command} has not been found'},
+                      'id': request['id']})
+            await writer.drain()
+        writer.close()
+
+    async def _shutdown(self):
+        self.server.close()
+        for writer in self._writers:
+            writer.close()
+        await asyncio.sleep(0.05)   # Let the handlers see EOF and return
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+@pytest.fixture
+def qemu(tmp_path):
+    fake = FakeQMP(str(tmp_path / 'qmp.sock'))
+    yield fake
+    fake.close()
+
+
+def run_client(qemu, body):
+    async def main():
+        client = QMPClient(qemu.socket_path)
+        await client.connect(timeout=2)
+        try:
+            return await body(client)
+        finally:
+            await client.close()
+    return asyncio.run(main())
+
+
+def test_connect_negotiates_capabilities_and_reads_version(qemu):
+    async def body(client):
+        return client.version, await client.execute('query-status')
+
+    version, status = run_client(qemu, body)
+    assert version == {'major': 8, 'minor': 2, 'micro': 0}
+    assert status == {'status': 'running', 'running': True}
+    assert qemu.commands == ['qmp_capabilities', 'query-status']
+
+
+def test_error_answer_raises_with_class(qemu):
+    async def body(client):
+        with pytest.raises(QMPError) as info:
+            await client.execute('query-nothing')
+        return info.value
+
+    error = run_client(qemu, body)
+    assert error.error_class == 'CommandNotFound'
+
+
+def test_events_interleaved_with_replies_reach_callbacks(qemu):
+    # QEMU may emit events before a reply, and answer out of order when commands overlap:
+    # 'stop' only gets its reply after 'cont' has been answered
+    held = []
+    qemu.replies['stop'] = lambda r: held.append(r) or [{'event': 'STOP', 'timestamp': {'seconds': 1, 'microseconds': 0}}]
+    qemu.replies['cont'] = lambda r: [{'event': 'RESUME', 'timestamp': {'seconds': 2, 'microseconds': 0}},
+                                      {'return': {}, 'id': r['id']},
+                                      {'return': {}, 'id': held[0]['id']}]
+    seen = []
+
+    async def body(client):
+        client.on_event(lambda event: seen.append(event['event']))
+        stop = asyncio.ensure_future(client.execute('stop'))
+        await asyncio.sleep(0.05)
+        cont = await client.execute('cont')
+        return await stop, cont
+
+    assert run_client(qemu, body) == ({}, {})
+    assert seen == ['STOP', 'RESUME']
+
+
+def test_disconnect_fails_pending_command_and_later_calls(qemu):
+    qemu.replies['quit'] = lambda r: None
+
+    async def body(client):
+        with pytest.raises(QMPError) as pending:
+            await client.execute('quit', timeout=2)
+        await asyncio.sleep(0.05)
+        with pytest.raises(QMPError) as later:
+            await client.execute('query-status')
+        return pending.value, later.value, client.connected
+
+    pending, later, connected = run_client(qemu, body)
+    assert pending.error_class == later.error_class == 'Disconnected'
+    assert not connected
+
+
+def test_runtime_reconnects_after_monitor_drops(qemu):
+    runtime = VMRuntime(qemu.socket_path, timeout=2)
+    try:
+        assert runtime.status()['status'] == 'running'
+        qemu.replies['system_powerdown'] = lambda r: None
+        with pytest.raises(QMPError):
+            runtime.powerdown()
+        assert runtime.status()['running'] is True
+        assert qemu.connections == 2
+    finally:
+        runtime.close()
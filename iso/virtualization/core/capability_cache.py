@@ -0,0 +1,105 @@
+"""
+Host capability cache for MobaLiveCD Linux
+Persists probed QEMU/CPU/GPU capabilities so startup can skip the probing
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+CACHE_VERSION = 1
+
+# Re-probe in the background once a cached entry is older than this, even if the fingerprint matches
+REFRESH_AFTER = 24 * 3600
+
+def default_cache_path() -> Path:
+    """~/.cache/mobalivecd-ai/host-capabilities.json (honours XDG_CACHE_HOME)"""
+    cache_home = os.environ.get('XDG_CACHE_HOME') or str(Path.home() / '.cache')
+    return Path(cache_home) / 'mobalivecd-ai' / 'host-capabilities.json'
+
+def host_fingerprint(qemu_candidates: Iterable[str]) -> Dict:
+    """Cheap facts that invalidate cached capabilities when they change (no forks)"""
+    qemu = {}
+    for binary in qemu_candidates:
+        path = shutil.which(binary)
+        if not path:
+            continue
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        qemu[binary] = [path, st.st_mtime_ns, st.st_size]
+
+    try:
+        kvm_stat = os.stat('/dev/kvm')
+        kvm = {
+            'present': True,
+            'accessible': os.access('/dev/kvm', os.R_OK | os.W_OK),
+            'mode': kvm_stat.st_mode,
+            'gid': kvm_stat.st_gid
+        }
+    except OSError:
+        kvm = {'present': False}
+
+    return {
+        'qemu': qemu,
+        'kernel': os.uname().release,
+        'kvm': kvm
+    }
+
+class CapabilityCache:
+    """JSON cache of host capabilities keyed by a host fingerprint"""
+
+    def __init__(self, path: Optional[Path] = None, refresh_after: float = REFRESH_AFTER):
+        self.path = Path(path) if path else default_cache_path()
+        self.refresh_after = refresh_after
+
+    def load(self, fingerprint: Dict) -> Optional[Dict]:
+        """Cached entry for this fingerprint, or None if missing, unreadable or stale"""
+        try:
+            with open(self.path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(entry, dict) or entry.get('version') != CACHE_VERSION:
+            return None
+        if entry.get('fingerprint') != fingerprint:
+            return None
+        return entry
+
+    def needs_refresh(self, entry: Dict) -> bool:
+        """Whether a fingerprint-valid entry is old enough to re-probe in the background"""
+        return time.time() - entry.get('probed_at', 0) > self.refresh_after
+
+    def store(self, fingerprint: Dict, capabilities: Dict) -> Dict:
+        """Write atomically so a concurrent launch never reads a half-written file"""
+        entry = {
+            'version': CACHE_VERSION,
+            'probed_at': time.time(),
+            'fingerprint': fingerprint,
+            'capabilities': capabilities
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix='.capabilities-')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(entry, f, indent=2)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            print(f"Capability cache not saved: {e}")
+        return entry
+
+    def clear(self):
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
@@ -14,7 +14,27 @@ import time
 import psutil
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
+
+from core.capability_cache import CapabilityCache, host_fingerprint
+from core.performance_monitor import PerformanceMonitor, shared_monitor
+from core.placement import PlacementEngine
+from core.qmp_client import QMPError, VMRuntime
+from core.snapshot_pool import BOOT_SNAPSHOT, SnapshotPool
+
+# QEMU binaries worth trying, with preference
+QEMU_CANDIDATES = [
+    ('qemu-system-x86_64', 10),  # Preferred for 64-bit
+    ('qemu-system-i386', 8),     # Fallback for 32-bit
+    ('qemu', 5),                 # Generic
+    ('qemu-kvm', 9)              # KVM-specific variant
+]
+
+def runtime_dir() -> Path:
+    """Per-user directory for QMP sockets and QEMU logs"""
+    path = Path(os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()) / 'mobalivecd-ai'
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    return path
 
 @dataclass
 class SystemCapabilities:
@@ -46,24 +66,71 @@ class ISOProfile:
 class AIEnhancedQEMURunner:
     """AI-powered QEMU runner with intelligent optimization"""
     
-    def __init__(self):
-        self.qemu_binary = self._find_optimal_qemu_binary()
-        self.system_caps = self._analyze_system_capabilities()
+    def __init__(self, capability_cache: Optional[CapabilityCache] = None,
+                 performance_monitor: Optional[PerformanceMonitor] = None,
+                 snapshot_pool: Optional[SnapshotPool] = None,
+                 placement_engine: Optional[PlacementEngine] = None):
+        self.capability_cache = capability_cache or CapabilityCache()
+        self.snapshot_pool = snapshot_pool or SnapshotPool()
+        self.placement_engine = placement_engine or PlacementEngine()
+        self.qemu_version = None
+        self._load_capabilities()
         self.iso_profiles = self._load_iso_profiles()
         self.active_processes = {}
-        self._init_performance_monitoring()
-        
-    def _find_optimal_qemu_binary(self) -> str:
-        """Find the best QEMU binary for the system"""
-        candidates = [
-            ('qemu-system-x86_64', 10),  # Preferred for 64-bit
-            ('qemu-system-i386', 8),     # Fallback for 32-bit
-            ('qemu', 5),                 # Generic
-            ('qemu-kvm', 9)              # KVM-specific variant
-        ]
-        
+        self.vm_runtimes: Dict[int, VMRuntime] = {}
+        self._init_performance_monitoring(performance_monitor)
+    
+    def _load_capabilities(self):
+        """Reuse cached host capabilities while the host fingerprint matches; probe otherwise"""
+        fingerprint = host_fingerprint(binary for binary, _ in QEMU_CANDIDATES)
+        entry = self.capability_cache.load(fingerprint)
+        if entry:
+            try:
+                self._apply_capabilities(entry['capabilities'])
+            except (KeyError, TypeError):
+                entry = None
+        
+        if entry is None:
+            self._apply_capabilities(self._probe_capabilities(fingerprint))
+        elif self.capability_cache.needs_refresh(entry):
+            # lspci and cpuinfo can change without the fingerprint noticing; re-probe off the startup path
+            threading.Thread(
+                target=self._refresh_capabilities,
+                args=(fingerprint,),
+                daemon=True
+            ).start()
+    
+    def _probe_capabilities(self, fingerprint: Dict) -> Dict:
+        """Run the full (slow) probe and store it in the cache"""
+        qemu_binary, qemu_version = self._find_optimal_qemu_binary()
+        capabilities = {
+            'qemu_binary': qemu_binary,
+            'qemu_version': qemu_version,
+            'system': asdict(self._analyze_system_capabilities())
+        }
+        self.capability_cache.store(fingerprint, capabilities)
+        return capabilities
+    
+    def _refresh_capabilities(self, fingerprint: Dict):
+        """Background re-probe for a cache entry that is valid but old"""
+        try:
+            self._apply_capabilities(self._probe_capabilities(fingerprint))
+        except Exception as e:
+            print(f"Capability refresh failed: {e}")
+    
+    def _apply_capabilities(self, capabilities: Dict):
+        """Install probed or cached capabilities on the runner"""
+        system = dict(capabilities['system'])
+        # Memory is cheap to read and may change (hotplug, VM resize): always live
+        system['memory_gb'] = psutil.virtual_memory().total / (1024**3)
+        self.system_caps = SystemCapabilities(**system)
+        self.qemu_version = capabilities.get('qemu_version')
+        self.qemu_binary = capabilities['qemu_binary']
+        
+    def _find_optimal_qemu_binary(self) -> Tuple[str, str]:
+        """Find the best QEMU binary for the system and its version line"""
         available = []
-        for binary, priority in candidates:
+        for binary, priority in QEMU_CANDIDATES:
             if shutil.which(binary):
                 # Check if it actually works
                 try:
@@ -74,7 +141,8 @@ class AIEnhancedQEMURunner:
                         timeout=5
                     )
                     if result.returncode == 0:
-                        available.append((binary, priority))
+                        version = result.stdout.strip().split('\n')[0]
+                        available.append((binary, priority, version))
                 except:
                     continue
         
@@ -82,7 +150,8 @@ class AIEnhancedQEMURunner:
             raise RuntimeError("No working QEMU binary found. Install qemu-system-x86 package")
         
         # Return highest priority binary
-        return max(available, key=lambda x: x[1])[0]
+        binary, _, version = max(available, key=lambda x: x[1])
+        return binary, version
     
     def _analyze_system_capabilities(self) -> SystemCapabilities:
         """Analyze system hardware capabilities using AI-driven detection"""
@@ -262,45 +331,37 @@ class AIEnhancedQEMURunner:
         
         return profiles
     
-    def _init_performance_monitoring(self):
-        """Initialize performance monitoring subsystem"""
-        self.performance_thread = threading.Thread(
-            target=self._monitor_performance,
-            daemon=True
-        )
-        self.performance_thread.start()
+    def _init_performance_monitoring(self, monitor: Optional[PerformanceMonitor] = None):
+        """Attach to the shared monitor; it only polls while VMs are tracked or a UI subscribes"""
+        self.performance_monitor = monitor or shared_monitor()
     
-    def _monitor_performance(self):
-        """Background performance monitoring"""
-        while True:
+    def _on_vm_exited(self, pid: int):
+        """Called by the performance monitor when a tracked QEMU process is gone"""
+        self._forget_vm(pid)
+    
+    def _forget_vm(self, pid: int):
+        """Drop a stopped VM from monitoring and close its control channel"""
+        info = self.active_processes.pop(pid, None)
+        self.performance_monitor.untrack(pid)
+        runtime = self.vm_runtimes.pop(pid, None)
+        if runtime:
+            runtime.close()
+        if info and info.get('qmp_socket'):
             try:
-                # Monitor active QEMU processes
-                for pid, info in list(self.active_processes.items()):
-                    try:
-                        process = psutil.Process(pid)
-                        if not process.is_running():
-                            del self.active_processes[pid]
-                            continue
-                        
-                        # Update performance metrics
-                        cpu_percent = process.cpu_percent()
-                        memory_info = process.memory_info()
-                        
-                        info.update({
-                            'cpu_percent': cpu_percent,
-                            'memory_mb': memory_info.rss / (1024*1024),
-                            'status': process.status()
-                        })
-                        
-                    except psutil.NoSuchProcess:
-                        if pid in self.active_processes:
-                            del self.active_processes[pid]
-                
-                time.sleep(5)  # Check every 5 seconds
-                
-            except Exception as e:
-                print(f"Performance monitoring error: {e}")
-                time.sleep(10)
+                os.unlink(info['qmp_socket'])
+            except OSError:
+                pass
+        if info and info.get('snapshot_key'):
+            self.snapshot_pool.release(info['snapshot_key'])
+        if info and info.get('qmp_socket'):
+            self.placement_engine.release(info['qmp_socket'])
+        if info and info.get('log_path'):
+            # Keep logs that have something to say
+            try:
+                if os.path.getsize(info['log_path']) == 0:
+                    os.unlink(info['log_path'])
+            except OSError:
+                pass
     
     def identify_iso(self, iso_path: str) -> Tuple[str, ISOProfile]:
         """AI-powered ISO identification and profile selection"""
@@ -331,6 +392,7 @@ class AIEnhancedQEMURunner:
         
         # Memory calculation
         available_memory_gb = self.system_caps.memory_gb * 0.7  # Leave 30% for host
+        available_memory_gb -= self.placement_engine.claimed_memory_mb() / 1024  # ...and what running VMs hold
         recommended_memory = self._parse_memory_string(profile.memory_recommended)
         min_memory = self._parse_memory_string(profile.memory_min)
         
@@ -341,7 +403,8 @@ class AIEnhancedQEMURunner:
         else:
             memory = profile.memory_min
         
-        # CPU calculation
+        # CPU calculation; independent of other running VMs so -smp (and the snapshot key) stays stable,
+        # busy hosts get fewer dedicated cores instead (see build_optimized_command)
         available_cores = self.system_caps.cpu_cores
         recommended_cores = min(profile.cpu_cores, max(1, available_cores // 2))
         
@@ -385,6 +448,16 @@ class AIEnhancedQEMURunner:
         cpu_cores = user_options.get('cpu_cores', optimal_resources['cpu_cores'])
         cmd.extend(['-smp', cpu_cores])
         
+        # Host placement: own cores, node-local/hugepage RAM; keyed by the launch's QMP socket,
+        # which is also what pins the vCPU threads after start. With fewer free cores than vCPUs
+        # the vCPUs share the cores that are free rather than overlap another VM's.
+        if user_options.get('qmp_socket') and user_options.get('enable_pinning', True):
+            memory_mb = int(self._parse_memory_string(memory) * 1024)
+            host_cores = min(int(cpu_cores), len(self.placement_engine.free_cpus()))
+            placement = self.placement_engine.plan(user_options['qmp_socket'], host_cores, memory_mb)
+            if placement:
+                cmd.extend(placement.qemu_args(self.placement_engine.topology.hugepage_kb))
+        
         # Acceleration
         if self.system_caps.kvm_available and user_options.get('enable_kvm', True):
             cmd.extend(['-accel', 'kvm'])
@@ -425,6 +498,11 @@ class AIEnhancedQEMURunner:
         cmd.extend(['-no-reboot'])
         cmd.extend(['-rtc', 'base=localtime,clock=host'])
         
+        # Control channel and balloon device for the per-VM runtime API
+        if user_options.get('qmp_socket'):
+            cmd.extend(['-qmp', f"unix:{user_options['qmp_socket']},server=on,wait=off"])
+            cmd.extend(['-device', 'virtio-balloon-pci,id=balloon0'])
+        
         return cmd
     
     def run_optimized_iso(self, iso_path: str, **options) -> int:
@@ -433,53 +511,207 @@ class AIEnhancedQEMURunner:
         if not os.path.exists(iso_path):
             raise FileNotFoundError(f"ISO file not found: {iso_path}")
         
-        # Build optimized command
-        cmd = self.build_optimized_command(iso_path, **options)
-        
-        # Log command for debugging
-        print(f"🚀 AI-Optimized QEMU Command:")
-        print(f"   {' '.join(cmd)}")
-        
-        # Get profile info for display
-        profile_key, profile = self.identify_iso(iso_path)
-        print(f"📊 Detected: {profile.name} ({profile.category})")
-        print(f"💡 {profile.description}")
+        # Every VM gets a QMP socket; QEMU output goes to a log instead of unread pipes
+        run_dir = runtime_dir()
+        token = f"{int(time.time())}-{os.urandom(3).hex()}"
+        options.setdefault('qmp_socket', str(run_dir / f"qmp-{token}.sock"))
+        log_path = run_dir / f"qemu-{token}.log"
         
+        # Everything from here on may hold host cores (placement) or a state disk: released on any failure
+        slot = None
         try:
-            # Launch QEMU
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE if options.get('quiet', True) else None,
-                stderr=subprocess.PIPE
-            )
+            # Build optimized command
+            cmd = self.build_optimized_command(iso_path, **options)
+            
+            # Per-ISO state disk: resume the saved booted desktop unless a fresh boot was asked for
+            if options.get('enable_snapshots', True):
+                slot = self.snapshot_pool.prepare(iso_path, cmd, self.qemu_version)
+            restore = bool(slot and slot.has_snapshot and not options.get('fresh_boot', False))
             
-            # Give QEMU time to start
-            time.sleep(2)
+            # Log command for debugging
+            print(f"🚀 AI-Optimized QEMU Command:")
+            print(f"   {' '.join(cmd)}")
             
-            if process.poll() is not None:
-                # Process terminated - error occurred
-                stdout, stderr = process.communicate()
-                error_msg = stderr.decode('utf-8') if stderr else "QEMU failed to start"
-                raise RuntimeError(f"QEMU startup failed: {error_msg}")
+            # Get profile info for display
+            profile_key, profile = self.identify_iso(iso_path)
+            print(f"📊 Detected: {profile.name} ({profile.category})")
+            print(f"💡 {profile.description}")
+            if restore:
+                print(f"⚡ Restoring saved boot snapshot ({slot.key})")
+            
+            launch_cmd = cmd + (self.snapshot_pool.command_args(slot, restore) if slot else [])
+            try:
+                process, runtime = self._start_qemu(launch_cmd, options['qmp_socket'], log_path,
+                                                    options.get('quiet', True))
+            except RuntimeError as e:
+                if not restore:
+                    raise
+                # Saved state no longer matches this QEMU/host: forget it and boot normally
+                print(f"⚠️ Boot snapshot could not be restored, booting fresh: {e}")
+                self.snapshot_pool.drop_snapshot(slot.key)
+                restore = False
+                launch_cmd = cmd + self.snapshot_pool.command_args(slot, restore)
+                process, runtime = self._start_qemu(launch_cmd, options['qmp_socket'], log_path,
+                                                    options.get('quiet', True))
+            
+            placement = self.placement_engine.placement_for(options['qmp_socket'])
+            if placement:
+                self._pin_vcpus(process.pid, runtime, placement)
             
             # Add to monitoring
             self.active_processes[process.pid] = {
                 'iso_path': iso_path,
                 'profile': profile_key,
                 'start_time': time.time(),
-                'command': cmd
+                'command': launch_cmd,
+                'qmp_socket': options['qmp_socket'],
+                'log_path': str(log_path),
+                'snapshot_key': slot.key if slot else None,
+                'restored': restore,
+                'host_cpus': placement.host_cpus if placement else None,
+                'numa_node': placement.node if placement else None,
+                'hugepages': placement.hugepages if placement else False
             }
+            self.vm_runtimes[process.pid] = runtime
+            self.performance_monitor.track(
+                process.pid,
+                self.active_processes[process.pid],
+                on_exit=self._on_vm_exited,
+                probe=runtime.summary
+            )
             
             print(f"✅ QEMU started successfully (PID: {process.pid})")
             return process.pid
             
         except FileNotFoundError:
+            self._release_launch(options['qmp_socket'], slot)
             raise RuntimeError(f"QEMU binary '{self.qemu_binary}' not found")
         except Exception as e:
+            self._release_launch(options['qmp_socket'], slot)
             raise RuntimeError(f"Failed to start QEMU: {e}")
     
+    def _release_launch(self, qmp_socket: str, slot):
+        """Give back the state disk and host cores claimed for a launch that failed"""
+        if slot:
+            self.snapshot_pool.release(slot.key)
+        self.placement_engine.release(qmp_socket)
+    
+    def _pin_vcpus(self, pid: int, runtime: VMRuntime, placement):
+        """Pin vCPU threads (ids from query-cpus-fast) to the VM's host cores"""
+        try:
+            vcpus = [(v['cpu'], v['thread_id']) for v in runtime.vcpu_stats() if v['thread_id']]
+        except QMPError as e:
+            print(f"vCPU threads unknown, VM {pid} runs unpinned: {e}")
+            return
+        if self.placement_engine.pin(placement.owner, pid, vcpus):
+            where = f" on NUMA node {placement.node}" if placement.node is not None else ""
+            hugepages = " with hugepages" if placement.hugepages else ""
+            print(f"📌 vCPUs pinned to host CPUs {placement.host_cpus}{where}{hugepages}")
+    
+    def _start_qemu(self, cmd: List[str], qmp_socket: str, log_path: Path, quiet: bool = True):
+        """Launch QEMU and wait until its QMP socket answers; returns (process, runtime)"""
+        
+        with open(log_path, 'wb') as log:
+            process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL if quiet else None,
+                stderr=log
+            )
+        
+        # Started once QMP answers (usually well under the old fixed 2 s wait)
+        runtime = VMRuntime(qmp_socket, pid=process.pid, timeout=2)
+        deadline = time.monotonic() + 10
+        while process.poll() is None and time.monotonic() < deadline:
+            try:
+                runtime.status()
+                break
+            except QMPError:
+                time.sleep(0.2)
+        
+        if process.poll() is not None:
+            # Process terminated - error occurred
+            runtime.close()
+            try:
+                error_msg = log_path.read_text(errors='replace').strip()[-2000:]
+            except OSError:
+                error_msg = ''
+            raise RuntimeError(f"QEMU startup failed: {error_msg or 'QEMU failed to start'}")
+        
+        return process, runtime
+    
+    def get_vm_runtime(self, pid: int) -> Optional[VMRuntime]:
+        """QMP runtime API of a VM started by this runner"""
+        return self.vm_runtimes.get(pid)
+    
+    def get_vm_stats(self, pid: int) -> Dict:
+        """Guest-level numbers over QMP: run state, vCPU threads, block I/O and balloon size"""
+        runtime = self.vm_runtimes.get(pid)
+        if runtime is None:
+            return {'error': 'No QMP channel for this VM'}
+        try:
+            return {
+                'status': runtime.status().get('status'),
+                'vcpus': runtime.vcpu_stats(),
+                'block': runtime.block_stats(),
+                'balloon_mb': runtime.balloon_info()
+            }
+        except QMPError as e:
+            return {'error': str(e)}
+    
+    def set_vm_memory(self, pid: int, memory_mb: int) -> bool:
+        """Resize guest memory through the balloon device"""
+        runtime = self.vm_runtimes.get(pid)
+        if runtime is None:
+            return False
+        try:
+            runtime.balloon(memory_mb)
+            return True
+        except QMPError as e:
+            print(f"Balloon resize failed for VM {pid}: {e}")
+            return False
+    
+    def save_vm_state(self, pid: int, name: str) -> bool:
+        """savevm through QMP onto the VM's qcow2 state disk"""
+        runtime = self.vm_runtimes.get(pid)
+        if runtime is None:
+            return False
+        try:
+            runtime.savevm(name)
+            return True
+        except QMPError as e:
+            print(f"savevm failed for VM {pid}: {e}")
+            return False
+    
+    def save_boot_snapshot(self, pid: int) -> bool:
+        """Save the VM's current (booted) state so later launches of the same ISO resume from it"""
+        info = self.active_processes.get(pid)
+        if not info or not info.get('snapshot_key'):
+            return False
+        if not self.save_vm_state(pid, BOOT_SNAPSHOT):
+            return False
+        self.snapshot_pool.mark_saved(info['snapshot_key'])
+        print(f"💾 Boot snapshot saved for {os.path.basename(info['iso_path'])}")
+        return True
+    
+    def shutdown_vm(self, pid: int, timeout: float = 60) -> bool:
+        """ACPI power-off through QMP and wait for the guest to shut down; False if it did not"""
+        runtime = self.vm_runtimes.get(pid)
+        if runtime is None:
+            return False
+        try:
+            runtime.powerdown()
+            psutil.Process(pid).wait(timeout=timeout)
+        except psutil.NoSuchProcess:
+            pass
+        except (QMPError, psutil.TimeoutExpired):
+            return False
+        self._forget_vm(pid)
+        return True
+    
     def get_system_diagnostics(self) -> Dict:
         """Get comprehensive system diagnostics"""
+        snapshots = self.snapshot_pool.entries()
         return {
             'system_capabilities': {
                 'cpu_cores': self.system_caps.cpu_cores,
@@ -495,13 +727,26 @@ class AIEnhancedQEMURunner:
                 'version': self._get_qemu_version()
             },
             'active_vms': len(self.active_processes),
+            'placement': {
+                'free_cpus': len(self.placement_engine.free_cpus()),
+                'reserved_cpus': sorted(self.placement_engine.reserved),
+                'numa_nodes': len(self.placement_engine.topology.nodes()),
+                'hugepage_kb': self.placement_engine.topology.hugepage_kb
+            },
+            'boot_snapshots': {
+                'entries': len(snapshots),
+                'usage_mb': round(sum(e['size_bytes'] for e in snapshots) / (1024 * 1024), 1),
+                'quota_mb': self.snapshot_pool.quota_bytes // (1024 * 1024)
+            },
             'performance': {
-                pid: info for pid, info in self.active_processes.items()
+                pid: dict(info) for pid, info in list(self.active_processes.items())
             }
         }
     
     def _get_qemu_version(self) -> str:
-        """Get QEMU version"""
+        """Get QEMU version (recorded when the binary was probed, so usually no fork)"""
+        if self.qemu_version:
+            return self.qemu_version
         try:
             result = subprocess.run(
                 [self.qemu_binary, '--version'],
@@ -516,23 +761,34 @@ class AIEnhancedQEMURunner:
         return 'Unknown'
     
     def kill_vm(self, pid: int) -> bool:
-        """Gracefully terminate a VM"""
+        """Stop a VM: QMP quit when the control channel answers, SIGTERM/SIGKILL otherwise"""
         try:
             process = psutil.Process(pid)
-            process.terminate()
             
-            # Wait up to 10 seconds for graceful shutdown
-            try:
-                process.wait(timeout=10)
-            except psutil.TimeoutExpired:
-                # Force kill if needed
-                process.kill()
+            # QMP quit makes QEMU exit at once without a signal
+            runtime = self.vm_runtimes.get(pid)
+            stopped = False
+            if runtime and runtime.quit():
+                try:
+                    process.wait(timeout=5)
+                    stopped = True
+                except psutil.TimeoutExpired:
+                    pass
             
-            if pid in self.active_processes:
-                del self.active_processes[pid]
+            if not stopped:
+                process.terminate()
+                
+                # Wait up to 10 seconds for graceful shutdown
+                try:
+                    process.wait(timeout=10)
+                except psutil.TimeoutExpired:
+                    # Force kill if needed
+                    process.kill()
             
+            self._forget_vm(pid)
             return True
         except psutil.NoSuchProcess:
+            self._forget_vm(pid)
             return True
         except Exception as e:
             print(f"Error killing VM {pid}: {e}")
@@ -7,7 +7,6 @@ import os
 import gi
 import json
 import threading
-import time
 from pathlib import Path
 from typing import Optional, Dict, List
 
@@ -41,6 +40,7 @@ class EnhancedMobaLiveCDWindow(Adw.ApplicationWindow):
         self._setup_ui()
         self._setup_styling()
         self._start_performance_monitoring()
+        self._apply_snapshot_quota()
         
         # Load system information
         self._load_system_info()
@@ -198,6 +198,12 @@ class EnhancedMobaLiveCDWindow(Adw.ApplicationWindow):
         self.network_row.set_active(True)
         config_group.add(self.network_row)
         
+        # Ignore the saved boot snapshot
+        self.fresh_boot_row = Adw.SwitchRow()
+        self.fresh_boot_row.set_title("Fresh Boot")
+        self.fresh_boot_row.set_subtitle("Boot from scratch instead of the saved boot snapshot")
+        config_group.add(self.fresh_boot_row)
+        
         left_box.append(config_group)
         
         # Action buttons
@@ -402,31 +408,43 @@ class EnhancedMobaLiveCDWindow(Adw.ApplicationWindow):
         self.cpu_row.get_adjustment().set_upper(max_cpu)
     
     def _start_performance_monitoring(self):
-        """Start background performance monitoring"""
-        
-        def monitor_performance():
-            while True:
-                try:
-                    import psutil
-                    
-                    # Update system metrics
-                    cpu_percent = psutil.cpu_percent(interval=1)
-                    memory = psutil.virtual_memory()
-                    
-                    GLib.idle_add(self._update_performance_display, cpu_percent, memory.percent)
-                    
-                    # Update VM list
-                    diagnostics = self.qemu_runner.get_system_diagnostics()
-                    GLib.idle_add(self._update_vm_list, diagnostics.get('performance', {}))
-                    
-                    time.sleep(5)
-                    
-                except Exception as e:
-                    print(f"Performance monitoring error: {e}")
-                    time.sleep(10)
-        
-        thread = threading.Thread(target=monitor_performance, daemon=True)
-        thread.start()
+        """Subscribe to the runner's shared performance monitor for host and VM updates"""
+        
+        monitor = self.qemu_runner.performance_monitor
+        
+        # Honour the monitoring interval preference
+        app = self.get_application()
+        config = getattr(app, 'config', None)
+        if config:
+            monitor.interval = config.get('advanced', {}).get('performance_monitoring_interval', monitor.interval)
+        
+        self._monitor_token = monitor.subscribe(self._on_performance_snapshot)
+        self.connect('close-request', self._on_close_request)
+    
+    def _apply_snapshot_quota(self):
+        """Honour the boot snapshot disk quota preference"""
+        
+        app = self.get_application()
+        config = getattr(app, 'config', None)
+        if config:
+            quota_gb = config.get('advanced', {}).get('snapshot_quota_gb')
+            if quota_gb:
+                self.qemu_runner.snapshot_pool.quota_bytes = int(quota_gb * 1024 ** 3)
+    
+    def _on_performance_snapshot(self, snapshot):
+        """Monitor thread callback: hand the snapshot to the GTK main loop"""
+        
+        if snapshot['cpu_percent'] is not None and snapshot['memory_percent'] is not None:
+            GLib.idle_add(self._update_performance_display, snapshot['cpu_percent'], snapshot['memory_percent'])
+        GLib.idle_add(self._update_vm_list, snapshot['vms'])
+    
+    def _on_close_request(self, window):
+        """Stop receiving updates; the monitor stops polling once nothing needs it"""
+        
+        if getattr(self, '_monitor_token', None) is not None:
+            self.qemu_runner.performance_monitor.unsubscribe(self._monitor_token)
+            self._monitor_token = None
+        return False
     
     def _update_performance_display(self, cpu_percent, memory_percent):
         """Update performance displays"""
@@ -484,8 +502,30 @@ class EnhancedMobaLiveCDWindow(Adw.ApplicationWindow):
         status = vm_info.get('status', 'unknown')
         
         subtitle = f"PID: {pid} | CPU: {cpu_usage:.1f}% | RAM: {memory_mb:.0f}MB | Status: {status}"
+        if 'guest_status' in vm_info:
+            # Guest-side numbers from the VM's QMP channel
+            subtitle += (f" | Guest: {vm_info['guest_status']}"
+                         f" | Disk R/W: {vm_info.get('block_read_mb', 0):.0f}/{vm_info.get('block_write_mb', 0):.0f}MB")
         row.set_subtitle(subtitle)
         
+        # Save boot snapshot button (only with a state disk)
+        if vm_info.get('snapshot_key'):
+            snapshot_button = Gtk.Button()
+            snapshot_button.set_icon_name("document-save-symbolic")
+            snapshot_button.set_tooltip_text("Save boot snapshot (next launch resumes here)")
+            snapshot_button.add_css_class("circular")
+            snapshot_button.connect("clicked", lambda btn, p=pid: self._on_save_snapshot_clicked(p))
+            row.add_suffix(snapshot_button)
+        
+        # ACPI shutdown button (only with a QMP channel)
+        if vm_info.get('qmp_socket'):
+            shutdown_button = Gtk.Button()
+            shutdown_button.set_icon_name("system-shutdown-symbolic")
+            shutdown_button.set_tooltip_text("Shut down guest")
+            shutdown_button.add_css_class("circular")
+            shutdown_button.connect("clicked", lambda btn, p=pid: self._on_shutdown_vm_clicked(p))
+            row.add_suffix(shutdown_button)
+        
         # Kill button
         kill_button = Gtk.Button()
         kill_button.set_icon_name("process-stop-symbolic")
@@ -630,7 +670,8 @@ class EnhancedMobaLiveCDWindow(Adw.ApplicationWindow):
             'enable_kvm': self.kvm_row.get_active(),
             'enable_gpu': self.gpu_row.get_active(),
             'enable_audio': self.audio_row.get_active(),
-            'enable_network': self.network_row.get_active()
+            'enable_network': self.network_row.get_active(),
+            'fresh_boot': self.fresh_boot_row.get_active()
         }
     
     def _launch_vm(self, options):
@@ -674,6 +715,35 @@ class EnhancedMobaLiveCDWindow(Adw.ApplicationWindow):
         thread = threading.Thread(target=kill_vm, daemon=True)
         thread.start()
     
+    def _on_save_snapshot_clicked(self, pid):
+        """Handle boot snapshot save (savevm over QMP)"""
+        
+        self.status_label.set_text(f"Saving boot snapshot of VM {pid}...")
+        
+        def save_snapshot():
+            if self.qemu_runner.save_boot_snapshot(pid):
+                GLib.idle_add(self.status_label.set_text, f"Boot snapshot saved (VM {pid})")
+            else:
+                GLib.idle_add(self._show_error_dialog, "Boot Snapshot", f"Could not save a snapshot of VM {pid}")
+        
+        thread = threading.Thread(target=save_snapshot, daemon=True)
+        thread.start()
+    
+    def _on_shutdown_vm_clicked(self, pid):
+        """Handle guest shutdown (ACPI power button over QMP)"""
+        
+        self.status_label.set_text(f"Shutting down VM {pid}...")
+        
+        def shutdown_vm():
+            success = self.qemu_runner.shutdown_vm(pid)
+            if success:
+                GLib.idle_add(self._on_vm_killed, pid, True)
+            else:
+                GLib.idle_add(self.status_label.set_text, f"VM {pid} did not shut down; use Terminate")
+        
+        thread = threading.Thread(target=shutdown_vm, daemon=True)
+        thread.start()
+    
     def _on_vm_killed(self, pid, success):
         """Handle VM termination result"""
         
@@ -719,6 +789,8 @@ class EnhancedMobaLiveCDWindow(Adw.ApplicationWindow):
         # Format diagnostics text
         caps = diagnostics['system_capabilities']
         qemu_info = diagnostics['qemu_info']
+        snapshots = diagnostics['boot_snapshots']
+        placement = diagnostics['placement']
         
         body_text = f"""**System Information:**
 • CPU: {caps['cpu_cores']} cores / {caps['cpu_threads']} threads
@@ -732,7 +804,9 @@ class EnhancedMobaLiveCDWindow(Adw.ApplicationWindow):
 • Binary: {qemu_info['binary']}
 • Version: {qemu_info['version']}
 
-**Active VMs:** {diagnostics['active_vms']}"""
+**Active VMs:** {diagnostics['active_vms']}
+**Free Host CPUs:** {placement['free_cpus']} ({placement['numa_nodes']} NUMA node(s))
+**Boot Snapshots:** {snapshots['entries']} ({snapshots['usage_mb']:.0f} / {snapshots['quota_mb']} MB)"""
         
         dialog.set_body(body_text)
         dialog.add_response("close", "Close")
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Ghost-mode (VPN client tunnel) state for the Garuda Media Stack APIs
+Reads /sys/class/net once, then follows rtnetlink link events so status reads never fork `wg show`;
+shared by control-api.py and api-server.py
+"""
+
+import os
+import select
+import socket
+import struct
+import threading
+import time
+
+# rtnetlink(7) constants
+NETLINK_ROUTE = 0
+RTMGRP_LINK = 0x1
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+IFLA_IFNAME = 3
+IFF_UP = 0x1
+_NLMSGHDR = struct.Struct('=IHHII')     # len, type, flags, seq, pid
+_IFINFOMSG = struct.Struct('=BxHiII')   # family, type, index, flags, change
+_RTATTR = struct.Struct('=HH')          # len, type
+
+SYS_CLASS_NET = '/sys/class/net'
+
+# Client tunnel names used by the stack's scripts (ghost-mode-control.sh and ghost-control.sh)
+GHOST_INTERFACES = ('wg-client0', 'wg0-client')
+
+# Without netlink (non-Linux, sandboxed), re-read sysfs this often (seconds)
+POLL_INTERVAL = 2.0
+
+
+def read_sysfs_link(name, root=SYS_CLASS_NET):
+    """{'present', 'up', 'operstate'} for one interface from sysfs"""
+    base = os.path.join(root, name)
+    try:
+        with open(os.path.join(base, 'flags')) as f:
+            flags = int(f.read().strip(), 16)
+    except (OSError, ValueError):
+        return {'present': False, 'up': False, 'operstate': None}
+    try:
+        with open(os.path.join(base, 'operstate')) as f:
+            operstate = f.read().strip()
+    except OSError:
+        operstate = None
+    # WireGuard has no carrier: operstate stays 'unknown' while the link is up
+    return {'present': True, 'up': bool(flags & IFF_UP), 'operstate': operstate}
+
+
+def parse_link_messages(data):
+    """Yield (ifname, link) for every RTM_NEWLINK/RTM_DELLINK in one netlink datagram"""
+    offset = 0
+    while offset + _NLMSGHDR.size <= len(data):
+        length, msg_type, _, _, _ = _NLMSGHDR.unpack_from(data, offset)
+        if length < _NLMSGHDR.size:
+            break
+        end = offset + length
+        if msg_type in (RTM_NEWLINK, RTM_DELLINK):
+            body = offset + _NLMSGHDR.size
+            _, _, _, flags, _ = _IFINFOMSG.unpack_from(data, body)
+            attr = body + _IFINFOMSG.size
+            name = None
+            while attr + _RTATTR.size <= end:
+                attr_len, attr_type = _RTATTR.unpack_from(data, attr)
+                if attr_len < _RTATTR.size:
+                    break
+                if attr_type == IFLA_IFNAME:
+                    name = data[attr + _RTATTR.size:attr + attr_len].split(b'\0', 1)[0].decode()
+                    break
+                attr += (attr_len + 3) & ~3
+            if name:
+                present = msg_type == RTM_NEWLINK
+                yield name, {'present': present, 'up': present and bool(flags & IFF_UP)}
+        offset += (length + 3) & ~3
+
+
+class GhostModeState:
+    """In-memory ghost-mode state kept current by link events; reads are a dict copy"""
+
+    def __init__(self, interfaces=GHOST_INTERFACES, sys_root=SYS_CLASS_NET, resync=60):
+        self.interfaces = tuple(interfaces)
+        self.sys_root = sys_root
+        self.resync = resync   # Full sysfs re-read even when netlink is quiet (seconds)
+        self._links = {}
+        self._changed_at = None
+        self._source = None
+        self._subscribers = []
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self.refresh()
+
+    def subscribe(self, callback):
+        """Call callback(state) from the watcher thread whenever ghost mode flips"""
+        self._subscribers.append(callback)
+
+    def refresh(self):
+        """Re-read every watched interface from sysfs"""
+        for name in self.interfaces:
+            self._update(name, read_sysfs_link(name, self.sys_root), 'sysfs')
+
+    def _update(self, name, link, source):
+        with self._cond:
+            was_active = self._active()
+            previous = self._links.get(name, {})
+            if 'operstate' not in link:
+                link = dict(link, operstate=read_sysfs_link(name, self.sys_root)['operstate']
+                            if link['present'] else None)
+            self._links[name] = link
+            changed = self._active() != was_active
+            if changed or previous.get('up') != link['up'] or self._changed_at is None:
+                self._changed_at = time.time()
+                self._source = source
+            if changed:
+                self._cond.notify_all()
+                state = self._describe()
+        if changed:
+            for callback in list(self._subscribers):
+                try:
+                    callback(state)
+                except Exception:
+                    pass
+
+    def _active(self):
+        return any(link.get('up') for link in self._links.values())
+
+    def _describe(self):
+        up = [name for name in self.interfaces if self._links.get(name, {}).get('up')]
+        return {
+            'active': bool(up),
+            'interface': up[0] if up else None,
+            'interfaces': {name: dict(link) for name, link in self._links.items()},
+            'changed_at': self._changed_at,
+            'source': self._source,
+            'watching': self.running()
+        }
+
+    def active(self):
+        if not self.running():
+            self.refresh()   # Not watching: a sysfs read is still far cheaper than forking wg
+        with self._cond:
+            return self._active()
+
+    def up_interfaces(self):
+        """Watched tunnels that are currently up, in watch order"""
+        if not self.running():
+            self.refresh()
+        with self._cond:
+            return [name for name in self.interfaces if self._links.get(name, {}).get('up')]
+
+    def state(self):
+        if not self.running():
+            self.refresh()
+        with self._cond:
+            return self._describe()
+
+    def wait_for(self, active, timeout):
+        """Block until ghost mode is `active` (or the timeout passes); returns whether it got there"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._active() != active:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                # Without the watcher nobody notifies: poll sysfs ourselves
+                self._cond.wait(remaining if self.running() else min(remaining, 0.2))
+                if not self.running():
+                    self.refresh()
+            return True
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='ghost-state', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def _open_netlink(self):
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW | socket.SOCK_CLOEXEC, NETLINK_ROUTE)
+        except (AttributeError, OSError):
+            return None
+        try:
+            sock.bind((0, RTMGRP_LINK))
+        except OSError:
+            sock.close()
+            return None
+        return sock
+
+    def _run(self):
+        sock = self._open_netlink()
+        # Subscribe first, then read: a flip between the two still arrives as an event
+        self.refresh()
+        try:
+            while not self._stop.is_set():
+                if sock is None:
+                    self._stop.wait(POLL_INTERVAL)
+                    self.refresh()
+                    continue
+                if not select.select([sock], [], [], self.resync)[0]:
+                    self.refresh()
+                    continue
+                try:
+                    data = sock.recv(65536)
+                except OSError:
+                    # ENOBUFS: the kernel dropped events for us; fall back to a full read
+                    self.refresh()
+                    continue
+                for name, link in parse_link_messages(data):
+                    if name in self.interfaces:
+                        self._update(name, link, 'netlink')
+        finally:
+            if sock:
+                sock.close()
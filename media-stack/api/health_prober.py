@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+HTTP health prober for the Garuda Media Stack services
+Polls each service's own health endpoint over pooled keep-alive connections and keeps latency percentiles
+"""
+
+import asyncio
+import collections
+import math
+import threading
+import time
+
+# Cheapest endpoint per service that goes through its web stack (not just the listening socket)
+HEALTH_PATHS = {
+    'jellyfin': '/health',
+    'plex': '/identity',
+    'radarr': '/ping',
+    'sonarr': '/ping',
+    'lidarr': '/ping',
+    'readarr': '/ping',
+    'qbittorrent': '/api/v2/app/version',
+    'jackett': '/UI/Login',
+    'calibre-web': '/login',
+    'audiobookshelf': '/healthcheck',
+    'jellyseerr': '/api/v1/status',
+    'pulsarr': '/'
+}
+
+# Bodies larger than this are not drained; the connection is dropped instead
+MAX_BODY = 256 * 1024
+
+
+class ProbeError(Exception):
+    """A probe that got no usable HTTP answer"""
+
+
+def format_latency(ms):
+    return f'{ms:.0f} ms' if ms < 1000 else f'{ms / 1000:.1f} s'
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    return ordered[max(1, math.ceil(fraction * len(ordered))) - 1]
+
+
+async def read_response(reader):
+    """(status, keep_alive) after consuming one HTTP/1.x response, body included"""
+    status_line = await reader.readline()
+    parts = status_line.decode('latin-1').split(None, 2)
+    if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+        raise ProbeError(f'bad status line {status_line[:40]!r}')
+    status = int(parts[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    keep_alive = headers.get('connection', '').lower() != 'close' and parts[0] != 'HTTP/1.0'
+
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        total = 0
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            total += size
+            if total > MAX_BODY:
+                return status, False
+            await reader.readexactly(size + 2)   # Chunk plus CRLF
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        length = int(headers['content-length'])
+        if length > MAX_BODY:
+            return status, False
+        await reader.readexactly(length)
+    elif status not in (204, 304) and status >= 200:
+        return status, False   # Body runs to EOF: nothing to reuse
+    return status, keep_alive
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection bound to the loop that opened it"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.loop = asyncio.get_running_loop()
+
+    async def get(self, host, path):
+        self.writer.write((f'GET {path} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: garuda-health-prober\r\n'
+                           f'Accept: */*\r\nConnection: keep-alive\r\n\r\n').encode('latin-1'))
+        await self.writer.drain()
+        return await read_response(self.reader)
+
+    def usable(self):
+        return self.loop is asyncio.get_running_loop() and not self.reader.at_eof() \
+            and not self.writer.is_closing()
+
+    def close(self):
+        if not self.writer.is_closing():
+            self.writer.close()
+
+
+class ConnectionPool:
+    """Idle keep-alive connections to one host:port"""
+
+    def __init__(self, host, port, size=2):
+        self.host = host
+        self.port = port
+        self.size = size
+        self._idle = []
+        self.opened = 0   # Connections ever opened; stays flat while keep-alive works
+
+    async def request(self, path, timeout):
+        """(status, reused) for one GET, reusing an idle connection when the server allows it"""
+        conn = None
+        while self._idle and conn is None:
+            conn = self._idle.pop()
+            if not conn.usable():
+                conn.close()
+                conn = None
+        reused = conn is not None
+        try:
+            if conn is None:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), timeout)
+                conn = Connection(reader, writer)
+                self.opened += 1
+            status, keep_alive = await asyncio.wait_for(
+                conn.get(f'{self.host}:{self.port}', path), timeout)
+        except asyncio.TimeoutError:
+            # Before OSError: a wedged server is the answer, not a stale connection to retry
+            if conn:
+                conn.close()
+            raise
+        except (OSError, EOFError, ValueError, ProbeError, asyncio.IncompleteReadError):
+            if conn:
+                conn.close()
+            if reused:
+                # The server closed an idle connection under us: one fresh attempt
+                return await self.request(path, timeout)
+            raise
+        except BaseException:
+            if conn:
+                conn.close()
+            raise
+        if keep_alive and len(self._idle) < self.size:
+            self._idle.append(conn)
+        else:
+            conn.close()
+        return status, reused
+
+    def close(self):
+        while self._idle:
+            self._idle.pop().close()
+
+
+class HealthProber:
+    """Concurrent HTTP health checks for every service, classified from a window of recent latencies"""
+
+    def __init__(self, ports, host='127.0.0.1', paths=None, interval=10, timeout=5,
+                 window=60, degraded_ms=1000, fail_after=2, histogram=None):
+        self.ports = dict(ports)
+        self.host = host
+        self.paths = dict(HEALTH_PATHS, **(paths or {}))
+        self.interval = interval
+        self.timeout = timeout
+        self.degraded_ms = degraded_ms   # p95 at or above this is 'degraded'
+        self.fail_after = fail_after     # Consecutive failed probes before 'unhealthy'
+        self.histogram = histogram       # Optional prometheus_export.Histogram labelled by service
+        self._pools = {name: ConnectionPool(host, port) for name, port in self.ports.items()}
+        self._latencies = {name: collections.deque(maxlen=window) for name in self.ports}
+        self._outcomes = {name: collections.deque(maxlen=window) for name in self.ports}
+        self._state = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    async def probe(self, name):
+        """Probe one service and fold the result into its state"""
+        pool = self._pools[name]
+        started = time.perf_counter()
+        status = error = None
+        reused = timed_out = False
+        try:
+            status, reused = await pool.request(self.paths.get(name, '/'), self.timeout)
+        except asyncio.TimeoutError:
+            error = f'no answer within {self.timeout:g}s'
+            timed_out = True
+        except (OSError, EOFError, ValueError, ProbeError, asyncio.IncompleteReadError) as e:
+            error = str(e) or type(e).__name__
+        elapsed = time.perf_counter() - started
+        # 5xx means the web stack is up but failing; 401/403/3xx still prove it answers
+        ok = status is not None and status < 500
+        if status is not None and not ok:
+            error = f'HTTP {status}'
+        self._record(name, ok, status, error, elapsed, reused, timed_out)
+        return self.state(name)
+
+    async def probe_all(self):
+        """Probe every service concurrently; returns the full state"""
+        await asyncio.gather(*(self.probe(name) for name in self.ports))
+        return self.state()
+
+    def _record(self, name, ok, status, error, elapsed, reused, timed_out):
+        with self._lock:
+            # Timeouts count at the timeout so they drag p95 up; refused connections carry no latency
+            if status is not None or timed_out:
+                self._latencies[name].append(elapsed * 1000)
+                if self.histogram:
+                    self.histogram.observe(elapsed, name)
+            self._outcomes[name].append(ok)
+            previous = self._state.get(name, {})
+            failures = 0 if ok else previous.get('consecutive_failures', 0) + 1
+            ordered = sorted(self._latencies[name])
+            p50, p95, p99 = (percentile(ordered, f) for f in (0.5, 0.95, 0.99))
+            if failures >= self.fail_after:
+                health = 'unhealthy'
+                label = f'unhealthy ({error})'
+            elif not ok or (p95 is not None and p95 >= self.degraded_ms):
+                health = 'degraded'
+                label = f'degraded (p95 {format_latency(p95)})' if p95 is not None else f'degraded ({error})'
+            else:
+                health = 'healthy'
+                label = 'healthy'
+            self._state[name] = {
+                'status': health,
+                'label': label,
+                'http_status': status,
+                'latency_ms': round(elapsed * 1000, 1),
+                'p50_ms': round(p50, 1) if p50 is not None else None,
+                'p95_ms': round(p95, 1) if p95 is not None else None,
+                'p99_ms': round(p99, 1) if p99 is not None else None,
+                'samples': len(ordered),
+                'success_rate': round(sum(self._outcomes[name]) / len(self._outcomes[name]), 3),
+                'consecutive_failures': failures,
+                'connection_reused': reused,
+                'connections_opened': self._pools[name].opened,
+                'error': error,
+                'checked_at': time.time()
+            }
+
+    def state(self, name=None):
+        """Latest health for one service ({} if never probed) or {service: health} for all"""
+        with self._lock:
+            if name:
+                return dict(self._state.get(name, {}))
+            return {n: dict(s) for n, s in self._state.items()}
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='health-prober', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def _run(self):
+        # A private loop: the pooled connections live here, whichever server the API runs under
+        asyncio.run(self._loop())
+
+    async def _loop(self):
+        try:
+            while not self._stop.is_set():
+                started = time.monotonic()
+                try:
+                    await self.probe_all()
+                except Exception:
+                    pass
+                await asyncio.sleep(max(0.1, self.interval - (time.monotonic() - started)))
+        finally:
+            for pool in self._pools.values():
+                pool.close()
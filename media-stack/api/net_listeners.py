@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Listening socket table and service probe for the Garuda Media Stack APIs
+Parses /proc/net/tcp and /proc/net/tcp6 once into an indexed set of listening ports;
+shared by control-api.py and api-server.py
+"""
+
+import os
+import threading
+import time
+
+PROC_NET_TCP = ('/proc/net/tcp', '/proc/net/tcp6')
+TCP_LISTEN = '0A'
+
+# Every media stack service either API server reports on
+SERVICE_PORTS = {
+    'jellyfin': 8096,
+    'plex': 32400,
+    'radarr': 7878,
+    'sonarr': 8989,
+    'lidarr': 8686,
+    'readarr': 8787,
+    'qbittorrent': 5080,
+    'jackett': 9117,
+    'calibre-web': 8083,
+    'audiobookshelf': 13378,
+    'jellyseerr': 5055,
+    'pulsarr': 3030
+}
+
+
+def parse_proc_net_tcp(text):
+    """Yield (port, inode) for every LISTEN socket in a /proc/net/tcp* dump"""
+    for line in text.splitlines()[1:]:
+        fields = line.split()
+        if len(fields) < 10 or fields[3] != TCP_LISTEN:
+            continue
+        try:
+            port = int(fields[1].rsplit(':', 1)[1], 16)
+        except (IndexError, ValueError):
+            continue
+        yield port, fields[9]
+
+
+def read_listeners(paths=PROC_NET_TCP):
+    """Return {port: [inode, ...]} for all listening TCP sockets"""
+    listeners = {}
+    for path in paths:
+        try:
+            with open(path, 'r') as f:
+                text = f.read()
+        except OSError:
+            continue
+        for port, inode in parse_proc_net_tcp(text):
+            listeners.setdefault(port, []).append(inode)
+    return listeners
+
+
+def find_socket_owners(inodes, proc_root='/proc'):
+    """Return {inode: pid} for the given socket inodes by walking /proc/<pid>/fd"""
+    wanted = {f'socket:[{inode}]': inode for inode in inodes}
+    owners = {}
+    if not wanted:
+        return owners
+    for entry in os.listdir(proc_root):
+        if not entry.isdigit():
+            continue
+        fd_dir = os.path.join(proc_root, entry, 'fd')
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            continue  # Process exited or belongs to another user
+        for fd in fds:
+            try:
+                target = os.readlink(os.path.join(fd_dir, fd))
+            except OSError:
+                continue
+            inode = wanted.get(target)
+            if inode is not None and inode not in owners:
+                owners[inode] = int(entry)
+                if len(owners) == len(wanted):
+                    return owners
+    return owners
+
+
+class ListenerTable:
+    """Listening ports cached for a short TTL, shared by every status check"""
+
+    def __init__(self, ttl=1.0, paths=PROC_NET_TCP):
+        self.ttl = ttl
+        self.paths = paths
+        self._listeners = {}
+        self._sampled_at = None
+        self._owners_key = None
+        self._owners = {}
+        self._lock = threading.Lock()
+
+    def listeners(self):
+        """Return {port: [inode, ...]}, re-reading /proc at most once per TTL"""
+        with self._lock:
+            now = time.monotonic()
+            if self._sampled_at is None or now - self._sampled_at >= self.ttl:
+                self._listeners = read_listeners(self.paths)
+                self._sampled_at = now
+            return self._listeners
+
+    def is_listening(self, port):
+        return port in self.listeners()
+
+    def owners(self, ports):
+        """Return {port: pid} for listening ports whose owning process is visible"""
+        listeners = self.listeners()
+        inode_ports = {}
+        for port in ports:
+            for inode in listeners.get(port, ()):
+                inode_ports[inode] = port
+        key = frozenset(inode_ports)
+        with self._lock:
+            if self._owners_key == key:
+                return dict(self._owners)
+        owners = {}
+        for inode, pid in find_socket_owners(inode_ports).items():
+            owners.setdefault(inode_ports[inode], pid)
+        with self._lock:
+            # The /proc/*/fd walk is the expensive part; redo it only when sockets change
+            self._owners_key, self._owners = key, owners
+        return dict(owners)
+
+    def invalidate(self):
+        with self._lock:
+            self._sampled_at = None
+
+
+class ServiceProbe:
+    """Exact listen state, and optionally owning PID, for every known service in one pass"""
+
+    def __init__(self, ports=None, table=None, ttl=1.0):
+        self.ports = dict(ports or SERVICE_PORTS)
+        self.table = table or ListenerTable(ttl=ttl)
+
+    def probe(self, with_pids=False):
+        """Return {service: {'status': 'online'|'offline', 'port': int[, 'pid': int]}}"""
+        listeners = self.table.listeners()
+        owners = self.table.owners(self.ports.values()) if with_pids else {}
+        services = {}
+        for service, port in self.ports.items():
+            entry = {
+                'status': 'online' if port in listeners else 'offline',
+                'port': port
+            }
+            if port in owners:
+                entry['pid'] = owners[port]
+            services[service] = entry
+        return services
+
+    def status(self, service, with_pid=False):
+        """State of one service, or None if it is not a known service"""
+        if service not in self.ports:
+            return None
+        port = self.ports[service]
+        entry = {
+            'status': 'online' if self.table.is_listening(port) else 'offline',
+            'port': port
+        }
+        if with_pid:
+            pid = self.table.owners([port]).get(port)
+            if pid is not None:
+                entry['pid'] = pid
+        return entry
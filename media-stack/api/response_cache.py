@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Response cache and compression for the Garuda Media Stack Control API
+Keeps serialized JSON bodies (and their compressed variants) per route + query for a short TTL
+"""
+
+import gzip
+import threading
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this go out uncompressed; the headers would eat the saving
+MIN_COMPRESS_SIZE = 512
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick 'br' or 'gzip' from an Accept-Encoding header, or None for identity"""
+    offered = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            offered[name.lower()] = quality
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and brotli is None:
+            continue
+        if offered.get(encoding, offered.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+class CacheEntry:
+    """One cached body plus lazily built compressed variants"""
+
+    def __init__(self, body, mimetype, expires):
+        self.body = body
+        self.mimetype = mimetype
+        self.expires = expires
+        self._variants = {}
+
+    def encoded(self, encoding):
+        if encoding is None or len(self.body) < MIN_COMPRESS_SIZE:
+            return self.body, None
+        if encoding not in self._variants:
+            self._variants[encoding] = compress(self.body, encoding)
+        return self._variants[encoding], encoding
+
+
+class ResponseCache:
+    """TTL cache keyed by endpoint and full path, invalidated by endpoint name"""
+
+    def __init__(self, ttls, max_entries=256):
+        self.ttls = ttls              # endpoint name -> TTL seconds
+        self.max_entries = max_entries
+        self._entries = {}            # (endpoint, full path) -> CacheEntry
+        self._lock = threading.Lock()
+
+    def cacheable(self, endpoint):
+        return endpoint in self.ttls
+
+    def lookup(self, endpoint, full_path):
+        with self._lock:
+            entry = self._entries.get((endpoint, full_path))
+            if entry and entry.expires > time.monotonic():
+                return entry
+            self._entries.pop((endpoint, full_path), None)
+            return None
+
+    def store(self, endpoint, full_path, body, mimetype):
+        entry = CacheEntry(body, mimetype, time.monotonic() + self.ttls[endpoint])
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                now = time.monotonic()
+                for key in [k for k, e in self._entries.items() if e.expires <= now]:
+                    del self._entries[key]
+                if len(self._entries) >= self.max_entries:
+                    self._entries.pop(next(iter(self._entries)))
+            self._entries[(endpoint, full_path)] = entry
+        return entry
+
+    def invalidate(self, *endpoints):
+        """Drop cached responses for the given endpoints (all of them if none given)"""
+        with self._lock:
+            if not endpoints:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] in endpoints]:
+                del self._entries[key]
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Dependency-aware restart orchestrator for the Garuda Media Stack Control API
+Stops services in parallel, waits for real process exit, then starts them along the dependency graph
+"""
+
+import asyncio
+import os
+import time
+
+import psutil
+
+
+class ServiceSpec:
+    """How to find, start and health-check one media stack service"""
+
+    def __init__(self, name, argv, cwd, log_path, port, match=None, match_cwd=False, after=()):
+        self.name = name
+        self.argv = argv
+        self.cwd = cwd
+        self.log_path = log_path
+        self.port = port
+        self.match = match or name  # pkill -f style command line substring
+        self.match_cwd = match_cwd  # Also require the process to run in cwd (for relative argv like node dist/index.js)
+        self.after = tuple(after)
+
+
+def find_processes(pattern, cwd=None):
+    """Processes whose command line contains pattern (pkill -f semantics, minus ourselves),
+    limited to those running in cwd if given"""
+    me = os.getpid()
+    procs = []
+    for proc in psutil.process_iter(['pid', 'cmdline', 'cwd']):
+        cmdline = ' '.join(proc.info['cmdline'] or ())
+        if proc.info['pid'] == me or pattern not in cmdline:
+            continue
+        if cwd is not None and proc.info['cwd'] != os.path.realpath(cwd):
+            continue
+        procs.append(proc)
+    return procs
+
+
+def terminate_and_wait(procs, timeout):
+    """SIGTERM, wait for exit, SIGKILL whatever is left; returns count killed hard"""
+    for proc in procs:
+        try:
+            proc.terminate()
+        except psutil.Error:
+            pass
+    _, alive = psutil.wait_procs(procs, timeout=timeout)
+    for proc in alive:
+        try:
+            proc.kill()
+        except psutil.Error:
+            pass
+    psutil.wait_procs(alive, timeout=2)
+    return len(alive)
+
+
+class RestartOrchestrator:
+    """Restart a set of services along the critical path instead of sleep-and-guess"""
+
+    def __init__(self, specs, spawn, is_listening, invalidate=None,
+                 stop_timeout=10, ready_timeout=60, poll_interval=0.5):
+        self.specs = {spec.name: spec for spec in specs}
+        self.spawn = spawn
+        self.is_listening = is_listening
+        self.invalidate = invalidate  # Drops cached listener state once old processes are gone
+        self.stop_timeout = stop_timeout
+        self.ready_timeout = ready_timeout
+        self.poll_interval = poll_interval
+        self._check_graph()
+
+    def _check_graph(self):
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f'Restart dependency cycle at {name}')
+            visiting.add(name)
+            for dep in self.specs[name].after:
+                if dep in self.specs:
+                    visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.specs:
+            visit(name)
+
+    def _stop(self, spec):
+        procs = find_processes(spec.match, spec.cwd if spec.match_cwd else None)
+        killed = terminate_and_wait(procs, self.stop_timeout)
+        return {'stopped': len(procs), 'killed': killed}
+
+    async def stop(self, spec):
+        return await asyncio.to_thread(self._stop, spec)
+
+    async def wait_ready(self, spec, started_at):
+        deadline = started_at + self.ready_timeout
+        while time.monotonic() < deadline:
+            if self.is_listening(spec.port):
+                return True
+            await asyncio.sleep(self.poll_interval)
+        return False
+
+    async def restart(self, names=None):
+        """Restart the named services (default: all); returns per-service reports"""
+        names = [n for n in (names or self.specs) if n in self.specs]
+        began = time.monotonic()
+        reports = {name: {'port': self.specs[name].port} for name in names}
+
+        stops = await asyncio.gather(*(self.stop(self.specs[n]) for n in names))
+        for name, result in zip(names, stops):
+            reports[name].update(result)
+        if self.invalidate:
+            self.invalidate()
+
+        settled = {name: asyncio.Event() for name in names}
+
+        async def start(name):
+            spec = self.specs[name]
+            try:
+                for dep in spec.after:
+                    if dep in settled:
+                        await settled[dep].wait()
+                started_at = time.monotonic()
+                reports[name]['pid'] = self.spawn(spec.argv, cwd=spec.cwd, log_path=spec.log_path)
+                ready = await self.wait_ready(spec, started_at)
+                reports[name]['status'] = 'ready' if ready else 'timeout'
+                reports[name]['ready_after'] = round(time.monotonic() - started_at, 2)
+            except Exception as e:
+                reports[name]['status'] = 'failed'
+                reports[name]['error'] = str(e)
+            finally:
+                settled[name].set()
+
+        await asyncio.gather(*(start(name) for name in names))
+        return {
+            'services': reports,
+            'ready': sum(1 for r in reports.values() if r.get('status') == 'ready'),
+            'total': len(names),
+            'elapsed': round(time.monotonic() - began, 2)
+        }
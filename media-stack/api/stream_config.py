@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Stream definitions for the Garuda Media Stack Control API
+Reads wwe-aew-streams.conf, saints-streams.conf and hdhomerun.conf into launch plans for the stream supervisor
+"""
+
+import configparser
+import datetime
+import os
+import re
+
+WWE_EVENTS = ('raw', 'smackdown', 'nxt')
+AEW_EVENTS = ('dynamite', 'rampage', 'collision')
+
+_QUALITY_RE = re.compile(r'(?P<height>\d{3,4})[pi](?:\s*,?\s*(?P<fps>\d{2,3})(?:fps)?)?$')
+_NAMED_HEIGHTS = {'4k': 2160, '2160p': 2160, 'uhd': 2160, 'hd': 720, 'fhd': 1080}
+
+
+def load_conf(path):
+    """{section: {key: value}} from one of the media stack .conf files ({} if missing)"""
+    parser = configparser.ConfigParser(inline_comment_prefixes=('#',), interpolation=None, strict=False)
+    try:
+        with open(path) as f:
+            parser.read_file(f)
+    except OSError:
+        return {}
+    return {section: dict(parser.items(section)) for section in parser.sections()}
+
+
+def parse_quality(text, default_fps=30):
+    """'1080p60', '720p,30fps', '1080i' or '4k' -> {'height': int, 'fps': int} (None if unrecognised)"""
+    text = (text or '').strip().lower()
+    if text in _NAMED_HEIGHTS:
+        return {'height': _NAMED_HEIGHTS[text], 'fps': default_fps}
+    match = _QUALITY_RE.match(text)
+    if not match:
+        return None
+    return {'height': int(match['height']), 'fps': int(match['fps'] or default_fps)}
+
+
+def quality_presets(conf):
+    """Named presets from a .conf [QUALITY_PRESETS] section: {'premium': {'height': 1080, 'fps': 60}, ...}"""
+    presets = {}
+    for name, value in conf.get('QUALITY_PRESETS', {}).items():
+        quality = parse_quality(value.replace(' ', ''))
+        if quality:
+            presets[name] = quality
+    return presets
+
+
+class UnknownQuality(ValueError):
+    """Requested quality is neither a QUALITY_PRESETS name nor a '1080p60'-style spec"""
+
+
+def resolve_quality(presets, requested, default, fallback):
+    """Quality for a launch: the requested preset name or spec (UnknownQuality if neither), else the .conf default,
+    else `fallback`"""
+    if requested:
+        resolved = (presets.get(requested) or parse_quality(requested)) if isinstance(requested, str) else None
+        if resolved is None:
+            raise UnknownQuality(f"Unknown quality {requested!r}; use one of {', '.join(sorted(presets)) or 'no presets'}"
+                                 " or a value like 1080p60")
+        return resolved
+    return presets.get(default) or parse_quality(default) or fallback
+
+
+def parse_bitrate(text):
+    """'8000k' / '8M' -> kbit/s as int (None if unrecognised)"""
+    text = (text or '').strip().lower()
+    match = re.match(r'(\d+(?:\.\d+)?)\s*([km]?)', text)
+    if not match:
+        return None
+    value = float(match[1])
+    return int(value * 1000 if match[2] == 'm' else value if match[2] == 'k' else value / 1000)
+
+
+class StreamCatalog:
+    """Turns a stream name plus request options into a launch plan from the .conf files"""
+
+    def __init__(self, config_dir, streams_dir, recordings_dir, state_dir):
+        self.config_dir = config_dir
+        self.streams_dir = streams_dir
+        self.recordings_dir = recordings_dir
+        self.state_dir = state_dir  # Where hdhomerun-manager.sh caches the discovered tuner IP
+
+    def names(self):
+        return ('wrestling', 'saints', 'hdhomerun')
+
+    def _conf(self, filename):
+        return load_conf(os.path.join(self.config_dir, filename))
+
+    def _presets(self, conf):
+        return quality_presets(conf)
+
+    def hdhomerun_source(self, channel):
+        device = self._conf('hdhomerun.conf').get('DEVICE_CONFIG', {})
+        ip = device.get('device_ip', 'auto')
+        if ip == 'auto':
+            try:
+                with open(os.path.join(self.state_dir, 'hdhomerun_ip.txt')) as f:
+                    ip = f.read().strip()
+            except OSError:
+                return None
+        return f"http://{ip}:{device.get('video_port', '5004')}/auto/v{channel}" if ip else None
+
+    def plan(self, name, options):
+        """{'sources': [...], 'quality': {...}, 'max_bitrate': kbps, 'hls_path', 'record_path', 'label'}"""
+        if name == 'wrestling':
+            return self._plan_wrestling(options)
+        if name == 'saints':
+            return self._plan_saints(options)
+        if name == 'hdhomerun':
+            return self._plan_hdhomerun(options)
+        raise KeyError(name)
+
+    def _plan_wrestling(self, options):
+        conf = self._conf('wwe-aew-streams.conf')
+        urls = conf.get('WWE_STREAMS', {})
+        event = options.get('event') or 'raw'
+        if event in WWE_EVENTS:
+            sources = [urls.get('peacock_url'), urls.get('wwe_network_intl')]
+        elif event in AEW_EVENTS:
+            sources = [urls.get('aew_tnt_url' if event == 'rampage' else 'aew_tbs_url')]
+        else:
+            raise ValueError(f'Unknown wrestling event type: {event}')
+        quality = resolve_quality(self._presets(conf), options.get('quality'), urls.get('record_quality', '720p'),
+                                  {'height': 720, 'fps': 30})
+        return {
+            'label': event,
+            'sources': [s for s in sources if s],
+            'quality': quality,
+            'max_bitrate': None,
+            'hls_path': os.path.join(self.streams_dir, f'{event}.m3u8'),
+            'record_path': os.path.join(urls.get('recording_path') or f'{self.recordings_dir}/wrestling',
+                                        f"{event}_%Y%m%d_%H%M.{urls.get('record_format', 'mkv')}")
+        }
+
+    def _plan_saints(self, options):
+        conf = self._conf('saints-streams.conf')
+        urls = conf.get('SAINTS_STREAMS', {})
+        game_type = options.get('game_type') or 'regular'
+        sources = []
+        if options.get('channel'):
+            # Local OTA broadcast first: best quality, no buffering
+            sources.append(self.hdhomerun_source(options['channel']))
+        if datetime.date.today().weekday() == 3 and urls.get('prime_tnf', '').lower() == 'true':
+            sources.append(urls.get('amazon_prime_url'))
+        sources += [urls.get(key) for key in ('nfl_plus_url', 'nfl_network_url', 'wwl_tv_url',
+                                               'fox8_url', 'amazon_prime_url')]
+        quality = resolve_quality(self._presets(conf), options.get('quality'), urls.get('default_quality', '1080p'),
+                                  {'height': 1080, 'fps': 30})
+        return {
+            'label': f'saints_{game_type}',
+            'sources': list(dict.fromkeys(s for s in sources if s)),
+            'quality': quality,
+            'max_bitrate': parse_bitrate(urls.get('max_bitrate')),
+            'min_bitrate': parse_bitrate(urls.get('min_bitrate')),
+            'hls_path': os.path.join(self.streams_dir, 'saints_live.m3u8'),
+            'record_path': os.path.join(urls.get('recording_path') or f'{self.recordings_dir}/saints',
+                                        f"saints_{game_type}_%Y%m%d_%H%M.{urls.get('record_format', 'mp4')}")
+        }
+
+    def _plan_hdhomerun(self, options):
+        conf = self._conf('hdhomerun.conf')
+        channels = conf.get('LOCAL_CHANNELS', {})
+        channel = options.get('channel') or channels.get('cbs_channel')
+        if not channel:
+            raise ValueError('No HDHomeRun channel given or configured')
+        recording = conf.get('RECORDING_CONFIG', {})
+        quality = resolve_quality(self._presets(conf), options.get('quality'), '720p', {'height': 720, 'fps': 30})
+        return {
+            'label': f'ota_{channel}',
+            'sources': [s for s in [self.hdhomerun_source(channel)] if s],
+            'quality': quality,
+            'max_bitrate': None,
+            'hls_path': os.path.join(self.streams_dir, f'hdhomerun_{channel}.m3u8'),
+            'record_path': os.path.join(recording.get('ota_recordings_path') or f'{self.recordings_dir}/ota',
+                                        f"ota_{channel}_%Y%m%d_%H%M.{recording.get('record_format', 'ts')}")
+        }
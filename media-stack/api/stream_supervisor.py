@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+ffmpeg stream supervisor for the Garuda Media Stack Control API
+Launches one encoder per stream, reads its -progress output and restarts encoders that stall or die
+"""
+
+import os
+import subprocess
+import threading
+import time
+
+# Default video bitrate (kbit/s) per output height when a stream has no configured ceiling
+BITRATE_LADDER = {2160: 16000, 1440: 10000, 1080: 6000, 720: 3500, 480: 1500, 360: 800}
+
+
+def resolve_stream_url(page, timeout=45):
+    """Direct URLs pass through; web pages are resolved with streamlink (None if no stream)"""
+    if page.startswith('http') and ('/auto/v' in page or page.endswith(('.m3u8', '.ts'))):
+        return page
+    try:
+        result = subprocess.run(['streamlink', '--stream-url', page, 'best'],
+                                capture_output=True, text=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    url = result.stdout.strip()
+    return url if result.returncode == 0 and url.startswith('http') else None
+
+
+def ladder_bitrate(height):
+    for rung in sorted(BITRATE_LADDER, reverse=True):
+        if height >= rung:
+            return BITRATE_LADDER[rung]
+    return min(BITRATE_LADDER.values())
+
+
+def ffmpeg_command(source, plan, video):
+    """One ffmpeg reading the source once: a copy-mode recording plus a live HLS rendition"""
+    bitrate = video['bitrate']
+    return [
+        'ffmpeg', '-hide_banner', '-nostdin', '-nostats', '-loglevel', 'warning',
+        '-progress', 'pipe:1',
+        '-i', source,
+        # Live rendition for web viewing
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-c:v', 'libx264', '-preset', video['preset'], '-tune', 'zerolatency',
+        '-vf', f"scale=-2:{video['height']}", '-r', str(video['fps']),
+        '-b:v', f'{bitrate}k', '-maxrate', f'{bitrate}k', '-bufsize', f'{bitrate * 2}k',
+        '-c:a', 'aac', '-b:a', f"{video.get('audio_bitrate', 128)}k",
+        '-f', 'hls', '-hls_time', '6', '-hls_list_size', '10', '-hls_flags', 'delete_segments',
+        plan['hls_path'],
+        # Recording keeps the source encoding: no second encode
+        '-map', '0:v:0', '-map', '0:a:0?', '-c', 'copy',
+        '-f', 'segment', '-segment_time', '3600', '-reset_timestamps', '1', '-strftime', '1',
+        plan['record_path']
+    ]
+
+
+def pidfile_path(pid_dir, name):
+    """Pidfile of a supervised stream's encoder, next to stream-manager.sh's <event>_hls.pid files"""
+    return os.path.join(pid_dir, f'supervised-{name}_hls.pid')
+
+
+def count_live_encoders(pid_dir):
+    """Live HLS encoders recorded in pid_dir, whichever API server or stream-manager.sh started them"""
+    count = 0
+    try:
+        names = os.listdir(pid_dir)
+    except OSError:
+        return 0
+    for filename in names:
+        if not filename.endswith('_hls.pid'):
+            continue
+        try:
+            with open(os.path.join(pid_dir, filename)) as f:
+                os.kill(int(f.read().strip()), 0)
+            count += 1
+        except PermissionError:
+            count += 1   # Alive, just not ours to signal
+        except (OSError, ValueError):
+            pass
+    return count
+
+
+def default_video(plan):
+    """Encoder settings straight from the plan's configured quality"""
+    quality = plan['quality']
+    bitrate = ladder_bitrate(quality['height'])
+    if plan.get('max_bitrate'):
+        bitrate = min(bitrate, plan['max_bitrate'])
+    return {'height': quality['height'], 'fps': quality['fps'], 'preset': 'veryfast',
+            'bitrate': bitrate, 'audio_bitrate': 192 if quality['height'] >= 1080 else 128}
+
+
+def parse_progress_value(key, value):
+    """Typed value for one `-progress` key (None for N/A)"""
+    if value in ('N/A', ''):
+        return None
+    try:
+        if key == 'bitrate':
+            return float(value.replace('kbits/s', ''))
+        if key == 'speed':
+            return float(value.rstrip('x'))
+        if key == 'fps':
+            return float(value)
+        if key in ('frame', 'drop_frames', 'dup_frames', 'total_size', 'out_time_us'):
+            return int(value)
+    except ValueError:
+        return None
+    return value
+
+
+class Encoder:
+    """One running ffmpeg child and the latest block of its progress report"""
+
+    def __init__(self, argv, log_path):
+        self.argv = argv
+        log = open(log_path, 'ab') if log_path else subprocess.DEVNULL
+        try:
+            self.proc = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                         stderr=log, text=True, start_new_session=True)
+        finally:
+            if log_path:
+                log.close()
+        self.started = time.monotonic()
+        self.last_advance = self.started   # Last time out_time moved forward
+        self.progress = {}
+        self._out_time = None
+        self._reader = threading.Thread(target=self._read, name=f'ffmpeg-progress-{self.proc.pid}', daemon=True)
+        self._reader.start()
+
+    @property
+    def pid(self):
+        return self.proc.pid
+
+    def _read(self):
+        block = {}
+        for line in self.proc.stdout:
+            key, sep, value = line.strip().partition('=')
+            if not sep:
+                continue
+            if key != 'progress':
+                block[key] = parse_progress_value(key, value.strip())
+                continue
+            # `progress=continue|end` closes a report block
+            out_time = block.get('out_time_us')
+            if out_time is not None and (self._out_time is None or out_time > self._out_time):
+                self._out_time = out_time
+                self.last_advance = time.monotonic()
+            self.progress = {
+                'fps': block.get('fps'),
+                'bitrate_kbps': block.get('bitrate'),
+                'speed': block.get('speed'),
+                'frames': block.get('frame'),
+                'dropped_frames': block.get('drop_frames'),
+                'duplicated_frames': block.get('dup_frames'),
+                'out_time_s': round(out_time / 1e6, 1) if out_time else None
+            }
+            block = {}
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def stop(self, timeout=5):
+        """SIGTERM so ffmpeg finalises its outputs, SIGKILL if it does not exit"""
+        if self.alive():
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+
+
+class StreamSupervisor:
+    """Registry of supervised streams with a watchdog that restarts stalled encoders"""
+
+    def __init__(self, catalog, resolve=resolve_stream_url, choose_video=default_video, release_video=None,
+                 log_dir=None, pid_dir=None, stall_timeout=30, check_interval=5, max_restarts=5, restart_window=600):
+        self.catalog = catalog
+        self.resolve = resolve
+        self.choose_video = choose_video    # plan -> encoder settings
+        self.release_video = release_video  # settings whose encoder did not start -> None
+        self.log_dir = log_dir
+        self.pid_dir = pid_dir  # Shared with stream-manager.sh so every server counts the same encoders
+        self.stall_timeout = stall_timeout
+        self.check_interval = check_interval
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self._streams = {}   # name -> state dict
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._watchdog = None
+
+    def _launch(self, name, plan, video):
+        """Resolve the first working source and start its encoder; raises RuntimeError if none"""
+        for page in plan['sources']:
+            source = self.resolve(page)
+            if not source:
+                continue
+            for path in (plan['hls_path'], plan['record_path']):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            log_path = os.path.join(self.log_dir, f'ffmpeg_{name}.log') if self.log_dir else None
+            return Encoder(ffmpeg_command(source, plan, video), log_path), page
+        raise RuntimeError(f'No stream source available for {name}')
+
+    def start(self, name, **options):
+        """Start (or report the already running) stream; blocking, so call it off the event loop"""
+        plan = self.catalog.plan(name, options)
+        with self._lock:
+            state = self._streams.get(name)
+            if state and state['encoder'] and state['encoder'].alive():
+                return self._describe(name, state)
+        # Source resolution can take a while; keep the registry readable meanwhile
+        video = self.choose_video(plan)
+        try:
+            encoder, page = self._launch(name, plan, video)
+        except BaseException:
+            self._release(video)
+            raise
+        with self._lock:
+            state = self._streams.get(name)
+            if state and state['encoder'] and state['encoder'].alive():
+                encoder.stop()  # Lost a race with a concurrent start
+                self._release(video)
+                return self._describe(name, state)
+            state = self._streams[name] = {
+                'plan': plan, 'video': video, 'encoder': encoder, 'source': page,
+                'status': 'starting', 'restarts': [], 'started_at': time.time(), 'error': None
+            }
+            state['pidfile'] = self._write_pidfile(name, encoder)
+        self._ensure_watchdog()
+        return self._describe(name, state)
+
+    def _release(self, video):
+        if self.release_video:
+            self.release_video(video)
+
+    def _write_pidfile(self, name, encoder):
+        """Record the encoder in the shared pid directory; returns the path, None if not recorded"""
+        if not self.pid_dir:
+            return None
+        path = pidfile_path(self.pid_dir, name)
+        try:
+            os.makedirs(self.pid_dir, exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(f'{encoder.pid}\n')
+        except OSError:
+            return None
+        return path
+
+    def _remove_pidfile(self, name):
+        if not self.pid_dir:
+            return
+        try:
+            os.unlink(pidfile_path(self.pid_dir, name))
+        except OSError:
+            pass
+
+    def _stopped_externally(self, state):
+        """stream-manager.sh stop kills every encoder in pids/ and deletes its pidfile"""
+        return bool(state.get('pidfile')) and not os.path.exists(state['pidfile'])
+
+    def stop(self, name=None):
+        """Stop one stream (or all); returns the names stopped"""
+        with self._lock:
+            names = [name] if name else list(self._streams)
+            states = [(n, self._streams.pop(n, None)) for n in names]
+        stopped = []
+        for n, state in states:
+            if state and state['encoder']:
+                state['encoder'].stop()
+                self._remove_pidfile(n)
+                stopped.append(n)
+        return stopped
+
+    def active(self, name=None):
+        """Number of live encoders (or whether the named stream is live)"""
+        with self._lock:
+            states = [self._streams.get(name)] if name else list(self._streams.values())
+        live = sum(1 for s in states if s and s['encoder'] and s['encoder'].alive())
+        return bool(live) if name else live
+
+    def status(self):
+        with self._lock:
+            return {name: self._describe(name, state) for name, state in self._streams.items()}
+
+    def _describe(self, name, state):
+        encoder = state['encoder']
+        alive = bool(encoder and encoder.alive())
+        return {
+            'name': name,
+            'label': state['plan']['label'],
+            'status': state['status'] if alive or state['status'] == 'failed' else 'exited',
+            'pid': encoder.pid if alive else None,
+            'source': state['source'],
+            'video': state['video'],
+            'progress': encoder.progress if encoder else {},
+            'uptime': round(time.monotonic() - encoder.started) if alive else 0,
+            'restarts': len(state['restarts']),
+            'error': state['error']
+        }
+
+    def _ensure_watchdog(self):
+        with self._lock:
+            if self._watchdog and self._watchdog.is_alive():
+                return
+            self._stop.clear()
+            self._watchdog = threading.Thread(target=self._watch, name='stream-watchdog', daemon=True)
+            self._watchdog.start()
+
+    def _watch(self):
+        while not self._stop.wait(self.check_interval):
+            with self._lock:
+                items = list(self._streams.items())
+            for name, state in items:
+                try:
+                    self._check(name, state)
+                except Exception as e:
+                    state['error'] = str(e)
+
+    def _check(self, name, state):
+        encoder = state['encoder']
+        if state['status'] == 'failed' or encoder is None:
+            return
+        now = time.monotonic()
+        if encoder.alive():
+            if now - encoder.last_advance < self.stall_timeout:
+                speed = encoder.progress.get('speed')
+                state['status'] = 'lagging' if speed is not None and speed < 0.95 else 'running'
+                return
+            reason = f'stalled for {round(now - encoder.last_advance)}s'
+        else:
+            if self._stopped_externally(state):
+                with self._lock:
+                    if self._streams.get(name) is state:
+                        del self._streams[name]
+                return
+            reason = f'exited with code {encoder.proc.returncode}'
+        state['restarts'] = [t for t in state['restarts'] if now - t < self.restart_window]
+        if len(state['restarts']) >= self.max_restarts:
+            encoder.stop()
+            self._remove_pidfile(name)
+            state['status'] = 'failed'
+            state['error'] = f'{reason}; gave up after {self.max_restarts} restarts'
+            return
+        encoder.stop()
+        state['restarts'].append(now)
+        state['status'] = 'restarting'
+        state['error'] = reason
+        # Re-resolve: signed stream URLs expire, and the first source may have come back
+        new_encoder, page = self._launch(name, state['plan'], state['video'])
+        with self._lock:
+            if self._streams.get(name) is state:
+                state.update(encoder=new_encoder, source=page, status='starting')
+                state['pidfile'] = self._write_pidfile(name, new_encoder)
+                return
+        new_encoder.stop()  # Stream was stopped while we were relaunching
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Hardware-aware transcoding profile selector for the Garuda Media Stack
+Picks resolution, frame rate, x264 preset and bitrate from CPU headroom, or refuses a stream before the box saturates
+"""
+
+import collections
+import os
+import threading
+import time
+
+# Output rungs, best first: (height, fps, video kbit/s)
+LADDER = (
+    (2160, 60, 20000), (2160, 30, 16000),
+    (1440, 60, 12000), (1440, 30, 9000),
+    (1080, 60, 8000), (1080, 30, 6000),
+    (720, 60, 4500), (720, 30, 3500),
+    (480, 30, 1500), (360, 30, 800)
+)
+
+# x264 presets we are willing to use, the live default first, with CPU cost relative to veryfast
+PRESET_COST = (('veryfast', 1.0), ('superfast', 0.7), ('ultrafast', 0.45))
+
+# Cores one veryfast 1080p30 live encode needs on this class of hardware
+CORES_PER_1080P30 = float(os.environ.get('TRANSCODE_CORES_PER_1080P30', '1.5'))
+
+# Fraction of the machine kept free for Jellyfin, the *arr apps and the API itself
+RESERVE_FRACTION = float(os.environ.get('TRANSCODE_RESERVE', '0.25'))
+
+# Measured CPU lags a fresh encoder's ramp-up; count its estimate against headroom this long (seconds)
+WARMUP_SECONDS = 30
+
+# Never go below this height; refuse instead
+MIN_HEIGHT = 480
+
+LADDER_FPS = sorted({fps for _, fps, _ in LADDER})
+
+
+class ProfileRefused(RuntimeError):
+    """Raised when a new stream would saturate the host; carries the decision record"""
+
+    def __init__(self, decision):
+        super().__init__(decision['reason'])
+        self.decision = decision
+
+
+def estimate_cores(height, fps, preset_cost):
+    """Cores a live libx264 encode needs, scaled from the 1080p30 veryfast reference by pixel rate"""
+    width = height * 16 / 9
+    return CORES_PER_1080P30 * (width * height * fps) / (1920 * 1080 * 30) * preset_cost
+
+
+class ProfileSelector:
+    """Choose encoder settings per stream start and remember why"""
+
+    def __init__(self, cpu_percent, active_streams, cpu_count=None, max_streams=3,
+                 reserve=RESERVE_FRACTION, min_height=MIN_HEIGHT, history=50):
+        self.cpu_percent = cpu_percent          # () -> recent whole-machine CPU busy %
+        self.active_streams = active_streams    # () -> number of running encoders
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+        self.max_streams = max_streams
+        self.reserve = reserve
+        self.min_height = min_height
+        self._reserved = []                     # [(expires, cores, video)] for encoders still warming up
+        self._decisions = collections.deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def headroom(self):
+        """Cores free for new encoders after the reserve and warming-up encoders"""
+        now = time.monotonic()
+        with self._lock:
+            self._reserved = [r for r in self._reserved if r[0] > now]
+            warming = sum(c for _, c, _ in self._reserved)
+        busy = self.cpu_count * min(100.0, max(0.0, self.cpu_percent())) / 100
+        return self.cpu_count * (1 - self.reserve) - busy - warming
+
+    def choose(self, plan):
+        """Encoder settings for a plan ({'label', 'quality', 'max_bitrate', ...}); raises ProfileRefused"""
+        requested = plan['quality']
+        active = self.active_streams()
+        free = self.headroom()
+        decision = {
+            'stream': plan.get('label'),
+            'requested': f"{requested['height']}p{requested['fps']}",
+            'active_streams': active,
+            'cpu_percent': round(self.cpu_percent(), 1),
+            'cores_free': round(free, 2),
+            'at': time.time()
+        }
+        if active >= self.max_streams:
+            return self._refuse(decision, f'{active} streams already running (limit {self.max_streams})')
+
+        floor = min(self.min_height, requested['height'])
+        # 24/25/50 fps requests use the ladder rate at or below them (at least 30) and encode at the requested rate
+        ladder_fps = max([f for f in LADDER_FPS if f <= requested['fps']] or LADDER_FPS[:1])
+        for height, rung_fps, bitrate in LADDER:
+            if height > requested['height'] or rung_fps > ladder_fps or height < floor:
+                continue
+            fps = min(rung_fps, requested['fps'])
+            if plan.get('max_bitrate'):
+                bitrate = min(bitrate, plan['max_bitrate'])
+            for preset, cost in PRESET_COST:
+                cores = estimate_cores(height, fps, cost)
+                if cores > free:
+                    continue
+                video = {'height': height, 'fps': fps, 'preset': preset, 'bitrate': bitrate,
+                         'audio_bitrate': 192 if height >= 1080 else 128}
+                downgraded = (height, fps) != (requested['height'], requested['fps']) or preset != PRESET_COST[0][0]
+                decision.update(action='downgraded' if downgraded else 'accepted',
+                                chosen=f'{height}p{fps}', preset=preset, bitrate=bitrate,
+                                estimated_cores=round(cores, 2),
+                                reason='fits current headroom' if not downgraded
+                                else f'{decision["requested"]} veryfast needs more than {free:.1f} free cores')
+                with self._lock:
+                    self._reserved.append((time.monotonic() + WARMUP_SECONDS, cores, video))
+                    self._decisions.append(decision)
+                return video
+
+        lowest = estimate_cores(floor, 30, PRESET_COST[-1][1])
+        return self._refuse(decision, f'{free:.2f} cores free; even {floor}p30 needs {lowest:.2f}')
+
+    def release(self, video):
+        """Give back the warm-up reservation of settings from choose() whose encoder never started"""
+        with self._lock:
+            self._reserved = [r for r in self._reserved if r[2] is not video]
+
+    def _refuse(self, decision, reason):
+        decision.update(action='refused', reason=reason)
+        with self._lock:
+            self._decisions.append(decision)
+        raise ProfileRefused(decision)
+
+    def decisions(self):
+        """Recent decisions, newest first"""
+        with self._lock:
+            return list(reversed(self._decisions))
+
+    def describe(self):
+        return {
+            'cpu_count': self.cpu_count,
+            'cpu_percent': round(self.cpu_percent(), 1),
+            'cores_free': round(self.headroom(), 2),
+            'active_streams': self.active_streams(),
+            'max_streams': self.max_streams,
+            'reserve': self.reserve,
+            'decisions': self.decisions()
+        }
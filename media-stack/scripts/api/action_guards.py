@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Request coalescing and rate limiting for the Garuda Media Stack Control API
+Single-flight for mutating actions, per-resource serialization and token buckets for expensive reads
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+from async_commands import CommandLimit
+
+
+class SingleFlight:
+    """Concurrent callers with the same key share one in-flight operation and its result"""
+
+    def __init__(self):
+        # concurrent.futures rather than asyncio: under Flask every request has its own event loop
+        self._inflight = {}   # key -> concurrent.futures.Future
+        self._lock = threading.Lock()
+
+    async def run(self, key, operation):
+        """Await operation() unless one is already running for key; returns (result, joined)"""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = concurrent.futures.Future()
+        if not leader:
+            return await asyncio.wrap_future(future), True
+        try:
+            result = await operation()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return result, False
+
+    def inflight(self):
+        with self._lock:
+            return sorted(self._inflight)
+
+
+class ResourceLocks:
+    """One exclusive, loop-agnostic lock per named resource (vpn, services, streams, ...)"""
+
+    def __init__(self):
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, resource):
+        with self._lock:
+            if resource not in self._locks:
+                self._locks[resource] = CommandLimit(1)
+            return self._locks[resource]
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, tokens=1):
+        """Consume tokens if available; returns 0 on success or the seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0
+            return (tokens - self._tokens) / self.rate
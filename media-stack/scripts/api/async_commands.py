@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Non-blocking command execution for the Garuda Media Stack Control API
+Runs argv lists through asyncio.create_subprocess_exec (no shell) with per-kind concurrency limits
+"""
+
+import asyncio
+import os
+import subprocess
+import threading
+import time
+
+# Maximum concurrent processes per command kind; anything unlisted uses 'default'
+DEFAULT_LIMITS = {
+    'wg': 2,
+    'ufw': 1,
+    'journalctl': 1,
+    'ghost': 1,
+    'service': 4,
+    'stream': 2,
+    'default': 4
+}
+
+
+class CommandLimit:
+    """Concurrency limit usable from any event loop (Flask runs one loop per request)"""
+
+    def __init__(self, limit):
+        self._sem = threading.BoundedSemaphore(limit)
+
+    async def __aenter__(self):
+        if self._sem.acquire(blocking=False):
+            return self
+        loop = asyncio.get_running_loop()
+        acquired = loop.run_in_executor(None, self._sem.acquire)
+        try:
+            await asyncio.shield(acquired)
+        except asyncio.CancelledError:
+            # The executor thread still takes the slot; hand it straight back
+            acquired.add_done_callback(lambda f: self._sem.release())
+            raise
+        return self
+
+    async def __aexit__(self, *exc):
+        self._sem.release()
+
+
+def command_kind(argv):
+    """Default limit bucket for a command: its program name, ignoring sudo"""
+    program = argv[1] if argv[0] == 'sudo' and len(argv) > 1 else argv[0]
+    return os.path.basename(program)
+
+
+class AsyncCommandRunner:
+    """Run commands without blocking the event loop, bounded per command kind"""
+
+    def __init__(self, limits=None, stats=None):
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.stats = stats  # Optional recorder with record(argv, elapsed, returncode, timed_out, error)
+        self._gates = {}
+        self._lock = threading.Lock()
+
+    def gate(self, kind):
+        with self._lock:
+            if kind not in self._gates:
+                self._gates[kind] = CommandLimit(self.limits.get(kind, self.limits['default']))
+            return self._gates[kind]
+
+    async def run(self, argv, kind=None, timeout=10, cwd=None):
+        """Execute argv and return the same dict shape as run_command()"""
+        kind = kind or command_kind(argv)
+        async with self.gate(kind if kind in self.limits else 'default'):
+            # Timed from launch, so waiting on the gate is not billed to the command
+            started = time.perf_counter()
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *argv, cwd=cwd,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE
+                )
+            except Exception as e:
+                self._record(argv, started, error=True)
+                return {'success': False, 'error': str(e)}
+            try:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                self._record(argv, started, timed_out=True)
+                return {'success': False, 'error': 'Command timeout'}
+            except asyncio.CancelledError:
+                proc.kill()
+                raise
+            self._record(argv, started, returncode=proc.returncode)
+            return {
+                'success': proc.returncode == 0,
+                'stdout': stdout.decode(errors='replace').strip(),
+                'stderr': stderr.decode(errors='replace').strip(),
+                'returncode': proc.returncode
+            }
+
+    def _record(self, argv, started, **outcome):
+        if self.stats:
+            self.stats.record(argv, time.perf_counter() - started, **outcome)
+
+    def spawn(self, argv, cwd=None, log_path=None):
+        """Start a detached long-running process (the nohup ... & equivalent); returns its PID"""
+        # Popen rather than the event loop: the child must outlive a per-request loop,
+        # and subprocess reaps it once it exits
+        log = open(log_path, 'ab') if log_path else subprocess.DEVNULL
+        try:
+            proc = subprocess.Popen(
+                argv, cwd=cwd,
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                start_new_session=True
+            )
+        finally:
+            if log_path:
+                log.close()
+        return proc.pid
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Server-Sent Events push channel for the Garuda Media Stack Control API
+Collects dashboard state only while clients are connected and streams the deltas
+"""
+
+import json
+import queue
+import threading
+
+
+def diff_state(old, new):
+    """Return the parts of `new` that differ from `old` (removed keys map to None)"""
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return new
+    delta = {}
+    for key, value in new.items():
+        if key not in old:
+            delta[key] = value
+        elif old[key] != value:
+            delta[key] = diff_state(old[key], value)
+    for key in old:
+        if key not in new:
+            delta[key] = None
+    return delta
+
+
+def format_event(event, data, event_id=None):
+    """Encode one SSE frame"""
+    lines = [f'event: {event}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data, sort_keys=True)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class StateBroadcaster:
+    """Fan state deltas out to subscriber queues from one collector thread"""
+
+    def __init__(self, collect, interval=2.0, keepalive=15.0, queue_size=32):
+        self.collect = collect
+        self.interval = interval
+        self.keepalive = keepalive
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._state = None
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def subscribe(self):
+        """Register a client; returns its queue primed with the full state"""
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(q)
+            if self._state is not None:
+                q.put(('state', self._seq, self._state))
+            if not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name='state-broadcaster', daemon=True)
+                self._thread.start()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def poke(self):
+        """Collect immediately instead of waiting for the next tick"""
+        self._wake.set()
+
+    def stream(self):
+        """Generator of encoded SSE frames for one client"""
+        q = self.subscribe()
+        try:
+            yield b'retry: 5000\n\n'
+            while True:
+                try:
+                    event, seq, data = q.get(timeout=self.keepalive)
+                except queue.Empty:
+                    yield b': keepalive\n\n'
+                    continue
+                yield format_event(event, data, seq).encode()
+        finally:
+            self.unsubscribe(q)
+
+    def _publish(self, event, data):
+        self._seq += 1
+        for q in list(self._subscribers):
+            try:
+                q.put_nowait((event, self._seq, data))
+            except queue.Full:
+                # Slow client: drop its backlog and resend the full state
+                with q.mutex:
+                    q.queue.clear()
+                q.put_nowait(('state', self._seq, self._state))
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    self._state = None
+                    return
+            try:
+                state = self.collect()
+            except Exception as e:
+                state = {'error': str(e)}
+            with self._lock:
+                if self._state is None:
+                    self._state = state
+                    self._publish('state', state)
+                elif state != self._state:
+                    delta = diff_state(self._state, state)
+                    self._state = state
+                    self._publish('delta', delta)
+            self._wake.wait(self.interval)
+            self._wake.clear()
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Media library indexer for the Garuda Media Stack Control API
+Walks the libraries once into SQLite, then follows inotify so size and growth queries never rescan
+"""
+
+import ctypes
+import ctypes.util
+import datetime
+import errno
+import os
+import select
+import sqlite3
+import struct
+import threading
+import time
+
+# inotify(7) event bits
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_EVENT = struct.Struct('iIII')
+
+# Batch index writes from event bursts (seconds)
+COMMIT_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, library TEXT NOT NULL, item TEXT NOT NULL, size INTEGER NOT NULL, mtime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_item ON files(library, item);
+CREATE TABLE IF NOT EXISTS items (
+    library TEXT NOT NULL, item TEXT NOT NULL, size INTEGER NOT NULL, files INTEGER NOT NULL,
+    PRIMARY KEY (library, item)
+);
+CREATE INDEX IF NOT EXISTS items_size ON items(size);
+CREATE TABLE IF NOT EXISTS daily (
+    day TEXT NOT NULL, library TEXT NOT NULL, size INTEGER NOT NULL, files INTEGER NOT NULL,
+    PRIMARY KEY (day, library)
+);
+"""
+
+
+class Inotify:
+    """Minimal ctypes binding: non-blocking fd, add/remove watches, parse event batches"""
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd):
+        """Drop a watch; a wd the kernel already released (EINVAL) is not an error"""
+        if self._libc.inotify_rm_watch(self.fd, wd) < 0:
+            err = ctypes.get_errno()
+            if err != errno.EINVAL:
+                raise OSError(err, os.strerror(err))
+
+    def read(self, timeout):
+        """[(wd, mask, cookie, name)] available within `timeout` seconds"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events, offset = [], 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            events.append((wd, mask, cookie, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class MediaIndex:
+    """SQLite index of library -> item (show, movie, artist folder) -> file sizes, kept live by inotify"""
+
+    def __init__(self, db_path, libraries):
+        self.db_path = db_path
+        self.libraries = libraries    # name -> {'path': str, 'service': str}
+        self._watches = {}            # wd -> (library, directory)
+        self._thread = None
+        self._stop = threading.Event()
+        self._state = {'status': 'idle', 'watch_errors': 0, 'events': 0, 'scanned_at': None}
+        self._state_lock = threading.Lock()
+
+    # ----- lifecycle -----
+
+    def start(self):
+        """Scan (or reconcile) every library, then follow changes, on a background thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='media-index', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def state(self):
+        with self._state_lock:
+            return dict(self._state, watches=len(self._watches))
+
+    def _set_state(self, **values):
+        with self._state_lock:
+            self._state.update(values)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _run(self):
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        db = self._connect()
+        db.executescript(SCHEMA)
+        try:
+            inotify = Inotify()
+        except OSError:
+            inotify = None
+        try:
+            self._set_state(status='scanning')
+            for library in self.libraries:
+                self._scan_library(db, inotify, library)
+            self._snapshot_day(db)
+            db.commit()
+            self._set_state(status='watching' if inotify else 'scanned', scanned_at=time.time())
+            if inotify:
+                self._follow(db, inotify)
+        except Exception as e:
+            self._set_state(status='error', error=str(e))
+        finally:
+            if inotify:
+                inotify.close()
+            db.close()
+
+    # ----- full walk -----
+
+    def _item_of(self, library, path):
+        """Top-level entry under the library root: the show, movie or artist folder"""
+        relative = os.path.relpath(path, self.libraries[library]['path'])
+        return relative.split(os.sep, 1)[0] if relative != '.' else ''
+
+    def _watch(self, inotify, library, directory):
+        if inotify is None:
+            return
+        try:
+            self._watches[inotify.add_watch(directory)] = (library, directory)
+        except OSError as e:
+            with self._state_lock:
+                self._state['watch_errors'] += 1
+                if e.errno == errno.ENOSPC:
+                    self._state['error'] = 'fs.inotify.max_user_watches exhausted; raise it for live updates'
+
+    def _walk(self, inotify, library, root):
+        """Yield (path, size, mtime) for every regular file below root, watching each directory"""
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            self._watch(inotify, library, directory)
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                st = entry.stat(follow_symlinks=False)
+                                yield entry.path, st.st_size, st.st_mtime
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+    def _scan_library(self, db, inotify, library, root=None):
+        """Walk a library (or a subtree of it) and reconcile the index with what is on disk"""
+        top = self.libraries[library]['path']
+        root = root or top
+        if not os.path.isdir(root):
+            return
+        prefix = root.rstrip(os.sep) + os.sep
+        known = dict(db.execute('SELECT path, size FROM files WHERE path >= ? AND path < ? AND library = ?',
+                                (*_prefix_range(prefix), library)))
+        batch = []
+        for path, size, mtime in self._walk(inotify, library, root):
+            if known.pop(path, None) != size:
+                batch.append((path, size, mtime))
+            if len(batch) >= 5000:
+                self._upsert(db, library, batch)
+                batch = []
+        self._upsert(db, library, batch)
+        for path in known:  # Gone while we were not watching
+            self._remove(db, library, path)
+        if root == top:
+            self._rebuild_items(db, library)
+
+    # ----- incremental updates -----
+
+    def _upsert(self, db, library, rows):
+        for path, size, mtime in rows:
+            item = self._item_of(library, path)
+            old = db.execute('SELECT size FROM files WHERE path = ?', (path,)).fetchone()
+            db.execute('INSERT OR REPLACE INTO files (path, library, item, size, mtime) VALUES (?, ?, ?, ?, ?)',
+                       (path, library, item, size, mtime))
+            self._adjust_item(db, library, item, size - (old[0] if old else 0), 0 if old else 1)
+
+    def _remove(self, db, library, path):
+        row = db.execute('SELECT item, size FROM files WHERE path = ?', (path,)).fetchone()
+        if row:
+            db.execute('DELETE FROM files WHERE path = ?', (path,))
+            self._adjust_item(db, library, row[0], -row[1], -1)
+
+    def _remove_tree(self, db, inotify, library, directory):
+        prefix = directory.rstrip(os.sep) + os.sep
+        bounds = _prefix_range(prefix)
+        rows = db.execute('SELECT item, SUM(size), COUNT(*) FROM files WHERE path >= ? AND path < ? '
+                          'AND library = ? GROUP BY item', (*bounds, library)).fetchall()
+        db.execute('DELETE FROM files WHERE path >= ? AND path < ? AND library = ?', (*bounds, library))
+        for item, size, count in rows:
+            self._adjust_item(db, library, item, -size, -count)
+        # Still live for a directory moved out of the library; IN_IGNORED already dropped deleted ones
+        for wd, (lib, watched) in list(self._watches.items()):
+            if lib == library and (watched == directory or watched.startswith(prefix)):
+                del self._watches[wd]
+                inotify.rm_watch(wd)
+
+    def _adjust_item(self, db, library, item, size_delta, file_delta):
+        db.execute('INSERT INTO items (library, item, size, files) VALUES (?, ?, ?, ?) '
+                   'ON CONFLICT (library, item) DO UPDATE SET size = size + excluded.size, files = files + excluded.files',
+                   (library, item, size_delta, file_delta))
+        db.execute('DELETE FROM items WHERE library = ? AND item = ? AND files <= 0', (library, item))
+
+    def _rebuild_items(self, db, library):
+        db.execute('DELETE FROM items WHERE library = ?', (library,))
+        db.execute('INSERT INTO items (library, item, size, files) '
+                   'SELECT library, item, SUM(size), COUNT(*) FROM files WHERE library = ? GROUP BY item',
+                   (library,))
+
+    def _snapshot_day(self, db):
+        day = datetime.date.today().isoformat()
+        for library in self.libraries:
+            size, files = db.execute('SELECT COALESCE(SUM(size), 0), COALESCE(SUM(files), 0) FROM items '
+                                     'WHERE library = ?', (library,)).fetchone()
+            db.execute('INSERT OR REPLACE INTO daily (day, library, size, files) VALUES (?, ?, ?, ?)',
+                       (day, library, size, files))
+
+    def _follow(self, db, inotify):
+        dirty = False
+        last_commit = time.monotonic()
+        while not self._stop.is_set():
+            events = inotify.read(COMMIT_INTERVAL)
+            for wd, mask, _, name in events:
+                dirty |= self._apply(db, inotify, wd, mask, name)
+            if dirty and time.monotonic() - last_commit >= COMMIT_INTERVAL:
+                self._snapshot_day(db)
+                db.commit()
+                dirty = False
+                last_commit = time.monotonic()
+
+    def _apply(self, db, inotify, wd, mask, name):
+        with self._state_lock:
+            self._state['events'] += 1
+        if mask & IN_Q_OVERFLOW:
+            # Kernel dropped events: reconcile everything once
+            for library in self.libraries:
+                self._scan_library(db, inotify, library)
+            return True
+        if mask & IN_IGNORED:
+            self._watches.pop(wd, None)
+            return False
+        watched = self._watches.get(wd)
+        if watched is None:
+            return False
+        library, directory = watched
+        path = os.path.join(directory, name) if name else directory
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self._scan_library(db, inotify, library, path)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._remove_tree(db, inotify, library, path)
+            return True
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            self._remove(db, library, path)
+            return True
+        if mask & (IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE):
+            try:
+                st = os.stat(path, follow_symlinks=False)
+            except OSError:
+                return False
+            self._upsert(db, library, [(path, st.st_size, st.st_mtime)])
+            return True
+        return False
+
+    # ----- queries (any thread) -----
+
+    def _query(self, sql, args=()):
+        if not os.path.exists(self.db_path):
+            return []
+        conn = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True, timeout=5)
+        try:
+            return conn.execute(sql, args).fetchall()
+        except sqlite3.OperationalError:
+            return []  # Schema not created yet
+        finally:
+            conn.close()
+
+    def usage(self, library=None, limit=20):
+        """Per-library totals plus the largest items ("what's using space")"""
+        libraries = [
+            {'library': name, 'service': self.libraries[name].get('service'),
+             'path': self.libraries[name]['path'], 'size': size, 'files': files}
+            for name, size, files in self._query(
+                'SELECT library, SUM(size), SUM(files) FROM items GROUP BY library ORDER BY SUM(size) DESC')
+            if name in self.libraries
+        ]
+        if library:
+            rows = self._query('SELECT library, item, size, files FROM items WHERE library = ? '
+                               'ORDER BY size DESC LIMIT ?', (library, limit))
+        else:
+            rows = self._query('SELECT library, item, size, files FROM items ORDER BY size DESC LIMIT ?', (limit,))
+        by_service = {}
+        for entry in libraries:
+            by_service[entry['service']] = by_service.get(entry['service'], 0) + entry['size']
+        return {
+            'libraries': libraries,
+            'services': by_service,
+            'top_items': [{'library': lib, 'item': item, 'size': size, 'files': files}
+                          for lib, item, size, files in rows],
+            'index': self.state()
+        }
+
+    def growth(self, days=30):
+        """Daily library sizes and day-over-day change for the last `days` days"""
+        since = (datetime.date.today() - datetime.timedelta(days=days)).isoformat()
+        rows = self._query('SELECT day, library, size, files FROM daily WHERE day >= ? ORDER BY library, day',
+                           (since,))
+        series = {}
+        for day, library, size, files in rows:
+            points = series.setdefault(library, [])
+            delta = size - points[-1]['size'] if points else None
+            points.append({'day': day, 'size': size, 'files': files, 'delta': delta})
+        return {'days': days, 'libraries': series}
+
+
+def _prefix_range(prefix):
+    """(low, high) bounds selecting every path under a directory prefix ending in '/' via the primary key"""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
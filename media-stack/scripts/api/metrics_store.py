@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Embedded time-series store for the Garuda Media Stack dashboards
+Fixed-size array-backed ring buffers sampled at 1 s and downsampled to 1 m and 1 h tiers
+"""
+
+import threading
+import time
+from array import array
+
+# (step seconds, points kept): 1 s for an hour, 1 m for a day, 1 h for 30 days
+DEFAULT_TIERS = ((1, 3600), (60, 1440), (3600, 720))
+
+
+class RingSeries:
+    """Fixed-capacity column of (timestamp, value) pairs in two float arrays"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))
+        self.values = array('d', bytes(8 * capacity))
+        self.count = 0
+        self.head = 0  # next write position
+
+    def append(self, timestamp, value):
+        self.times[self.head] = timestamp
+        self.values[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def range(self, start, end):
+        """Points with start <= t <= end, oldest first"""
+        first = (self.head - self.count) % self.capacity
+        points = []
+        for i in range(self.count):
+            idx = (first + i) % self.capacity
+            t = self.times[idx]
+            if start <= t <= end:
+                points.append((t, self.values[idx]))
+        return points
+
+    def oldest(self):
+        if not self.count:
+            return None
+        return self.times[(self.head - self.count) % self.capacity]
+
+
+class MetricsStore:
+    """Record samples into the finest tier and roll averages up into the coarser ones"""
+
+    def __init__(self, tiers=DEFAULT_TIERS):
+        self.tiers = tuple(tiers)
+        self._series = {}    # metric -> [RingSeries per tier]
+        self._buckets = {}   # metric -> [[bucket start, sum, count] per coarser tier]
+        self._lock = threading.Lock()
+
+    def metrics(self):
+        with self._lock:
+            return sorted(self._series)
+
+    def latest(self, metric):
+        """Most recent finest-tier value for a metric, or None"""
+        with self._lock:
+            series = self._series.get(metric)
+            if series is None or not series[0].count:
+                return None
+            return series[0].values[(series[0].head - 1) % series[0].capacity]
+
+    def record(self, timestamp, values):
+        """Store one sample per metric at `timestamp` (seconds since the epoch)"""
+        with self._lock:
+            for metric, value in values.items():
+                if value is None:
+                    continue
+                if metric not in self._series:
+                    self._series[metric] = [RingSeries(capacity) for _, capacity in self.tiers]
+                    self._buckets[metric] = [None] * (len(self.tiers) - 1)
+                self._series[metric][0].append(timestamp, float(value))
+                self._roll_up(metric, timestamp, float(value))
+
+    def _roll_up(self, metric, timestamp, value):
+        for level, (step, _) in enumerate(self.tiers[1:], start=1):
+            bucket_start = timestamp - timestamp % step
+            bucket = self._buckets[metric][level - 1]
+            if bucket is not None and bucket[0] != bucket_start:
+                # Bucket closed: write its average to this tier
+                self._series[metric][level].append(bucket[0], bucket[1] / bucket[2])
+                bucket = None
+            if bucket is None:
+                bucket = self._buckets[metric][level - 1] = [bucket_start, 0.0, 0]
+            bucket[1] += value
+            bucket[2] += 1
+
+    def _pick_tier(self, series, start, step):
+        """Finest tier no finer than `step` that reaches back to `start`, else the one reaching furthest"""
+        best, best_oldest = None, None
+        for level in range(len(self.tiers)):
+            if step and level + 1 < len(self.tiers) and self.tiers[level + 1][0] <= step:
+                continue  # A coarser tier already has the requested resolution
+            oldest = series[level].oldest()
+            if oldest is None:
+                continue
+            if oldest <= start:
+                return level
+            if best_oldest is None or oldest < best_oldest:
+                best, best_oldest = level, oldest
+        return best if best is not None else 0
+
+    def query(self, metric, start, end, step=None):
+        """Return {'step': seconds, 'points': [[t, v], ...]} for one metric, or None if unknown"""
+        with self._lock:
+            series = self._series.get(metric)
+            if series is None:
+                return None
+            level = self._pick_tier(series, start, step)
+            points = series[level].range(start, end)
+        tier_step = self.tiers[level][0]
+        if step and step > tier_step:
+            points = downsample(points, step)
+            tier_step = step
+        return {'step': tier_step, 'points': [[t, round(v, 3)] for t, v in points]}
+
+
+def downsample(points, step):
+    """Average (t, v) points into `step`-second buckets"""
+    buckets = []
+    for t, v in points:
+        start = t - t % step
+        if buckets and buckets[-1][0] == start:
+            buckets[-1][1] += v
+            buckets[-1][2] += 1
+        else:
+            buckets.append([start, v, 1])
+    return [(start, total / count) for start, total, count in buckets]
+
+
+class MetricsRecorder:
+    """Background thread feeding `collect()` into a MetricsStore every `interval` seconds"""
+
+    def __init__(self, store, collect, interval=1.0):
+        self.store = store
+        self.collect = collect
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='metrics-recorder', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.store.record(int(time.time()), self.collect())
+            except Exception:
+                pass
+            next_tick += self.interval
+            self._stop.wait(max(0, next_tick - time.monotonic()))
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Background status sampler for the Garuda Media Stack Control API
+Keeps one in-memory snapshot of host state so dashboard polls never fork
+"""
+
+import threading
+import time
+
+
+class StatusSampler:
+    """Refresh registered fields on a background thread, each on its own TTL"""
+
+    def __init__(self, interval=2.0):
+        self.interval = interval
+        self._fields = {}      # name -> (collector, ttl)
+        self._snapshot = {}    # name -> (value, monotonic sample time)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, name, collector, ttl):
+        """Register a zero-argument collector refreshed every `ttl` seconds"""
+        self._fields[name] = (collector, ttl)
+
+    def start(self):
+        """Start the sampler thread (idempotent)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='status-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the sampler thread"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 1)
+
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def invalidate(self, *names):
+        """Drop cached values so the next read or tick samples them again"""
+        with self._lock:
+            for name in names or list(self._snapshot):
+                self._snapshot.pop(name, None)
+
+    def get(self, name):
+        """Return (value, age_seconds) for a field, sampling inline if never sampled"""
+        with self._lock:
+            entry = self._snapshot.get(name)
+        if entry is None or (not self.running() and self._is_stale(name, entry)):
+            return self._refresh(name), 0.0
+        value, sampled_at = entry
+        return value, time.monotonic() - sampled_at
+
+    def get_many(self, *names):
+        """Return ({name: value}, oldest_age_seconds) for several fields"""
+        values = {}
+        oldest = 0.0
+        for name in names:
+            values[name], age = self.get(name)
+            oldest = max(oldest, age)
+        return values, oldest
+
+    def _is_stale(self, name, entry):
+        _, ttl = self._fields[name]
+        return time.monotonic() - entry[1] >= ttl
+
+    def _refresh(self, name):
+        collector, _ = self._fields[name]
+        try:
+            value = collector()
+        except Exception as e:
+            value = {'error': str(e)}
+        with self._lock:
+            self._snapshot[name] = (value, time.monotonic())
+        return value
+
+    def _run(self):
+        while not self._stop.is_set():
+            for name in list(self._fields):
+                with self._lock:
+                    entry = self._snapshot.get(name)
+                if entry is None or self._is_stale(name, entry):
+                    self._refresh(name)
+            self._stop.wait(self.interval)
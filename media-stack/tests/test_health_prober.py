@@ -0,0 +1,90 @@
+"""Pooled keep-alive health probes against a local stub HTTP server"""
+
+import asyncio
+import os
+import socket
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+
+from health_prober import HealthProber
+
+
+async def stub_server(mode):
+    """HTTP stub on a free port: 'ok' keeps connections open, 'close_idle' answers once per connection
+    and drops it on the next request, 'hang' never answers"""
+    connections = []
+
+    async def handle(reader, writer):
+        connections.append(writer)
+        answered = 0
+        try:
+            while True:
+                await reader.readuntil(b'\r\n\r\n')
+                if mode == 'hang':
+                    await asyncio.sleep(3600)
+                if mode == 'close_idle' and answered:
+                    break
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok')
+                await writer.drain()
+                answered += 1
+        except asyncio.IncompleteReadError:
+            pass
+        writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    return server, server.sockets[0].getsockname()[1], connections
+
+
+def run_probes(mode, count, **options):
+    async def main():
+        server, port, connections = await stub_server(mode)
+        prober = HealthProber({'radarr': port}, **options)
+        try:
+            states = []
+            for _ in range(count):
+                states.append(await prober.probe('radarr'))
+            return states, len(connections)
+        finally:
+            for pool in prober._pools.values():
+                pool.close()
+            server.close()
+    return asyncio.run(main())
+
+
+def test_probes_reuse_one_keepalive_connection():
+    states, accepted = run_probes('ok', 3)
+    assert [s['status'] for s in states] == ['healthy'] * 3
+    assert [s['connection_reused'] for s in states] == [False, True, True]
+    assert states[-1]['connections_opened'] == accepted == 1
+
+
+def test_reconnects_after_server_closes_idle_connection():
+    states, accepted = run_probes('close_idle', 3)
+    # Each later probe finds its pooled connection dropped and retries once on a fresh one
+    assert [s['status'] for s in states] == ['healthy'] * 3
+    assert [s['connection_reused'] for s in states] == [False, False, False]
+    assert states[-1]['connections_opened'] == accepted == 3
+    assert states[-1]['consecutive_failures'] == 0
+
+
+def test_unanswered_probe_times_out_then_turns_unhealthy():
+    states, _ = run_probes('hang', 2, timeout=0.2, fail_after=2)
+    assert states[0]['status'] == 'degraded'
+    assert states[0]['error'] == 'no answer within 0.2s'
+    assert states[0]['samples'] == 1   # Timeouts count at the timeout
+    assert states[1]['status'] == 'unhealthy'
+
+
+def test_refused_connection_is_down_without_latency_sample():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]   # Closed again before probing: nothing listens
+
+    async def main():
+        prober = HealthProber({'sonarr': port}, fail_after=1)
+        return await prober.probe('sonarr')
+
+    state = asyncio.run(main())
+    assert state['status'] == 'unhealthy'
+    assert state['http_status'] is None and state['samples'] == 0
@@ -0,0 +1,49 @@
+"""Restart specs find the processes their argv launches"""
+
+import copy
+import importlib.util
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api')
+sys.path.insert(0, API_DIR)
+
+from restart_orchestrator import find_processes
+
+
+@pytest.fixture(scope='module')
+def control_api():
+    spec = importlib.util.spec_from_file_location('control_api', os.path.join(API_DIR, 'control-api.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def launch(argv, cwd):
+    """Start the spec's own argv in cwd with a stand-in script that just idles"""
+    script = os.path.join(cwd, argv[-1])
+    os.makedirs(os.path.dirname(script), exist_ok=True)
+    with open(script, 'w') as f:
+        f.write('setTimeout(() => {}, 30000);\n')
+    return subprocess.Popen(argv, cwd=cwd)
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='node not installed')
+def test_jellyseerr_match_finds_launched_process_only_in_its_cwd(control_api, tmp_path):
+    spec = copy.copy(next(s for s in control_api.RESTART_SERVICES if s.name == 'jellyseerr'))
+    spec.cwd = str(tmp_path / 'jellyseerr')
+    other_cwd = str(tmp_path / 'other-node-app')
+    os.makedirs(spec.cwd)
+    os.makedirs(other_cwd)
+    ours, other = launch(spec.argv, spec.cwd), launch(spec.argv, other_cwd)
+    try:
+        found = [p.pid for p in find_processes(spec.match, spec.cwd if spec.match_cwd else None)]
+        assert found == [ours.pid]
+    finally:
+        for proc in (ours, other):
+            proc.kill()
+            proc.wait()
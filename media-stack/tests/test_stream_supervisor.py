@@ -0,0 +1,66 @@
+"""Supervised encoders share the pids/ directory that stream-manager.sh and api-server.py count"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+
+import stream_supervisor
+from stream_supervisor import StreamSupervisor, count_live_encoders, pidfile_path
+
+
+class Catalog:
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+
+    def plan(self, name, options):
+        return {'label': name, 'sources': ['http://example.invalid/page'], 'quality': {'height': 720, 'fps': 30},
+                'max_bitrate': None, 'hls_path': str(self.out_dir / f'{name}.m3u8'),
+                'record_path': str(self.out_dir / f'{name}.ts')}
+
+
+@pytest.fixture
+def supervisor(tmp_path, monkeypatch):
+    # An idle child stands in for ffmpeg
+    monkeypatch.setattr(stream_supervisor, 'ffmpeg_command', lambda source, plan, video: ['sleep', '30'])
+    sup = StreamSupervisor(Catalog(tmp_path), resolve=lambda page: 'http://example.invalid/live.m3u8',
+                           pid_dir=str(tmp_path / 'pids'), check_interval=3600)
+    yield sup
+    sup.stop()
+    sup._stop.set()
+
+
+def test_count_includes_only_live_hls_pidfiles(tmp_path):
+    dead = subprocess.Popen(['true'])
+    dead.wait()
+    for filename, pid in (('raw_hls.pid', os.getpid()), ('saints_hls.pid', dead.pid), ('raw.pid', os.getpid()),
+                          ('bogus_hls.pid', 'x')):
+        (tmp_path / filename).write_text(f'{pid}\n')
+    assert count_live_encoders(str(tmp_path)) == 1
+    assert count_live_encoders(str(tmp_path / 'missing')) == 0
+
+
+def test_supervised_stream_is_counted_until_stopped(supervisor, tmp_path):
+    pid_dir = str(tmp_path / 'pids')
+    (tmp_path / 'pids').mkdir()
+    (tmp_path / 'pids' / 'raw_hls.pid').write_text(f'{os.getpid()}\n')   # stream-manager.sh's encoder
+    stream = supervisor.start('wrestling')
+    assert open(pidfile_path(pid_dir, 'wrestling')).read().strip() == str(stream['pid'])
+    assert count_live_encoders(pid_dir) == 2
+    supervisor.stop('wrestling')
+    assert count_live_encoders(pid_dir) == 1
+    assert not os.path.exists(pidfile_path(pid_dir, 'wrestling'))
+
+
+def test_watchdog_does_not_restart_a_stream_stopped_by_stream_manager(supervisor, tmp_path):
+    supervisor.start('saints')
+    state = supervisor._streams['saints']
+    # What `stream-manager.sh stop` does: kill every pidfile's process and delete the file
+    os.unlink(pidfile_path(str(tmp_path / 'pids'), 'saints'))
+    state['encoder'].proc.kill()
+    state['encoder'].proc.wait()
+    supervisor._check('saints', state)
+    assert supervisor.status() == {}
@@ -0,0 +1,65 @@
+"""Profile selection for frame rates that are not on the ladder, and named quality presets"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+
+from stream_config import StreamCatalog, UnknownQuality, quality_presets
+from stream_supervisor import StreamSupervisor
+from transcode_profiles import ProfileSelector
+
+
+def idle_selector(cpu_count=8):
+    return ProfileSelector(lambda: 0.0, lambda: 0, cpu_count=cpu_count)
+
+
+def test_25fps_request_is_accepted_at_requested_rate():
+    video = idle_selector().choose({'label': 'pal', 'quality': {'height': 1080, 'fps': 25}})
+    assert (video['height'], video['fps']) == (1080, 25)
+
+
+def test_24fps_request_uses_30fps_rung_bitrate():
+    selector = idle_selector()
+    video = selector.choose({'label': 'film', 'quality': {'height': 720, 'fps': 24}})
+    assert (video['height'], video['fps'], video['bitrate']) == (720, 24, 3500)
+    assert selector.decisions()[0]['action'] == 'accepted'
+
+
+def test_50fps_request_snaps_down_to_30fps_ladder():
+    video = idle_selector().choose({'label': 'sport', 'quality': {'height': 1080, 'fps': 50}})
+    assert (video['height'], video['fps']) == (1080, 30)
+
+
+def test_quality_presets_resolve_names():
+    conf = {'QUALITY_PRESETS': {'premium': '1080p,60fps', 'standard': '720p,30fps  ', 'bogus': 'fast'}}
+    assert quality_presets(conf) == {'premium': {'height': 1080, 'fps': 60},
+                                     'standard': {'height': 720, 'fps': 30}}
+
+
+@pytest.mark.parametrize('name', ['wrestling', 'saints', 'hdhomerun'])
+def test_catalog_resolves_preset_names_and_rejects_unknown_quality(tmp_path, name):
+    for filename in ('wwe-aew-streams.conf', 'saints-streams.conf', 'hdhomerun.conf'):
+        (tmp_path / filename).write_text('[QUALITY_PRESETS]\npremium = 1080p,60fps\n'
+                                         '[LOCAL_CHANNELS]\ncbs_channel = 4.1\n')
+    catalog = StreamCatalog(str(tmp_path), str(tmp_path), str(tmp_path), str(tmp_path))
+    assert catalog.plan(name, {'quality': 'premium'})['quality'] == {'height': 1080, 'fps': 60}
+    with pytest.raises(UnknownQuality, match='premium'):
+        catalog.plan(name, {'quality': 'ultra'})
+
+
+def test_failed_launch_releases_warmup_reservation(tmp_path):
+    class Catalog:
+        def plan(self, name, options):
+            return {'label': name, 'sources': ['http://example.invalid/page'], 'quality': {'height': 1080, 'fps': 30},
+                    'hls_path': str(tmp_path / 'live.m3u8'), 'record_path': str(tmp_path / 'rec.ts')}
+
+    selector = idle_selector()
+    supervisor = StreamSupervisor(Catalog(), resolve=lambda page: None, choose_video=selector.choose,
+                                  release_video=selector.release)
+    free = selector.headroom()
+    with pytest.raises(RuntimeError, match='No stream source'):
+        supervisor.start('wrestling')
+    assert selector.headroom() == free